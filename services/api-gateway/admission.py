@@ -0,0 +1,222 @@
+"""Admission control for the gateways: per-customer token buckets and a bounded, SLO-aware queue"""
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+
+from metrics import REGISTRY
+
+# Upstream executions running at once; the rest wait in a short queue
+MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "64"))
+QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "128"))
+# Latency objective: a request whose expected queue wait plus service time exceeds it is shed
+SLO_SECONDS = float(os.getenv("ADMISSION_SLO_SECONDS", "3"))
+# Transactions of at least this amount use the priority lane
+PRIORITY_AMOUNT = float(os.getenv("ADMISSION_PRIORITY_AMOUNT", "10000"))
+# Requests per second (and burst) allowed per customer_id
+CUSTOMER_RATE = float(os.getenv("ADMISSION_CUSTOMER_RATE", "5"))
+CUSTOMER_BURST = float(os.getenv("ADMISSION_CUSTOMER_BURST", "10"))
+MAX_TRACKED_CUSTOMERS = int(os.getenv("ADMISSION_MAX_TRACKED_CUSTOMERS", "100000"))
+
+PRIORITY = "priority"
+NORMAL = "normal"
+
+DECISIONS = REGISTRY.counter(
+    "gateway_admission_total", "Admission decisions by pool, lane and outcome", ("pool", "lane", "outcome")
+)
+_controllers = []
+REGISTRY.gauge("gateway_admission_in_flight", "Requests holding an admission slot", ("pool",),
+               collect=lambda: {(c.name,): c.in_flight for c in _controllers})
+REGISTRY.gauge("gateway_admission_queued", "Requests waiting for an admission slot", ("pool", "lane"),
+               collect=lambda: {(c.name, lane): len(queue) for c in _controllers for lane, queue in c.lanes.items()})
+
+
+class Shed(Exception):
+    def __init__(self, reason: str, retry_after: float = 1.0):
+        """Request rejected before reaching the upstream; answered with 429"""
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+    def headers(self) -> dict:
+        return {"Retry-After": str(max(1, round(self.retry_after))), "X-Shed-Reason": self.reason}
+
+
+def is_priority(transaction_data: dict, threshold: float = PRIORITY_AMOUNT) -> bool:
+    try:
+        return float((transaction_data or {}).get("amount") or 0) >= threshold
+    except (TypeError, ValueError):
+        return False
+
+
+class CustomerRateLimiter:
+    def __init__(self, rate: float = CUSTOMER_RATE, burst: float = CUSTOMER_BURST,
+                 max_customers: int = MAX_TRACKED_CUSTOMERS):
+        """Token bucket per customer_id, refilled lazily on each request; LRU-bounded"""
+        self.rate = rate
+        self.burst = burst
+        self.max_customers = max_customers
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, customer_id: str):
+        """Take one token or raise Shed('rate_limited') with the time until the next one"""
+        if self.rate <= 0 or not customer_id:
+            return
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(customer_id, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                self._buckets[customer_id] = (tokens - 1, now)
+                self._buckets.move_to_end(customer_id)
+                while len(self._buckets) > self.max_customers:
+                    self._buckets.popitem(last=False)
+                return
+            self._buckets[customer_id] = (tokens, now)
+        raise Shed("rate_limited", (1 - tokens) / self.rate)
+
+
+class _Waiter:
+    def __init__(self, lane: str, notify):
+        self.lane = lane
+        self.notify = notify
+        self.shed = None
+
+
+class AdmissionController:
+    def __init__(self, name: str, max_concurrency: int = MAX_CONCURRENCY, queue_size: int = QUEUE_SIZE,
+                 slo_seconds: float = SLO_SECONDS):
+        """
+        Bounded concurrency pool with a short wait queue in two lanes. Freed
+        slots go to the priority lane first. A request is shed when the queue is
+        full or when its expected wait (position / slots * mean service time)
+        plus its own service time would exceed the SLO. When the queue is full,
+        a priority request evicts the newest normal waiter instead of being shed.
+        """
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.queue_size = queue_size
+        self.slo_seconds = slo_seconds
+        self.in_flight = 0
+        self.lanes = {PRIORITY: deque(), NORMAL: deque()}
+        # Moving average of the time a slot is held, seeded with a fraction of the SLO
+        self.service_time = slo_seconds / 10
+        self._lock = threading.Lock()
+        _controllers.append(self)
+
+    def _expected_wait(self, position: int) -> float:
+        return (position // self.max_concurrency + 1) * self.service_time
+
+    def enter(self, priority: bool, notify):
+        """
+        None when a slot was taken right away; otherwise a queued waiter whose
+        notify() is called once it gets a slot or is evicted (waiter.shed set).
+        """
+        lane = PRIORITY if priority else NORMAL
+        evicted = None
+        with self._lock:
+            ahead = len(self.lanes[PRIORITY]) + (0 if priority else len(self.lanes[NORMAL]))
+            if self.in_flight < self.max_concurrency and ahead == 0:
+                self.in_flight += 1
+                DECISIONS.inc(self.name, lane, "admitted")
+                return None
+
+            if self._expected_wait(ahead) + self.service_time > self.slo_seconds:
+                DECISIONS.inc(self.name, lane, "shed_slo")
+                raise Shed("slo", self._expected_wait(ahead))
+            if len(self.lanes[PRIORITY]) + len(self.lanes[NORMAL]) >= self.queue_size:
+                if not priority or not self.lanes[NORMAL]:
+                    DECISIONS.inc(self.name, lane, "shed_queue_full")
+                    raise Shed("queue_full", self._expected_wait(ahead))
+                evicted = self.lanes[NORMAL].pop()
+                evicted.shed = Shed("evicted_by_priority", self._expected_wait(ahead))
+                DECISIONS.inc(self.name, NORMAL, "shed_evicted")
+
+            waiter = _Waiter(lane, notify)
+            self.lanes[lane].append(waiter)
+            DECISIONS.inc(self.name, lane, "queued")
+        if evicted is not None:
+            evicted.notify()
+        return waiter
+
+    def abandon(self, waiter: _Waiter) -> bool:
+        """Drop a waiter that gave up; False if it had already been granted a slot"""
+        with self._lock:
+            try:
+                self.lanes[waiter.lane].remove(waiter)
+            except ValueError:
+                return waiter.shed is not None
+            DECISIONS.inc(self.name, waiter.lane, "shed_timeout")
+            return True
+
+    def release(self, held_seconds: float = None):
+        """Free a slot; held_seconds (None if the slot was never used) feeds the service time average"""
+        with self._lock:
+            if held_seconds is not None:
+                self.service_time += 0.1 * (held_seconds - self.service_time)
+            queue = self.lanes[PRIORITY] or self.lanes[NORMAL]
+            if not queue:
+                self.in_flight -= 1
+                return
+            # The slot passes straight to the next waiter
+            waiter = queue.popleft()
+            DECISIONS.inc(self.name, waiter.lane, "admitted")
+        waiter.notify()
+
+    def max_wait(self) -> float:
+        """Longest a queued request may wait before giving up"""
+        return max(self.slo_seconds - self.service_time, 0.0)
+
+    @asynccontextmanager
+    async def slot(self, priority: bool = False):
+        """asyncio usage (main.py): async with controller.slot(priority): ..."""
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+        waiter = self.enter(priority, lambda: loop.call_soon_threadsafe(_resolve, granted))
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(granted), self.max_wait())
+            except asyncio.TimeoutError:
+                if self.abandon(waiter):
+                    if waiter.shed is not None:
+                        raise waiter.shed
+                    raise Shed("queue_timeout", self.service_time)
+                # Granted while timing out: keep the slot
+            except asyncio.CancelledError:
+                if not self.abandon(waiter):
+                    self.release()
+                raise
+            if waiter.shed is not None:
+                raise waiter.shed
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started)
+
+    @contextmanager
+    def slot_blocking(self, priority: bool = False):
+        """Thread usage (Flask app.py): with controller.slot_blocking(priority): ..."""
+        granted = threading.Event()
+        waiter = self.enter(priority, granted.set)
+        if waiter is not None:
+            if not granted.wait(self.max_wait()) and self.abandon(waiter):
+                if waiter.shed is not None:
+                    raise waiter.shed
+                raise Shed("queue_timeout", self.service_time)
+            if waiter.shed is not None:
+                raise waiter.shed
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started)
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(True)
+
@@ -1,9 +1,17 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 import os
+import time
 import requests
 import logging
 
+from admission import AdmissionController, CustomerRateLimiter, Shed, is_priority
+from breaker import Breakers
+from downstream import CODEC, CONNECT_TIMEOUT, READ_TIMEOUT, HealthMonitor, create_session
+from fast_codec import decode_response, encode_request
+from metrics import REGISTRY, CONTENT_TYPE
+from singleflight import ThreadSingleFlight, request_key
+
 app = Flask(__name__)
 CORS(app)
 logging.basicConfig(level=logging.INFO)
@@ -13,52 +21,69 @@ FRAUD_SYSTEM_URL = os.getenv('FRAUD_SYSTEM_URL', 'http://localhost:8003')
 PATTERN_ANALYZER_URL = os.getenv('PATTERN_ANALYZER_URL', 'http://localhost:8002')
 DATA_COLLECTOR_URL = os.getenv('DATA_COLLECTOR_URL', 'http://localhost:8001')
 
+# Shared keep-alive session for every downstream call
+session = create_session()
+health_monitor = HealthMonitor({'fraud_system': FRAUD_SYSTEM_URL}, session)
+# An open breaker sends requests straight to fallback_analysis
+breakers = Breakers(['fraud_system'])
+single_flight = ThreadSingleFlight()
+# Per-customer token bucket, and a bounded pool with a short queue per downstream
+rate_limiter = CustomerRateLimiter()
+admission = {'fraud_system': AdmissionController('fraud_system')}
+
+ANALYSES = REGISTRY.counter(
+    'gateway_analyses_total', 'Analyses served, by method and fallback reason', ('method', 'reason')
+)
+REGISTRY.gauge(
+    'gateway_fallback_share', 'Share of analyses served by fallback_analysis since start',
+    collect=lambda: {(): _fallback_share()}
+)
+
+def _fallback_share():
+    values = ANALYSES.snapshot()
+    total = sum(values.values())
+    fallback = sum(count for (method, _), count in values.items() if method == 'fallback')
+    return fallback / total if total else 0.0
+
+@app.before_request
+def start_health_monitor():
+    health_monitor.start()
+
 @app.route('/api/health', methods=['GET'])
 def health():
-    # Check microservices health
-    microservices_status = {}
-    
-    try:
-        response = requests.get(f"{FRAUD_SYSTEM_URL}/health", timeout=5)
-        microservices_status['fraud_system'] = 'healthy' if response.status_code == 200 else 'unhealthy'
-    except:
-        microservices_status['fraud_system'] = 'unavailable'
+    # Served from the background poller's snapshot: no downstream calls here
+    snapshot = health_monitor.snapshot()
     
     return jsonify({
         "status": "healthy",
         "service": "api-gateway",
         "database": "connected" if os.getenv('DATABASE_URL') else "not configured",
-        "microservices": microservices_status
+        "microservices": {name: entry['status'] for name, entry in snapshot.items()},
+        "microservices_detail": snapshot,
+        "circuit_breakers": {name: breaker.stats() for name, breaker in breakers.items()}
     })
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text format: breaker states and transitions, fallback share"""
+    return Response(REGISTRY.expose(), mimetype=CONTENT_TYPE)
+
 @app.route('/api/analyze-fraud', methods=['POST'])
 def analyze_fraud():
     try:
         data = request.get_json()
         app.logger.info(f"Analyzing transaction: {data}")
         
-        # Call fraud_system_v2 microservice
-        try:
-            fraud_response = requests.post(
-                f"{FRAUD_SYSTEM_URL}/analyze-fraud",
-                json=data,
-                timeout=30
-            )
-            
-            if fraud_response.status_code == 200:
-                result = fraud_response.json()
-                app.logger.info(f"Multi-agent analysis result: {result}")
-                return jsonify(result)
-            else:
-                app.logger.error(f"Fraud system error: {fraud_response.status_code}")
-                # Fallback to simple analysis
-                return fallback_analysis(data)
-                
-        except requests.exceptions.RequestException as e:
-            app.logger.error(f"Fraud system unavailable: {e}")
-            # Fallback to simple analysis
-            return fallback_analysis(data)
+        # Concurrent retries of the same transaction and payload share one call
+        key = request_key(data.get('transaction_id'), data)
+        result, source = single_flight.do(key, lambda: analyze_admitted(data), cacheable=is_multi_agent)
+        response = jsonify(result)
+        response.headers['X-Single-Flight'] = source
+        return response
         
+    except Shed as e:
+        app.logger.warning(f"Request shed: {e.reason}")
+        return jsonify({"error": "Too many requests", "reason": e.reason}), 429, e.headers()
     except Exception as e:
         app.logger.error(f"Analysis error: {str(e)}")
         return jsonify({
@@ -69,9 +94,67 @@ def analyze_fraud():
             "recommendation": "ERROR - Unable to analyze"
         }), 500
 
-def fallback_analysis(data):
+def is_multi_agent(result):
+    """Fallback results are not cached, so a retry can reach fraud_system_v2 again"""
+    return result.get('analysis_method') != 'fallback'
+
+def analyze_admitted(data):
+    """Charged only when single-flight runs it: coalesced and cached retries use no tokens"""
+    rate_limiter.check(data.get('customer_id'))
+    return analyze_with_fraud_system(data)
+
+def analyze_with_fraud_system(data):
+    """fraud_system_v2 decision, or fallback_analysis when it is unavailable or the breaker is open"""
+    breaker = breakers['fraud_system']
+    token = breaker.allow()
+    if token is None:
+        return fallback_analysis(data, reason='circuit_open')
+    
+    # Call fraud_system_v2 microservice; high-value transactions take the priority lane
+    try:
+        with admission['fraud_system'].slot_blocking(is_priority(data.get('transaction_data'))):
+            return call_fraud_system(data, breaker, token)
+    except Shed:
+        # Never reached the service: no outcome for the breaker
+        breaker.cancel(token)
+        raise
+
+def call_fraud_system(data, breaker, token):
+    body, headers = encode_request(data, use_msgpack=CODEC == 'msgpack')
+    started = time.perf_counter()
+    success = False
+    try:
+        fraud_response = session.post(
+            f"{FRAUD_SYSTEM_URL}/analyze-fraud",
+            data=body,
+            headers=headers,
+            timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
+        )
+        # 4xx is the caller's problem, not a sign of an unhealthy service
+        success = fraud_response.status_code < 500
+        
+        if fraud_response.status_code == 200:
+            result = decode_response(fraud_response.headers.get('Content-Type'), fraud_response.content)
+            app.logger.info(f"Multi-agent analysis result: {result}")
+            ANALYSES.inc('multi_agent', 'none')
+            return result
+        else:
+            app.logger.error(f"Fraud system error: {fraud_response.status_code}")
+            # Fallback to simple analysis
+            return fallback_analysis(data, reason=f'http_{fraud_response.status_code}')
+            
+    except requests.exceptions.RequestException as e:
+        app.logger.error(f"Fraud system unavailable: {e}")
+        # Fallback to simple analysis
+        reason = 'timeout' if isinstance(e, requests.exceptions.Timeout) else 'unavailable'
+        return fallback_analysis(data, reason=reason)
+    finally:
+        breaker.record(token, success, time.perf_counter() - started)
+
+def fallback_analysis(data, reason='unavailable'):
     """Fallback analysis when microservices are unavailable"""
-    app.logger.info("Using fallback analysis")
+    app.logger.info(f"Using fallback analysis ({reason})")
+    ANALYSES.inc('fallback', reason)
     
     amount = data.get('transaction_data', {}).get('amount', 0)
     location = data.get('transaction_data', {}).get('location', '')
@@ -106,14 +189,14 @@ def fallback_analysis(data):
     else:
         recommendation = "APPROVE - Low fraud risk"
     
-    return jsonify({
+    return {
         "is_fraud": is_fraud,
         "confidence_score": confidence,
         "risk_factors": risk_factors,
         "recommendation": recommendation,
         "transaction_id": data.get('transaction_id'),
         "analysis_method": "fallback"
-    })
+    }
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8000, debug=True)
\ No newline at end of file
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Benchmark: serialization cost per hop, stdlib JSON (before) vs orjson and msgpack (after)"""
+
+import argparse
+import json
+import os
+import random
+import sys
+from time import perf_counter
+
+from fastapi.encoders import jsonable_encoder
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import fast_codec
+
+
+def transaction_history(size: int, rng: random.Random) -> list:
+    # Same shape as data-collector's get_transaction_history
+    return [
+        {
+            "transaction_id": f"TXN{i}",
+            "amount": rng.uniform(10, 1000),
+            "timestamp": f"2024-01-{rng.randint(1, 30)}T{rng.randint(0, 23)}:00:00Z",
+            "location": rng.choice(["New York", "Boston", "Miami", "Unknown"]),
+            "status": "completed"
+        }
+        for i in range(size)
+    ]
+
+
+def hops(history: int) -> dict:
+    """(request, response) bodies of each hop with the shapes the services exchange"""
+    rng = random.Random(42)
+    transaction = {"amount": 5000, "timestamp": "2024-01-15T02:30:00Z",
+                   "location": "Unknown", "merchant_category": "online_gaming"}
+    collected = {
+        "customer_profile": {"customer_id": "CUST001", "account_age_days": 365, "avg_transaction_amount": 150.0,
+                             "frequent_locations": ["New York", "Boston"], "risk_score": 0.2,
+                             "account_status": "active"},
+        "transaction_history": transaction_history(history, rng),
+        "device_info": {"device_id": "DEV_CUST001", "device_type": "mobile", "os": "iOS", "browser": "Safari",
+                        "is_known_device": False, "risk_score": 0.73},
+        "external_data": {"credit_score": 640, "identity_verified": True, "watchlist_match": False,
+                          "geolocation_risk": 0.41}
+    }
+    patterns = {"anomaly_score": 0.42, "pattern_matches": ["Round amount: $5000", "High-risk merchant: online_gaming"],
+                "recent_transaction_count": 7, "device_risk_score": 0.73,
+                "behavioral_analysis": {"typing_pattern_match": True, "mouse_movement_anomaly": False,
+                                        "session_duration": 812, "ip_geolocation_mismatch": True}}
+    decision = {"is_fraud": True, "confidence_score": 0.62,
+                "risk_factors": ["Amount 3x higher than average", "Unusual time: 2:00", "New location: Unknown"],
+                "recommendation": "REVIEW - Manual review required"}
+    return {
+        "gateway -> data-collector": ({"customer_id": "CUST001", "transaction_id": "TXN123"}, collected),
+        "gateway -> pattern-analyzer": ({"transaction_data": transaction}, patterns),
+        "gateway -> fraud-agent": ({"customer_data": collected, "pattern_analysis": patterns,
+                                    "transaction_data": transaction}, decision),
+        "gateway -> fraud_system_v2": ({"customer_id": "CUST001", "transaction_id": "TXN123",
+                                        "transaction_data": transaction},
+                                       {**decision, "transaction_id": "TXN123", "analysis_method": "multi-agent-v2"}),
+    }
+
+
+def stdlib_dumps(content) -> bytes:
+    # What Starlette's JSONResponse and httpx's json= did before
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+CODECS = {
+    "json (stdlib)": (stdlib_dumps, json.loads),
+    "orjson": (fast_codec.dumps_json, fast_codec.loads_json),
+}
+if fast_codec.msgpack is not None:
+    CODECS["msgpack"] = (fast_codec.dumps_msgpack, fast_codec.loads_msgpack)
+
+
+def hop_cost(request: dict, response: dict, dumps, loads, iterations: int) -> tuple:
+    """
+    Seconds per hop for: client encodes the request, service decodes it,
+    service renders its response (jsonable_encoder + encode), client decodes it.
+    Pydantic validation is the same on both paths and is left out.
+    """
+    start = perf_counter()
+    for _ in range(iterations):
+        loads(dumps(request))
+        loads(dumps(jsonable_encoder(response)))
+    elapsed = (perf_counter() - start) / iterations
+    return elapsed, len(dumps(request)), len(dumps(response))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iteraciones', type=int, default=2000)
+    parser.add_argument('--history', type=int, default=200, help='entries in transaction_history')
+    args = parser.parse_args()
+
+    if fast_codec.orjson is None:
+        print("⚠️ orjson is not installed: the orjson row falls back to stdlib json")
+    if fast_codec.msgpack is None:
+        print("⚠️ msgpack is not installed: skipping the msgpack row")
+
+    print(f"\n📦 Serialization per hop ({args.history} transaction_history entries, {args.iteraciones:,} iterations)")
+    print("=" * 60)
+    totals = {name: 0.0 for name in CODECS}
+    for hop, (request, response) in hops(args.history).items():
+        print(f"\n   {hop}")
+        baseline = None
+        for name, (dumps, loads) in CODECS.items():
+            seconds, request_bytes, response_bytes = hop_cost(request, response, dumps, loads, args.iteraciones)
+            baseline = baseline or seconds
+            totals[name] += seconds
+            print(f"      {name:<14} {seconds * 1e6:9.1f} µs   {baseline / seconds:4.1f}x   "
+                  f"request {request_bytes:>7,} B   response {response_bytes:>7,} B")
+
+    baseline = totals["json (stdlib)"]
+    print(f"\n   Whole analysis (four hops)")
+    for name, seconds in totals.items():
+        print(f"      {name:<14} {seconds * 1e6:9.1f} µs   {baseline / seconds:4.1f}x")
+
+
+if __name__ == "__main__":
+    main()
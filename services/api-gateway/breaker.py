@@ -0,0 +1,148 @@
+"""Circuit breaker per downstream service for the Flask gateway"""
+import os
+import threading
+import time
+from collections import deque
+
+from metrics import REGISTRY
+
+# Calls remembered per breaker and the minimum before it may open
+WINDOW_SIZE = int(os.getenv("BREAKER_WINDOW_SIZE", "20"))
+MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "10"))
+# Opens when either share of the window reaches its threshold
+FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+SLOW_CALL_SECONDS = float(os.getenv("BREAKER_SLOW_CALL_SECONDS", "5"))
+SLOW_CALL_RATE = float(os.getenv("BREAKER_SLOW_CALL_RATE", "0.5"))
+# Time spent open before letting probes through, and how many must succeed to close
+OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "15"))
+HALF_OPEN_PROBES = int(os.getenv("BREAKER_HALF_OPEN_PROBES", "3"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+TRANSITIONS = REGISTRY.counter(
+    "gateway_breaker_transitions_total", "Circuit breaker state changes", ("upstream", "from_state", "to_state")
+)
+REJECTED = REGISTRY.counter(
+    "gateway_breaker_rejected_total", "Calls short-circuited by an open breaker", ("upstream",)
+)
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, window_size: int = WINDOW_SIZE, min_calls: int = MIN_CALLS,
+                 failure_rate: float = FAILURE_RATE, slow_call_seconds: float = SLOW_CALL_SECONDS,
+                 slow_call_rate: float = SLOW_CALL_RATE, open_seconds: float = OPEN_SECONDS,
+                 half_open_probes: int = HALF_OPEN_PROBES):
+        """
+        Count-based sliding window of (failed, slow) outcomes. While open,
+        allow() returns None without any I/O; after open_seconds up to
+        half_open_probes calls go through, and all of them must succeed
+        (fast) to close again. Any bad probe reopens the breaker.
+        allow() hands out the current generation, which changes on every
+        transition: an outcome from an earlier state (e.g. a slow call let
+        through while closed that lands after the breaker went half-open)
+        is stale evidence and record() ignores it.
+        """
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.generation = 0
+        self._window = deque(maxlen=window_size)
+        self._failures = 0
+        self._slow = 0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+
+    def _transition(self, state: str):
+        TRANSITIONS.inc(self.name, self.state, state)
+        self.state = state
+        self.generation += 1
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+        elif state == HALF_OPEN:
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        else:
+            self._window.clear()
+            self._failures = self._slow = 0
+
+    def allow(self):
+        """
+        None to short-circuit; otherwise a token for the call, to pass to
+        record() (or cancel() if the downstream is never reached)
+        """
+        if self.state == CLOSED:
+            return self.generation
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                return self.generation
+            if self.state == CLOSED:
+                return self.generation
+        REJECTED.inc(self.name)
+        return None
+
+    def cancel(self, token: int):
+        """An allowed call that never reached the downstream: free its probe slot, record nothing"""
+        with self._lock:
+            if self.state == HALF_OPEN and token == self.generation and self._probes_in_flight > 0:
+                self._probes_in_flight -= 1
+
+    def record(self, token: int, success: bool, seconds: float):
+        failed = not success
+        slow = seconds >= self.slow_call_seconds
+        with self._lock:
+            if token != self.generation:
+                # Allowed under an earlier state: neither a probe nor part of the current window
+                return
+            if self.state == HALF_OPEN:
+                self._probes_in_flight -= 1
+                if failed or slow:
+                    self._transition(OPEN)
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_probes:
+                        self._transition(CLOSED)
+                return
+
+            if len(self._window) == self._window.maxlen:
+                old_failed, old_slow = self._window[0]
+                self._failures -= old_failed
+                self._slow -= old_slow
+            self._window.append((failed, slow))
+            self._failures += failed
+            self._slow += slow
+            calls = len(self._window)
+            if calls >= self.min_calls and (self._failures / calls >= self.failure_rate
+                                            or self._slow / calls >= self.slow_call_rate):
+                self._transition(OPEN)
+
+    def stats(self) -> dict:
+        with self._lock:
+            calls = len(self._window)
+            return {
+                "state": self.state,
+                "window_calls": calls,
+                "failure_rate": round(self._failures / calls, 3) if calls else 0.0,
+                "slow_call_rate": round(self._slow / calls, 3) if calls else 0.0
+            }
+
+
+class Breakers(dict):
+    """CircuitBreaker by downstream name, with its state exposed as a gauge"""
+
+    def __init__(self, names):
+        super().__init__((name, CircuitBreaker(name)) for name in names)
+        REGISTRY.gauge("gateway_breaker_state", "Breaker state (0 closed, 1 half-open, 2 open)", ("upstream",),
+                       collect=lambda: {(name,): STATE_VALUES[b.state] for name, b in self.items()})
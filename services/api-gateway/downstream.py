@@ -0,0 +1,99 @@
+"""Pooled HTTP transport and background health polling for the Flask gateway (app.py)"""
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Connections kept per downstream host; size it like the number of request threads
+POOL_MAXSIZE = int(os.getenv("DOWNSTREAM_POOL_MAXSIZE", "32"))
+CONNECT_TIMEOUT = float(os.getenv("DOWNSTREAM_CONNECT_TIMEOUT", "2"))
+READ_TIMEOUT = float(os.getenv("DOWNSTREAM_READ_TIMEOUT", "30"))
+# Health polling runs off the request path; /api/health only reads the last snapshot
+HEALTH_POLL_INTERVAL = float(os.getenv("HEALTH_POLL_INTERVAL", "10"))
+HEALTH_TIMEOUT = float(os.getenv("HEALTH_TIMEOUT", "2"))
+# Wire format for analysis calls: json (default) or msgpack
+CODEC = os.getenv("DOWNSTREAM_CODEC", "json").lower()
+
+HEALTHY = "healthy"
+UNHEALTHY = "unhealthy"
+UNAVAILABLE = "unavailable"
+UNKNOWN = "unknown"
+
+
+def create_session(pool_maxsize: int = POOL_MAXSIZE) -> requests.Session:
+    """
+    One Session for the process: keep-alive connections are reused across
+    requests and threads. pool_block=False opens an extra (not kept) connection
+    instead of stalling a thread when every pooled one is busy.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_maxsize, pool_block=False, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class HealthMonitor:
+    def __init__(self, targets: dict, session: requests.Session, interval: float = HEALTH_POLL_INTERVAL,
+                 timeout: float = HEALTH_TIMEOUT):
+        """
+        Polls GET <url>/health of each target every `interval` seconds in a
+        daemon thread. snapshot() never does I/O, so load balancer probes
+        never fan out downstream or wait on a slow service.
+        """
+        self.targets = targets
+        self.session = session
+        self.interval = interval
+        self.timeout = timeout
+        self._snapshot = {name: {"status": UNKNOWN, "checked_at": None} for name in targets}
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def start(self):
+        """Idempotent; started lazily so it runs in the serving process (not a reloader or pre-fork parent)"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="health-monitor", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _check(self, url: str) -> dict:
+        started = time.perf_counter()
+        try:
+            response = self.session.get(f"{url}/health", timeout=self.timeout)
+            status = HEALTHY if response.status_code == 200 else UNHEALTHY
+            error = None if status == HEALTHY else f"HTTP {response.status_code}"
+        except requests.exceptions.RequestException as e:
+            status, error = UNAVAILABLE, type(e).__name__
+        return {
+            "status": status,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            "checked_at": time.time(),
+            "error": error
+        }
+
+    def poll_once(self):
+        for name, url in self.targets.items():
+            result = self._check(url)
+            # Replace the entry, never mutate it: readers hold no lock
+            self._snapshot = {**self._snapshot, name: result}
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.poll_once()
+            self._stop.wait(self.interval)
+
+    def snapshot(self) -> dict:
+        """Last known status per target, with the age of each check in seconds"""
+        now = time.time()
+        return {
+            name: {**entry, "age_seconds": round(now - entry["checked_at"], 1) if entry["checked_at"] else None}
+            for name, entry in self._snapshot.items()
+        }
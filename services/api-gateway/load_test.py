@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""Load test: /api/analyze-fraud with a new httpx client per request vs the shared upstream pools"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+TRANSACTION = {
+    "customer_id": "CUST001",
+    "transaction_id": "TXN123",
+    "transaction_data": {
+        "amount": 5000,
+        "timestamp": "2024-01-15T02:30:00Z",
+        "location": "Unknown",
+        "merchant_category": "online_gaming"
+    }
+}
+
+
+def stub_app(latency: float):
+    """data-collector, pattern-analyzer and fraud-agent on one port, with a fixed service time"""
+    from fastapi import FastAPI
+
+    app = FastAPI()
+
+    @app.post("/collect")
+    async def collect(body: dict):
+        await asyncio.sleep(latency)
+        return {"customer_profile": {"customer_id": body["customer_id"], "avg_transaction_amount": 150.0},
+                "transaction_history": [], "device_info": {}, "external_data": {}}
+
+    @app.post("/analyze")
+    async def analyze(body: dict):
+        await asyncio.sleep(latency)
+        return {"anomaly_score": 0.4, "pattern_matches": [], "recent_transaction_count": 1,
+                "device_risk_score": 0.1, "behavioral_analysis": {}}
+
+    @app.post("/decide")
+    async def decide(body: dict):
+        await asyncio.sleep(latency)
+        return {"is_fraud": False, "confidence_score": 0.3, "risk_factors": [],
+                "recommendation": "APPROVE - Low fraud risk"}
+
+    @app.get("/api/health")
+    async def health():
+        return {"status": "healthy"}
+
+    return app
+
+
+def per_request_client_app(upstream_url: str):
+    """The gateway before the shared pools: a fresh AsyncClient for every request"""
+    from fastapi import FastAPI
+
+    app = FastAPI()
+
+    @app.post("/api/analyze-fraud")
+    async def analyze_fraud(request: dict):
+        async with httpx.AsyncClient() as client:
+            data_response = await client.post(f"{upstream_url}/collect", json={
+                "customer_id": request["customer_id"], "transaction_id": request["transaction_id"]})
+            pattern_response = await client.post(f"{upstream_url}/analyze", json={
+                "transaction_data": request["transaction_data"]})
+            fraud_response = await client.post(f"{upstream_url}/decide", json={
+                "customer_data": data_response.json(),
+                "pattern_analysis": pattern_response.json(),
+                "transaction_data": request["transaction_data"]})
+            return fraud_response.json()
+
+    @app.get("/api/health")
+    async def health():
+        return {"status": "healthy"}
+
+    return app
+
+
+def serve(kind: str, port: int, upstream_url: str, latency: float):
+    import uvicorn
+
+    if kind == "stubs":
+        app = stub_app(latency)
+    elif kind == "per-request":
+        app = per_request_client_app(upstream_url)
+    else:
+        for variable in ("DATA_COLLECTOR_URL", "PATTERN_ANALYZER_URL", "FRAUD_AGENT_URL"):
+            os.environ[variable] = upstream_url
+        from main import app
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def start_server(kind: str, port: int, upstream_url: str = "", latency: float = 0.0):
+    process = multiprocessing.get_context("spawn").Process(
+        target=serve, args=(kind, port, upstream_url, latency), daemon=True)
+    process.start()
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{url}/api/health", timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"{kind} server did not start on port {port}")
+
+
+async def drive(url: str, requests: int, concurrency: int, warmup: int) -> dict:
+    latencies = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        for _ in range(warmup):
+            await client.post("/api/analyze-fraud", json=TRANSACTION)
+
+        queue = iter(range(requests))
+
+        async def worker():
+            nonlocal errors
+            for _ in queue:
+                started = time.perf_counter()
+                try:
+                    response = await client.post("/api/analyze-fraud", json=TRANSACTION)
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": len(latencies) / elapsed,
+        "mean": statistics.fmean(latencies),
+        "p50": latencies[len(latencies) // 2],
+        "p95": latencies[int(len(latencies) * 0.95)],
+        "p99": latencies[int(len(latencies) * 0.99)],
+    }
+
+
+def print_result(name: str, result: dict):
+    print(f"   {name:<20} {result['throughput']:>8.0f} req/s   mean {result['mean'] * 1000:7.2f} ms   "
+          f"p50 {result['p50'] * 1000:7.2f} ms   p95 {result['p95'] * 1000:7.2f} ms   "
+          f"p99 {result['p99'] * 1000:7.2f} ms   errors {result['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=50)
+    parser.add_argument('--upstream-latency-ms', type=float, default=2.0,
+                        help='service time of each stub upstream call')
+    parser.add_argument('--port', type=int, default=18100, help='first of three consecutive local ports')
+    args = parser.parse_args()
+
+    stubs, upstream_url = start_server("stubs", args.port, latency=args.upstream_latency_ms / 1000)
+    print(f"\n🚦 Load test: {args.requests:,} requests, concurrency {args.concurrency}, "
+          f"upstream service time {args.upstream_latency_ms:g} ms")
+    print("=" * 60)
+    try:
+        results = {}
+        for offset, kind in enumerate(("per-request", "pooled"), start=1):
+            process, url = start_server(kind, args.port + offset, upstream_url)
+            try:
+                results[kind] = asyncio.run(drive(url, args.requests, args.concurrency, args.warmup))
+                print_result(kind, results[kind])
+                if kind == "pooled":
+                    pool_metrics = httpx.get(f"{url}/metrics").text
+            finally:
+                process.terminate()
+                process.join()
+    finally:
+        stubs.terminate()
+        stubs.join()
+
+    before, after = results["per-request"], results["pooled"]
+    print(f"\n   p50 {before['p50'] / after['p50']:.1f}x lower, p99 {before['p99'] / after['p99']:.1f}x lower, "
+          f"throughput {after['throughput'] / before['throughput']:.1f}x")
+    print("\n🔌 Pooled gateway connections and pool wait")
+    for line in pool_metrics.splitlines():
+        if line.startswith(("gateway_upstream_connections_opened_total", "gateway_upstream_pool_wait_seconds_sum",
+                            "gateway_upstream_pool_wait_seconds_count", "gateway_upstream_requests_total")):
+            print(f"   {line}")
+
+
+if __name__ == "__main__":
+    main()
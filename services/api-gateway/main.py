@@ -1,12 +1,22 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
-import httpx
 import asyncio
 from typing import Dict, Any
 import os
 
-app = FastAPI(title="Fraud Detection API Gateway")
+from admission import AdmissionController, CustomerRateLimiter, Shed, is_priority
+from fast_codec import NegotiatedResponse, NegotiatedRoute
+from metrics import REGISTRY, CONTENT_TYPE
+from orchestration import Pipeline, Step, STEP_BUDGETS, TIMEOUT, parse_budgets
+from singleflight import AsyncSingleFlight, request_key
+from upstreams import Upstreams
+
+app = FastAPI(title="Fraud Detection API Gateway", default_response_class=NegotiatedResponse)
+# JSON by default, msgpack for clients that send or accept it
+app.router.route_class = NegotiatedRoute
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,6 +26,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# One keep-alive pool per upstream for the lifetime of the process
+upstreams = Upstreams.from_env().register_gauges()
+
 class FraudAnalysisRequest(BaseModel):
     customer_id: str
     transaction_id: str
@@ -27,43 +40,88 @@ class FraudAnalysisResponse(BaseModel):
     risk_factors: list
     recommendation: str
 
+# collect and analyze are independent and run concurrently; decide waits for both
+# and still runs with an empty input when one of them is late or fails
+pipeline = Pipeline([
+    Step("collect", "data-collector", "/collect",
+         lambda request, inputs: {"customer_id": request.customer_id, "transaction_id": request.transaction_id},
+         budget=0.6, fallback={}),
+    Step("analyze", "pattern-analyzer", "/analyze",
+         lambda request, inputs: {"transaction_data": request.transaction_data},
+         budget=0.6, fallback={}),
+    Step("decide", "fraud-agent", "/decide",
+         lambda request, inputs: {
+             "customer_data": inputs["collect"],
+             "pattern_analysis": inputs["analyze"],
+             "transaction_data": request.transaction_data
+         },
+         depends_on=("collect", "analyze"), budget=0.4, required=True),
+], budgets=parse_budgets(STEP_BUDGETS))
+
+# Retried copies of the same transaction share one pipeline run (and its result for a few seconds)
+single_flight = AsyncSingleFlight()
+# Per-customer token bucket at the door; pipeline runs are bounded and queued by admission
+rate_limiter = CustomerRateLimiter()
+admission = AdmissionController("pipeline")
+
+@app.on_event("startup")
+async def start_upstreams():
+    await upstreams.start()
+
+@app.on_event("shutdown")
+async def close_upstreams():
+    await upstreams.close()
+
+async def run_analysis(request: FraudAnalysisRequest) -> tuple:
+    """(status_code, decision or error detail, headers) of one pipeline run"""
+    # Charged here, inside single-flight: coalesced and cached retries use no tokens
+    rate_limiter.check(request.customer_id)
+    async with admission.slot(is_priority(request.transaction_data)):
+        result = await pipeline.run(upstreams, request)
+
+    # Per-step timings: the critical path is max(collect, analyze) + decide
+    headers = {"Server-Timing": result.server_timing()}
+    if result.degraded:
+        headers["X-Degraded-Steps"] = ",".join(result.degraded)
+    failed = pipeline.failed_required(result)
+    if failed is not None:
+        status_code = 504 if failed.status == TIMEOUT else 502
+        return status_code, f"Analysis failed: {failed.name} {failed.status}: {failed.error}", headers
+    return 200, result.results["decide"].value, headers
+
+def complete_result(outcome: tuple) -> bool:
+    """Only full decisions answer retries from the cache; degraded or failed runs are retried"""
+    status_code, _, headers = outcome
+    return status_code == 200 and "X-Degraded-Steps" not in headers
+
 @app.post("/api/analyze-fraud", response_model=FraudAnalysisResponse)
-async def analyze_fraud(request: FraudAnalysisRequest):
+async def analyze_fraud(request: FraudAnalysisRequest, response: Response):
     """Main endpoint to analyze potential fraud"""
+    key = request_key(request.transaction_id, jsonable_encoder(request))
     try:
-        # Orchestrate the fraud detection process
-        async with httpx.AsyncClient() as client:
-            # Step 1: Collect data from multiple sources
-            data_response = await client.post(
-                "http://data-collector:8001/collect",
-                json={"customer_id": request.customer_id, "transaction_id": request.transaction_id}
-            )
-            
-            # Step 2: Analyze patterns
-            pattern_response = await client.post(
-                "http://pattern-analyzer:8002/analyze",
-                json={"transaction_data": request.transaction_data}
-            )
-            
-            # Step 3: Make fraud decision
-            fraud_response = await client.post(
-                "http://fraud-agent:8003/decide",
-                json={
-                    "customer_data": data_response.json(),
-                    "pattern_analysis": pattern_response.json(),
-                    "transaction_data": request.transaction_data
-                }
-            )
-            
-            return fraud_response.json()
-            
+        (status_code, body, headers), source = await single_flight.do(
+            key, lambda: run_analysis(request), cacheable=complete_result
+        )
+    except Shed as e:
+        raise HTTPException(status_code=429, detail=f"Request shed: {e.reason}", headers=e.headers())
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
+    headers = {**headers, "X-Single-Flight": source}
+    if status_code != 200:
+        raise HTTPException(status_code=status_code, detail=body, headers=headers)
+    response.headers.update(headers)
+    return body
+
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy", "service": "api-gateway"}
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text format: upstream pool utilization, pool wait time and upstream latency"""
+    return PlainTextResponse(REGISTRY.expose(), media_type=CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
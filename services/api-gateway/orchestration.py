@@ -0,0 +1,178 @@
+"""Fraud analysis as a small dependency graph of upstream calls under one deadline"""
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
+
+from metrics import REGISTRY
+
+# Whole /api/analyze-fraud budget, from the request arriving to the decision
+DEADLINE_SECONDS = float(os.getenv("GATEWAY_DEADLINE_SECONDS", "3"))
+# Share of the deadline each step may use, e.g. "collect=0.6,analyze=0.6,decide=0.4"
+STEP_BUDGETS = os.getenv("GATEWAY_STEP_BUDGETS", "")
+
+OK = "ok"
+TIMEOUT = "timeout"
+ERROR = "error"
+
+STEP_LATENCY = REGISTRY.histogram(
+    "gateway_step_latency_seconds", "Duration of each orchestration step", ("step",)
+)
+STEP_OUTCOMES = REGISTRY.counter(
+    "gateway_step_outcomes_total", "Orchestration step results by outcome", ("step", "outcome")
+)
+
+
+def parse_budgets(text: str) -> Dict[str, float]:
+    budgets = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        name, _, share = item.partition("=")
+        budgets[name.strip()] = float(share)
+    return budgets
+
+
+class Step:
+    def __init__(self, name: str, upstream: str, path: str, payload: Callable[[Any, dict], dict],
+                 depends_on: Tuple[str, ...] = (), budget: float = 1.0, required: bool = False,
+                 fallback: Any = None):
+        """
+        One upstream call. payload(request, inputs) builds the body from the
+        request and the values of the steps it depends on; a late or failed
+        optional step contributes `fallback` instead of its value.
+        """
+        self.name = name
+        self.upstream = upstream
+        self.path = path
+        self.payload = payload
+        self.depends_on = tuple(depends_on)
+        self.budget = budget
+        self.required = required
+        self.fallback = fallback
+
+
+class StepResult:
+    def __init__(self, name: str, status: str, value: Any = None, started: float = 0.0,
+                 duration: float = 0.0, error: str = None):
+        self.name = name
+        self.status = status
+        self.value = value
+        self.started = started
+        self.duration = duration
+        self.error = error
+
+
+class PipelineResult:
+    def __init__(self, results: Dict[str, StepResult], total: float):
+        self.results = results
+        self.total = total
+
+    @property
+    def degraded(self) -> list:
+        """Steps whose value was replaced by their fallback"""
+        return [name for name, result in self.results.items() if result.status != OK]
+
+    def server_timing(self) -> str:
+        """Server-Timing header: one entry per step plus the total, in ms"""
+        entries = []
+        for name, result in self.results.items():
+            entry = f"{name};dur={result.duration * 1000:.1f}"
+            if result.status != OK:
+                entry += f';desc="{result.status}"'
+            entries.append(entry)
+        entries.append(f"total;dur={self.total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+class Pipeline:
+    def __init__(self, steps: list, deadline: float = DEADLINE_SECONDS, budgets: Optional[Dict[str, float]] = None):
+        """
+        Steps start as soon as their dependencies finish, so independent steps
+        run concurrently. Each gets min(budget * deadline, time left) and the
+        slowest chain is what the request waits for, not the sum of all steps.
+        """
+        self.deadline = deadline
+        self.steps = self._sorted(steps)
+        for name, share in (budgets or {}).items():
+            if name not in self.steps:
+                raise ValueError(f"Budget for unknown step: {name}")
+            self.steps[name].budget = share
+        longest = max(self._path_budget(name) for name in self.steps)
+        if longest > 1.0:
+            print(f"⚠️ Step budgets along one path add up to {longest:.0%} of the deadline, "
+                  f"later steps will be cut short by the deadline")
+
+    @staticmethod
+    def _sorted(steps: list) -> Dict[str, Step]:
+        by_name = {step.name: step for step in steps}
+        ordered = {}
+        visiting = set()
+
+        def visit(step: Step):
+            if step.name in ordered:
+                return
+            if step.name in visiting:
+                raise ValueError(f"Dependency cycle through step {step.name}")
+            visiting.add(step.name)
+            for dependency in step.depends_on:
+                if dependency not in by_name:
+                    raise ValueError(f"Step {step.name} depends on unknown step {dependency}")
+                visit(by_name[dependency])
+            ordered[step.name] = step
+
+        for step in steps:
+            visit(step)
+        return ordered
+
+    def _path_budget(self, name: str) -> float:
+        step = self.steps[name]
+        return step.budget + max((self._path_budget(d) for d in step.depends_on), default=0.0)
+
+    async def _run_step(self, step: Step, upstreams, request, results: dict, tasks: dict,
+                        started: float, deadline: float) -> StepResult:
+        if step.depends_on:
+            await asyncio.gather(*(tasks[name] for name in step.depends_on))
+        inputs = {name: results[name].value for name in step.depends_on}
+        step_started = time.perf_counter()
+        timeout = min(step.budget * self.deadline, deadline - step_started)
+        try:
+            if timeout <= 0:
+                raise asyncio.TimeoutError
+            upstream = upstreams[step.upstream]
+            response = await asyncio.wait_for(
+                upstream.post(step.path, json=step.payload(request, inputs)), timeout
+            )
+            response.raise_for_status()
+            result = StepResult(step.name, OK, upstream.decode(response))
+        except asyncio.TimeoutError:
+            result = StepResult(step.name, TIMEOUT, step.fallback, error=f"exceeded {max(timeout, 0) * 1000:.0f} ms budget")
+        except (httpx.HTTPError, ValueError) as e:
+            result = StepResult(step.name, ERROR, step.fallback, error=str(e) or type(e).__name__)
+        result.started = step_started - started
+        result.duration = time.perf_counter() - step_started
+        results[step.name] = result
+        STEP_LATENCY.observe(result.duration, step.name)
+        STEP_OUTCOMES.inc(step.name, result.status)
+        return result
+
+    async def run(self, upstreams, request) -> PipelineResult:
+        started = time.perf_counter()
+        deadline = started + self.deadline
+        results, tasks = {}, {}
+        for step in self.steps.values():
+            tasks[step.name] = asyncio.ensure_future(
+                self._run_step(step, upstreams, request, results, tasks, started, deadline)
+            )
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                task.cancel()
+        return PipelineResult({name: results[name] for name in self.steps}, time.perf_counter() - started)
+
+    def failed_required(self, result: PipelineResult) -> Optional[StepResult]:
+        for name, step_result in result.results.items():
+            if self.steps[name].required and step_result.status != OK:
+                return step_result
+        return None
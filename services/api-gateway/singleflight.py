@@ -0,0 +1,153 @@
+"""Single-flight for duplicate analyses: one upstream execution per transaction and payload"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import REGISTRY
+
+# How long a finished result answers retries of the same request
+CACHE_SECONDS = float(os.getenv("SINGLEFLIGHT_CACHE_SECONDS", "5"))
+CACHE_MAX_ENTRIES = int(os.getenv("SINGLEFLIGHT_CACHE_MAX_ENTRIES", "10000"))
+
+EXECUTED = "executed"
+COALESCED = "coalesced"
+CACHED = "cached"
+
+REQUESTS = REGISTRY.counter(
+    "gateway_singleflight_requests_total",
+    "Analysis requests by how they were answered (executed, coalesced onto one in flight, cached)",
+    ("outcome",)
+)
+
+
+def request_key(transaction_id, payload) -> str:
+    """transaction_id plus a hash of the canonical JSON payload; None disables coalescing"""
+    if not transaction_id:
+        return None
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return f"{transaction_id}:{hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:32]}"
+
+
+class ResultCache:
+    def __init__(self, ttl: float = CACHE_SECONDS, max_entries: int = CACHE_MAX_ENTRIES):
+        """Short TTL cache of finished results, LRU-bounded; safe from threads"""
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class AsyncSingleFlight:
+    def __init__(self, cache: ResultCache = None):
+        """
+        asyncio version (main.py). The shared execution runs in its own task,
+        so a caller that goes away does not cancel it for the others.
+        """
+        self.cache = cache if cache is not None else ResultCache()
+        self._in_flight = {}
+
+    async def do(self, key: str, execute, cacheable=lambda value: True):
+        """(value, outcome) where execute() is awaited at most once per key at a time"""
+        if key is None:
+            REQUESTS.inc(EXECUTED)
+            return await execute(), EXECUTED
+        value = self.cache.get(key)
+        if value is not None:
+            REQUESTS.inc(CACHED)
+            return value, CACHED
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            REQUESTS.inc(COALESCED)
+            return await asyncio.shield(task), COALESCED
+
+        task = asyncio.ensure_future(execute())
+        self._in_flight[key] = task
+
+        def finished(done):
+            self._in_flight.pop(key, None)
+            if not done.cancelled() and done.exception() is None and cacheable(done.result()):
+                self.cache.put(key, done.result())
+
+        task.add_done_callback(finished)
+        REQUESTS.inc(EXECUTED)
+        return await asyncio.shield(task), EXECUTED
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ThreadSingleFlight:
+    def __init__(self, cache: ResultCache = None):
+        """Thread version (Flask app.py): followers block on the leader's event"""
+        self.cache = cache if cache is not None else ResultCache()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, execute, cacheable=lambda value: True):
+        if key is None:
+            REQUESTS.inc(EXECUTED)
+            return execute(), EXECUTED
+        value = self.cache.get(key)
+        if value is not None:
+            REQUESTS.inc(CACHED)
+            return value, CACHED
+
+        with self._lock:
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = _Call()
+
+        if not leader:
+            REQUESTS.inc(COALESCED)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, COALESCED
+
+        REQUESTS.inc(EXECUTED)
+        try:
+            call.value = execute()
+            if cacheable(call.value):
+                self.cache.put(key, call.value)
+            return call.value, EXECUTED
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            call.done.set()
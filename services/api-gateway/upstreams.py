@@ -0,0 +1,163 @@
+"""Application-lifetime HTTP clients for the gateway's upstream services"""
+import asyncio
+import importlib.util
+import os
+import time
+
+import httpx
+
+from fast_codec import decode_response, encode_request, msgpack
+from metrics import REGISTRY
+
+UPSTREAM_URLS = {
+    "data-collector": os.getenv("DATA_COLLECTOR_URL", "http://data-collector:8001"),
+    "pattern-analyzer": os.getenv("PATTERN_ANALYZER_URL", "http://pattern-analyzer:8002"),
+    "fraud-agent": os.getenv("FRAUD_AGENT_URL", "http://fraud-agent:8003"),
+}
+
+# Concurrent requests per upstream; callers beyond this wait for a free slot
+MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+# Idle connections kept open per upstream, and for how long
+MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "50"))
+KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+TIMEOUT_SECONDS = float(os.getenv("UPSTREAM_TIMEOUT_SECONDS", "5"))
+# Longest wait for a free slot before failing with httpx.PoolTimeout
+POOL_TIMEOUT_SECONDS = float(os.getenv("UPSTREAM_POOL_TIMEOUT_SECONDS", str(TIMEOUT_SECONDS)))
+# HTTP/2 needs the optional h2 package (pip install httpx[http2])
+HTTP2 = os.getenv("UPSTREAM_HTTP2", "0").lower() in ("1", "true", "yes")
+# Wire format to the upstreams: json (default) or msgpack (needs msgpack on both ends)
+CODEC = os.getenv("UPSTREAM_CODEC", "json").lower()
+
+REQUESTS_TOTAL = REGISTRY.counter(
+    "gateway_upstream_requests_total", "Requests sent to each upstream by outcome", ("upstream", "outcome")
+)
+CONNECTIONS_OPENED = REGISTRY.counter(
+    "gateway_upstream_connections_opened_total", "New TCP connections opened to each upstream", ("upstream",)
+)
+POOL_WAIT = REGISTRY.histogram(
+    "gateway_upstream_pool_wait_seconds", "Time spent waiting for a free connection slot", ("upstream",)
+)
+LATENCY = REGISTRY.histogram(
+    "gateway_upstream_latency_seconds", "Upstream request latency once a slot is held", ("upstream",)
+)
+
+
+class Upstream:
+    def __init__(self, name: str, base_url: str, max_connections: int = MAX_CONNECTIONS,
+                 max_keepalive: int = MAX_KEEPALIVE, keepalive_expiry: float = KEEPALIVE_EXPIRY,
+                 timeout: float = TIMEOUT_SECONDS, pool_timeout: float = POOL_TIMEOUT_SECONDS,
+                 http2: bool = HTTP2, codec: str = CODEC):
+        """
+        One keep-alive pool per upstream for the whole process. Requests take a
+        slot from a semaphore sized like the pool, so in-use and waiting counts
+        and the wait time are measured here instead of read from httpx internals.
+        """
+        self.name = name
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.max_keepalive = min(max_keepalive, max_connections)
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout = timeout
+        self.pool_timeout = pool_timeout
+        self.http2 = http2
+        self.use_msgpack = codec == "msgpack"
+        self.client = None
+        self.in_use = 0
+        self.waiting = 0
+        self._slots = None
+
+    async def start(self):
+        if self.http2 and importlib.util.find_spec("h2") is None:
+            print(f"⚠️ UPSTREAM_HTTP2 is set but h2 is not installed, {self.name} uses HTTP/1.1")
+            self.http2 = False
+        if self.use_msgpack and msgpack is None:
+            print(f"⚠️ UPSTREAM_CODEC=msgpack but msgpack is not installed, {self.name} uses JSON")
+            self.use_msgpack = False
+        # Created here so the semaphore binds to the server's event loop
+        self._slots = asyncio.Semaphore(self.max_connections)
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=self.http2,
+            timeout=httpx.Timeout(self.timeout),
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive,
+                keepalive_expiry=self.keepalive_expiry
+            )
+        )
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def _trace(self, event: str, info: dict):
+        if event == "connection.connect_tcp.complete":
+            CONNECTIONS_OPENED.inc(self.name)
+
+    async def _acquire(self):
+        started = time.perf_counter()
+        self.waiting += 1
+        try:
+            if self._slots.locked():
+                await asyncio.wait_for(self._slots.acquire(), self.pool_timeout)
+            else:
+                # A free slot is taken without suspending (and without wait_for's extra task)
+                await self._slots.acquire()
+        except asyncio.TimeoutError:
+            REQUESTS_TOTAL.inc(self.name, "pool_timeout")
+            raise httpx.PoolTimeout(f"No free connection to {self.name} after {self.pool_timeout:g}s")
+        finally:
+            self.waiting -= 1
+            POOL_WAIT.observe(time.perf_counter() - started, self.name)
+
+    async def post(self, path: str, json=None, **kwargs) -> httpx.Response:
+        """POST `json` encoded with the upstream codec; read the result with decode()"""
+        if self.client is None:
+            raise RuntimeError(f"Upstream {self.name} is not started")
+        await self._acquire()
+        self.in_use += 1
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            content, headers = encode_request(json, self.use_msgpack)
+            response = await self.client.post(path, content=content, headers=headers,
+                                              extensions={"trace": self._trace}, **kwargs)
+            outcome = str(response.status_code)
+            return response
+        finally:
+            self.in_use -= 1
+            self._slots.release()
+            LATENCY.observe(time.perf_counter() - started, self.name)
+            REQUESTS_TOTAL.inc(self.name, outcome)
+
+    @staticmethod
+    def decode(response: httpx.Response):
+        return decode_response(response.headers.get("content-type"), response.content)
+
+
+class Upstreams(dict):
+    """Upstream by name; started and closed together with the application"""
+
+    @classmethod
+    def from_env(cls, urls: dict = None) -> "Upstreams":
+        return cls((name, Upstream(name, url)) for name, url in (urls or UPSTREAM_URLS).items())
+
+    async def start(self):
+        for upstream in self.values():
+            await upstream.start()
+        print(f"🔌 Upstream pools ready: {', '.join(f'{u.name}={u.base_url}' for u in self.values())} "
+              f"(max {MAX_CONNECTIONS}, keep-alive {MAX_KEEPALIVE}, http2={HTTP2}, codec={CODEC})")
+
+    async def close(self):
+        await asyncio.gather(*(upstream.close() for upstream in self.values()))
+
+    def register_gauges(self):
+        """Pool utilization as gauges read at scrape time"""
+        REGISTRY.gauge("gateway_upstream_pool_in_use", "Requests holding a connection slot", ("upstream",),
+                       collect=lambda: {(u.name,): u.in_use for u in self.values()})
+        REGISTRY.gauge("gateway_upstream_pool_waiting", "Requests waiting for a connection slot", ("upstream",),
+                       collect=lambda: {(u.name,): u.waiting for u in self.values()})
+        REGISTRY.gauge("gateway_upstream_pool_max", "Connection slots per upstream", ("upstream",),
+                       collect=lambda: {(u.name,): u.max_connections for u in self.values()})
+        return self
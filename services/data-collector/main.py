@@ -5,7 +5,11 @@ import httpx
 from typing import Dict, Any
 import random
 
-app = FastAPI(title="Data Collection Service")
+from fast_codec import NegotiatedResponse, NegotiatedRoute
+
+app = FastAPI(title="Data Collection Service", default_response_class=NegotiatedResponse)
+# JSON by default (orjson), msgpack for callers that send or accept it
+app.router.route_class = NegotiatedRoute
 
 class DataCollectionRequest(BaseModel):
     customer_id: str
@@ -5,7 +5,11 @@ import numpy as np
 from datetime import datetime
 import json
 
-app = FastAPI(title="Fraud Detection Agent")
+from fast_codec import NegotiatedResponse, NegotiatedRoute
+
+app = FastAPI(title="Fraud Detection Agent", default_response_class=NegotiatedResponse)
+# JSON by default (orjson), msgpack for callers that send or accept it
+app.router.route_class = NegotiatedRoute
 
 class FraudDecisionRequest(BaseModel):
     customer_data: Dict[str, Any]
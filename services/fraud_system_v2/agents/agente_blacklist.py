@@ -1,25 +1,110 @@
 """Agente para verificar si cliente está en blacklist"""
+import sys
+import numpy as np
 import pandas as pd
+from data.documentos import DOCUMENTO_INVALIDO, normalizar_documento, normalizar_documentos
+
+class BlacklistOrdenada:
+    def __init__(self, documentos: np.ndarray):
+        """
+        Documentos normalizados a int64 en un array ordenado y sin duplicados.
+        Pertenencia en O(log n) con 8 bytes por cliente. Los cambios incrementales
+        se aplican en O(1) sobre dos sets hasta que se compactan en un array nuevo.
+        """
+        self.documentos = documentos
+        self.agregados = set()
+        self.eliminados = set()
+    
+    @classmethod
+    def desde_documentos(cls, documentos):
+        documentos = normalizar_documentos(documentos)
+        return cls(np.unique(documentos[documentos != DOCUMENTO_INVALIDO]))
+    
+    def __len__(self):
+        return len(self.documentos) + len(self.agregados) - len(self.eliminados)
+    
+    def __iter__(self):
+        eliminados = self.eliminados.copy()
+        yield from (documento for documento in self.documentos.tolist() if documento not in eliminados)
+        yield from self.agregados.copy()
+    
+    def _en_base(self, documento: int) -> bool:
+        i = int(np.searchsorted(self.documentos, documento))
+        return i < len(self.documentos) and int(self.documentos[i]) == documento
+    
+    def __contains__(self, numero_documento) -> bool:
+        documento = normalizar_documento(numero_documento)
+        if documento in self.agregados:
+            return True
+        return documento not in self.eliminados and self._en_base(documento)
+    
+    def agregar(self, numero_documento) -> int:
+        """Agregar un documento en O(1); devuelve el documento normalizado"""
+        documento = normalizar_documento(numero_documento)
+        if documento == DOCUMENTO_INVALIDO:
+            raise ValueError(f"Documento inválido: {numero_documento!r}")
+        self.eliminados.discard(documento)
+        if not self._en_base(documento):
+            self.agregados.add(documento)
+        return documento
+    
+    def eliminar(self, numero_documento) -> int:
+        """Quitar un documento en O(1); devuelve el documento normalizado"""
+        documento = normalizar_documento(numero_documento)
+        self.agregados.discard(documento)
+        if self._en_base(documento):
+            self.eliminados.add(documento)
+        return documento
+    
+    def contiene_lote(self, documentos) -> np.ndarray:
+        """Pertenencia para un array de documentos (array de bool)"""
+        documentos = normalizar_documentos(documentos)
+        if len(self.documentos) == 0:
+            resultado = np.zeros(len(documentos), dtype=bool)
+        else:
+            posiciones = np.minimum(np.searchsorted(self.documentos, documentos), len(self.documentos) - 1)
+            resultado = self.documentos[posiciones] == documentos
+        agregados, eliminados = self.agregados.copy(), self.eliminados.copy()
+        if agregados:
+            resultado |= np.isin(documentos, np.fromiter(agregados, dtype=np.int64, count=len(agregados)))
+        if eliminados:
+            resultado &= ~np.isin(documentos, np.fromiter(eliminados, dtype=np.int64, count=len(eliminados)))
+        return resultado
+    
+    def compactada(self):
+        """Nueva blacklist con los cambios incrementales incorporados al array ordenado"""
+        documentos = self.documentos
+        eliminados = self.eliminados.copy()
+        if eliminados:
+            documentos = documentos[~np.isin(documentos, np.fromiter(eliminados, dtype=np.int64, count=len(eliminados)))]
+        agregados = np.fromiter(self.agregados.copy(), dtype=np.int64)
+        return BlacklistOrdenada(np.union1d(documentos, agregados).astype(np.int64))
+    
+    def bytes_memoria(self) -> int:
+        return int(self.documentos.nbytes) + sys.getsizeof(self.agregados) + sys.getsizeof(self.eliminados)
 
 class agente_blacklist:
-    def __init__(self, data: pd.DataFrame):
+    def __init__(self, data: pd.DataFrame, blacklist: BlacklistOrdenada = None):
         """
         Inicializar agente blacklist
         CODIGO_RAZON_CONTRACARGO = 83 indica fraude (blacklist)
         """
         self.data = data
+        if blacklist is not None:
+            # Ya construida (p.ej. desde el snapshot)
+            self.blacklist = blacklist
+            print(f"🚨 Blacklist inicializada: {len(self.blacklist):,} clientes con fraude previo")
         # Crear blacklist: clientes con código 83 (fraude)
-        if 'CODIGO_RAZON_CONTRACARGO' in data.columns and 'NUMERO_DOCUMENTO' in data.columns:
+        elif 'CODIGO_RAZON_CONTRACARGO' in data.columns and 'NUMERO_DOCUMENTO' in data.columns:
             # Filtrar registros con código 83 (fraude) - probar tanto string como número
             fraud_records = data[(data['CODIGO_RAZON_CONTRACARGO'] == 83) | (data['CODIGO_RAZON_CONTRACARGO'] == '83')]
-            blacklist_clientes = fraud_records['NUMERO_DOCUMENTO'].unique()
             
-            # Convert all to strings for consistent comparison
-            self.blacklist = set(str(cliente) for cliente in blacklist_clientes)
+            # Documentos normalizados a int64 para comparar igual enteros y strings
+            self.blacklist = BlacklistOrdenada.desde_documentos(fraud_records['NUMERO_DOCUMENTO'].to_numpy())
             print(f"🚨 Blacklist inicializada: {len(self.blacklist):,} clientes con fraude previo")
-            print(f"🔍 Primeros 10 clientes en blacklist: {list(self.blacklist)[:10]}")
+            print(f"🔍 Primeros 10 clientes en blacklist: {self.blacklist.documentos[:10].tolist()}")
         else:
-            self.blacklist = set()
+            self.blacklist = BlacklistOrdenada(np.empty(0, dtype=np.int64))
             print("⚠️ No se pudieron cargar datos de blacklist - columnas faltantes")
     
     def verificar_cliente(self, numero_documento: str) -> dict:
@@ -31,4 +116,16 @@ class agente_blacklist:
             'en_blacklist': en_blacklist,
             'probabilidad_fraude': 1.0 if en_blacklist else 0.0,
             'razon': 'Cliente con fraude previo (código 83)' if en_blacklist else 'Cliente sin fraudes previos'
-        }
\ No newline at end of file
+        }
+    
+    def verificar_lote(self, documentos) -> np.ndarray:
+        """Pertenencia a la blacklist para un lote de documentos (array de bool)"""
+        return self.blacklist.contiene_lote(documentos)
+    
+    def agregar(self, numero_documento) -> int:
+        """Agregar un cliente a la blacklist (fraude confirmado)"""
+        return self.blacklist.agregar(numero_documento)
+    
+    def eliminar(self, numero_documento) -> int:
+        """Quitar un cliente de la blacklist"""
+        return self.blacklist.eliminar(numero_documento)
\ No newline at end of file
@@ -1,6 +1,30 @@
 """Agente para detectar fraude basado en promedio de importes fraudulentos"""
+import math
+
 import pandas as pd
 import numpy as np
+from agents.redondeo import redondear
+
+# Bandas de analizar_importe en orden de prioridad
+BANDA_100X, BANDA_10X, BANDA_20PCT, BANDA_50PCT, BANDA_LEJANA, BANDA_SIN_DATOS = range(6)
+PROBABILIDADES_BANDA = [0.9, 0.7, 0.8, 0.6]
+RAZONES_BANDA = [
+    'Importe ${importe:,.2f} extremadamente alto (100x promedio fraudulento)',
+    'Importe ${importe:,.2f} muy alto (10x promedio fraudulento)',
+    'Importe ${importe:,.2f} muy cercano al promedio fraudulento ${promedio:,.2f}',
+    'Importe ${importe:,.2f} cercano al promedio fraudulento',
+    'Importe ${importe:,.2f} alejado del promedio fraudulento',
+    'Sin datos de fraude para comparar'
+]
+
+def importe_valido(importe) -> bool:
+    """Un importe fraudulento entra al promedio solo si es un número finito y positivo"""
+    try:
+        importe = float(importe)
+    except (TypeError, ValueError):
+        return False
+    return math.isfinite(importe) and importe > 0
+
 
 class agente_fraude:
     def __init__(self, data: pd.DataFrame):
@@ -14,9 +38,11 @@ class agente_fraude:
             # Filtrar código 83 como número o string
             fraud_data = data[(data['CODIGO_RAZON_CONTRACARGO'] == 83) | (data['CODIGO_RAZON_CONTRACARGO'] == '83')]
             self.promedio_fraude = fraud_data['importe'].mean() if not fraud_data.empty else 1000
+            self.conteo_fraude = int(fraud_data['importe'].count())
             print(f"📊 Promedio fraudulento calculado: ${self.promedio_fraude:,.2f} ({len(fraud_data):,} registros)")
         else:
             self.promedio_fraude = 1000
+            self.conteo_fraude = 0
             print("⚠️ Usando promedio por defecto: $1,000")
     
     def analizar_importe(self, importe: float) -> dict:
@@ -29,7 +55,7 @@ class agente_fraude:
                 'agente': 'fraude',
                 'probabilidad_fraude': 0.1,
                 'promedio_fraude': 0,
-                'razon': 'Sin datos de fraude para comparar'
+                'razon': RAZONES_BANDA[BANDA_SIN_DATOS]
             }
         porc_80 = self.promedio_fraude *0.8
         porc_50 = self.promedio_fraude *0.5
@@ -55,23 +81,69 @@ class agente_fraude:
         # Very high amounts should be flagged as suspicious
         if importe > self.promedio_fraude * 100:  # 100x average
             probabilidad = 0.9
-            razon = f'Importe ${importe:,.2f} extremadamente alto (100x promedio fraudulento)'
+            razon = self.razon(importe, BANDA_100X)
         elif importe > self.promedio_fraude * 10:  # 10x average
             probabilidad = 0.7
-            razon = f'Importe ${importe:,.2f} muy alto (10x promedio fraudulento)'
+            razon = self.razon(importe, BANDA_10X)
         elif diferencia_porcentual <= 0.2:  # Within 20% of fraud average
             probabilidad = 0.8
-            razon = f'Importe ${importe:,.2f} muy cercano al promedio fraudulento ${self.promedio_fraude:,.2f}'
+            razon = self.razon(importe, BANDA_20PCT)
         elif diferencia_porcentual <= 0.5:  # Within 50% of fraud average
             probabilidad = 0.6
-            razon = f'Importe ${importe:,.2f} cercano al promedio fraudulento'
+            razon = self.razon(importe, BANDA_50PCT)
         else:
             probabilidad = max(0.1, 0.5 - (diferencia_porcentual * 0.1))
-            razon = f'Importe ${importe:,.2f} alejado del promedio fraudulento'
+            razon = self.razon(importe, BANDA_LEJANA)
         return {
             'agente': 'fraude',
             'probabilidad_fraude': round(probabilidad, 2),
             'promedio_fraude': round(self.promedio_fraude, 2),
             #'diferencia_porcentual': round(diferencia * 100, 1),
             'razon': razon
-        }
\ No newline at end of file
+        }
+    
+    def registrar_importe(self, importe: float) -> bool:
+        """Incorporar un nuevo importe fraudulento al promedio en O(1); ignora importes inválidos"""
+        if not importe_valido(importe):
+            # Un NaN o inf dejaría el promedio inutilizable para siempre (el log se reaplica)
+            print(f"⚠️ Importe inválido {importe!r}, no se incorpora al promedio de fraude")
+            return False
+        if self.conteo_fraude == 0:
+            self.promedio_fraude = float(importe)
+        else:
+            self.promedio_fraude += (float(importe) - self.promedio_fraude) / (self.conteo_fraude + 1)
+        self.conteo_fraude += 1
+        return True
+    
+    def razon(self, importe: float, banda: int) -> str:
+        """Texto explicativo de una banda; se construye solo cuando se necesita"""
+        return RAZONES_BANDA[banda].format(importe=importe, promedio=self.promedio_fraude)
+    
+    def clasificar_lote(self, importes) -> tuple:
+        """
+        Versión vectorizada de analizar_importe: (bandas, probabilidades) para un
+        array de importes, con exactamente las mismas probabilidades que la versión escalar
+        """
+        importes = np.asarray(importes, dtype=np.float64)
+        if self.promedio_fraude == 0:
+            return (np.full(len(importes), BANDA_SIN_DATOS, dtype=np.int8),
+                    np.full(len(importes), 0.1))
+        
+        promedio = self.promedio_fraude
+        diferencia_porcentual = np.abs(importes - promedio) / promedio
+        condiciones = [
+            importes > promedio * 100,
+            importes > promedio * 10,
+            diferencia_porcentual <= 0.2,
+            diferencia_porcentual <= 0.5
+        ]
+        bandas = np.select(condiciones, [BANDA_100X, BANDA_10X, BANDA_20PCT, BANDA_50PCT],
+                           default=BANDA_LEJANA).astype(np.int8)
+        # fmax ignora NaN igual que max(0.1, nan) en Python
+        cola = np.fmax(0.1, 0.5 - diferencia_porcentual * 0.1)
+        probabilidades = np.select(condiciones, PROBABILIDADES_BANDA, default=cola)
+        return bandas, redondear(probabilidades, 2)
+    
+    def analizar_lote(self, importes) -> np.ndarray:
+        """Probabilidades de fraude para un lote de importes (mismo orden)"""
+        return self.clasificar_lote(importes)[1]
\ No newline at end of file
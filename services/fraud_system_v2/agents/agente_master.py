@@ -1,92 +1,243 @@
 """Agente master que centraliza las salidas de todos los agentes"""
-import boto3
+import numpy as np
 import pandas as pd
 import os
-from agents.agente_blacklist import agente_blacklist
-from agents.agente_fraude import agente_fraude
-from agents.agente_segmento import agente_segmento
+import time
+from time import perf_counter_ns
+from agents.agente_blacklist import agente_blacklist, BlacklistOrdenada
+from agents.agente_fraude import agente_fraude, importe_valido
+from agents.agente_segmento import agente_segmento, IndiceSegmentos
+from agents.redondeo import redondear
+from agents.metricas import LATENCIA_ETAPAS
+from agents.registro_agentes import DefinicionAgente, RegistroAgentes, AGENTES_ADICIONALES
+from data.cargador_csv import CargadorCSV
+from data.formato import detectar_formato
+from data.fuentes import crear_fuente
+from data.registro_blacklist import OP_AGREGAR, OP_ELIMINAR
+from data.snapshot import SnapshotStore, directorio_por_defecto
+
+COLUMNAS_SNAPSHOT = ['NUMERO_DOCUMENTO', 'importe', 'CODIGO_RAZON_CONTRACARGO']
+
+# (probabilidad mínima, decisión, acción) en orden descendente; por debajo de todas: OK
+UMBRALES_DECISION = [
+    (0.8, 'BLOQUEAR', 'Bloquear transacción inmediatamente'),
+    (0.5, 'REVISAR', 'Requiere revisión manual'),
+    (0.3, 'MONITOREAR', 'Monitorear actividad del cliente')
+]
+DECISION_POR_DEFECTO = ('OK', 'Transacción OK')
+DECISIONES = [decision for _, decision, _ in UMBRALES_DECISION] + [DECISION_POR_DEFECTO[0]]
+ACCIONES = [accion for _, _, accion in UMBRALES_DECISION] + [DECISION_POR_DEFECTO[1]]
+
+# Pesos por defecto de los agentes propios para el cálculo final
+PESO_BLACKLIST = 0.5   # Mayor peso para blacklist
+PESO_FRAUDE = 0.3      # Peso medio para análisis de fraude
+PESO_SEGMENTO = 0.2    # Menor peso para segmento
+AGENTES_VECTORIZADOS = ('blacklist', 'fraude', 'segmento')
+
+# Serie de latencia resuelta una sola vez; la de cada agente la registra RegistroAgentes
+_LATENCIA_PROBABILIDAD = LATENCIA_ETAPAS.serie('probabilidad_final')
+
+def fuente_por_defecto():
+    """Fuente configurada por entorno: DATA_SOURCE_URI, LOCAL_DATA_FILE o S3_BUCKET/S3_FILE"""
+    return crear_fuente(
+        os.getenv('S3_BUCKET', 'fraud-detection-purchase-history-tf'),
+        os.getenv('S3_FILE', 'BaseFinal.csv')
+    )
 
 class agente_master:
-    def __init__(self):
-        """Inicializar agente master y cargar datos de S3"""
-        self.s3_client = boto3.client('s3')
+    def __init__(self, fuente=None, cargador: CargadorCSV = None, version: str = None, solo_snapshot: bool = False):
+        """
+        Inicializar agente master y cargar datos (snapshot local, S3 o archivo local).
+        cargador permite consultar el progreso del parseo desde otro hilo.
+        version evita consultar la fuente; con solo_snapshot se adjunta el snapshot
+        de esa versión (mmap, sin copiar) o falla, pero nunca se parsea el CSV.
+        """
         self.bucket = os.getenv('S3_BUCKET', 'fraud-detection-purchase-history-tf')
         self.file_key = os.getenv('S3_FILE', 'BaseFinal.csv')
+        self.fuente = fuente or fuente_por_defecto()
+        self.cargador = cargador or CargadorCSV()
+        self.version_datos = version
+        self.solo_snapshot = solo_snapshot
+        self.cargado_en = None
+        self.estadisticas_carga = {}
+        self.indice_segmentos = None
+        self.blacklist = None
+        self.snapshot_store = None
+        # Último seq del log de blacklist ya incluido en el snapshot / aplicado en memoria
+        self.registro_seq_snapshot = 0
+        self.registro_seq = 0
         
         # Cargar datos
-        print("📥 Cargando datos desde S3...")
-        self.data = self._cargar_datos_s3()
+        print(f"📥 Cargando datos desde {self.fuente.descripcion()}...")
+        self.data = self._cargar_datos()
         print(f"✅ Datos cargados: {len(self.data)} registros")
         
         # Inicializar agentes especializados
         print("🤖 Inicializando agentes...")
-        self.agente_blacklist = agente_blacklist(self.data)
+        self.agente_blacklist = agente_blacklist(self.data, self.blacklist)
         self.agente_fraude = agente_fraude(self.data)
-        self.agente_segmento = agente_segmento(self.data)
+        self.agente_segmento = agente_segmento(self.data, self.indice_segmentos)
         
-        # Pesos para cálculo final
-        self.pesos = {
-            'blacklist': 0.5,   # Mayor peso para blacklist
-            'fraude': 0.3,      # Peso medio para análisis de fraude
-            'segmento': 0.2     # Menor peso para segmento
-        }
+        # Registro: los agentes propios corren en línea (CPU, microsegundos);
+        # los adicionales pueden ser async o tener timeout y corren en paralelo
+        self.registro_agentes = RegistroAgentes([
+            DefinicionAgente('blacklist', PESO_BLACKLIST, lambda doc, importe: self.agente_blacklist.verificar_cliente(doc)),
+            DefinicionAgente('fraude', PESO_FRAUDE, lambda doc, importe: self.agente_fraude.analizar_importe(importe)),
+            DefinicionAgente('segmento', PESO_SEGMENTO, lambda doc, importe: self.agente_segmento.analizar_segmento(doc))
+        ] + AGENTES_ADICIONALES)
+        # Umbrales de decisión de esta instancia (ajustables, p.ej. desde backtest.py)
+        self.umbrales = list(UMBRALES_DECISION)
         
         print(f"✅ Agentes inicializados exitosamente")
         print(f"🚫 Blacklist: {len(self.agente_blacklist.blacklist)} clientes")
         print(f"💰 Promedio fraude: ${self.agente_fraude.promedio_fraude:.2f}")
         print(f"⚖️ Pesos configurados: {self.pesos}")
+        self.registro_seq = self.registro_seq_snapshot
+        self.cargado_en = time.time()
         print(f"🎆 Sistema Multi-Agente listo para análisis")
     
-    def _cargar_datos_s3(self) -> pd.DataFrame:
-        """Cargar datos desde S3 con separador correcto"""
-        print(f"🔗 Conectando a S3...")
-        print(f"📦 Bucket: {self.bucket}")
-        print(f"📄 Archivo: {self.file_key}")
+    def _cargar_datos(self) -> pd.DataFrame:
+        """Usar el snapshot local si coincide con la versión de la fuente, si no parsear el CSV"""
+        directorio = directorio_por_defecto()
+        store = SnapshotStore(directorio) if directorio else None
+        
+        # La versión también identifica los datos cargados para el refresco en caliente
+        if self.version_datos is None:
+            try:
+                self.version_datos = self.fuente.version()
+            except Exception as e:
+                print(f"⚠️ No se pudo obtener la versión de la fuente, se omite el snapshot: {e}")
+                store = None
+        self.snapshot_store = store
+        
+        if store:
+            snapshot = store.cargar(self.version_datos)
+            if snapshot:
+                columnas, meta = snapshot
+                print(f"⚡ Snapshot local {store.ruta(self.version_datos)} (versión {self.version_datos}), sin re-parsear")
+                self.estadisticas_carga = meta.get('estadisticas_carga', {})
+                self.registro_seq_snapshot = meta.get('registro_seq', 0)
+                if 'SEGMENTO_DOCUMENTO' in columnas:
+                    self.indice_segmentos = IndiceSegmentos(
+                        columnas['SEGMENTO_DOCUMENTO'], columnas['SEGMENTO_CODIGO'], ordenado=True
+                    )
+                if 'BLACKLIST' in columnas:
+                    self.blacklist = BlacklistOrdenada(columnas['BLACKLIST'])
+                # copy=False: las columnas quedan sobre el mmap, compartidas entre procesos
+                return pd.DataFrame(
+                    {columna: columnas[columna] for columna in COLUMNAS_SNAPSHOT if columna in columnas}, copy=False
+                )
+        
+        if self.solo_snapshot:
+            raise FileNotFoundError(f"No hay snapshot de la versión {self.version_datos} en {directorio or '(desactivado)'}")
+        data = self._parsear_fuente()
+        # Todas las filas parseadas tienen código 83: la blacklist son sus documentos únicos
+        self.blacklist = BlacklistOrdenada.desde_documentos(data['NUMERO_DOCUMENTO'].to_numpy())
+        
+        if store:
+            try:
+                ruta = self._guardar_snapshot(data, self.blacklist, 0)
+                print(f"💾 Snapshot guardado en {ruta}")
+            except OSError as e:
+                print(f"⚠️ No se pudo guardar el snapshot: {e}")
+        
+        return data
+    
+    def _guardar_snapshot(self, data: pd.DataFrame, blacklist: BlacklistOrdenada, registro_seq: int) -> str:
+        """Escribir el snapshot de la versión actual con los datos, índices y blacklist dados"""
+        columnas = {columna: data[columna].to_numpy() for columna in COLUMNAS_SNAPSHOT if columna in data.columns}
+        if self.indice_segmentos is not None:
+            columnas['SEGMENTO_DOCUMENTO'] = self.indice_segmentos.documentos
+            columnas['SEGMENTO_CODIGO'] = self.indice_segmentos.codigos
+        columnas['BLACKLIST'] = blacklist.documentos
+        return self.snapshot_store.guardar(
+            self.version_datos,
+            columnas,
+            {
+                'fuente': self.fuente.descripcion(),
+                'filas': len(data),
+                'estadisticas_carga': self.estadisticas_carga,
+                'registro_seq': registro_seq
+            }
+        )
+    
+    def aplicar_registro(self, entradas) -> int:
+        """
+        Aplicar entradas del log de blacklist en orden. Las que ya están en el
+        snapshot (o ya se aplicaron) se ignoran por su seq. Devuelve cuántas se aplicaron.
+        """
+        aplicadas = 0
+        for entrada in entradas:
+            if entrada['seq'] <= self.registro_seq:
+                continue
+            if entrada['op'] == OP_AGREGAR:
+                self.agente_blacklist.agregar(entrada['documento'])
+                if entrada.get('importe') is not None:
+                    self.agente_fraude.registrar_importe(entrada['importe'])
+            elif entrada['op'] == OP_ELIMINAR:
+                self.agente_blacklist.eliminar(entrada['documento'])
+            self.registro_seq = entrada['seq']
+            aplicadas += 1
+        return aplicadas
+    
+    def compactar_registro(self, entradas: list):
+        """
+        Incorporar al snapshot de la versión actual las entradas del log ya aplicadas
+        (seq > registro_seq_snapshot). Devuelve el último seq compactado, o None si no
+        hay snapshot donde guardarlo. El llamador debe impedir aplicar entradas mientras tanto.
+        """
+        if self.snapshot_store is None or self.version_datos is None:
+            return None
+        entradas = [e for e in entradas if self.registro_seq_snapshot < e['seq'] <= self.registro_seq]
+        if not entradas:
+            return self.registro_seq_snapshot
+        
+        nuevas = [e for e in entradas if e['op'] == OP_AGREGAR and importe_valido(e.get('importe'))]
+        data = self.data
+        if nuevas:
+            data = pd.concat([data, pd.DataFrame({
+                'NUMERO_DOCUMENTO': np.array([e['documento'] for e in nuevas], dtype=np.int64),
+                'importe': np.array([e['importe'] for e in nuevas], dtype=np.float64),
+                'CODIGO_RAZON_CONTRACARGO': np.full(len(nuevas), 83, dtype=np.int16)
+            })], ignore_index=True)
+        blacklist = self.agente_blacklist.blacklist.compactada()
+        
+        ruta = self._guardar_snapshot(data, blacklist, self.registro_seq)
+        # Solo referencias nuevas: las requests en curso siguen con las anteriores
+        self.data = data
+        self.agente_blacklist.blacklist = blacklist
+        self.registro_seq_snapshot = self.registro_seq
+        print(f"🗜️ {len(entradas):,} cambios de blacklist compactados en {ruta}")
+        return self.registro_seq_snapshot
+    
+    def _parsear_fuente(self) -> pd.DataFrame:
+        """Descargar y parsear el CSV completo desde la fuente"""
+        print(f"🔗 Fuente: {self.fuente.descripcion()}")
         
         try:
-            print(f"📥 Descargando archivo desde S3...")
-            response = self.s3_client.get_object(Bucket=self.bucket, Key=self.file_key)
-            print(f"✅ Archivo descargado exitosamente")
-            
-            print(f"📊 Parseando CSV con estructura personalizada...")
-            import io
-            csv_content = response['Body'].read().decode('utf-8')
-            lines = csv_content.strip().split('\n')
+            cargador = self.cargador
+            if cargador.formato is None:
+                try:
+                    # Lectura por rango de los primeros KB, cacheada por versión al lado de los snapshots
+                    cargador.formato = detectar_formato(self.fuente, self.version_datos, directorio_por_defecto())
+                    print(f"🧾 Formato detectado: {cargador.formato}")
+                except Exception as e:
+                    print(f"⚠️ No se pudo detectar el formato por rango, se infiere del encabezado: {e}")
             
-            # Procesar cada línea para extraer los datos estructurados
-            processed_records = []
-            for line_num, line in enumerate(lines[1:], 1):  # Skip header
-                if ';83;' in line:  # Solo procesar líneas con código 83 (fraude)
-                    try:
-                        # Extraer datos del primer campo quoted
-                        import re
-                        first_quote_match = re.search(r'"([^"]+)"', line)
-                        if first_quote_match:
-                            first_section = first_quote_match.group(1)
-                            parts = first_section.split(';')
-                            if len(parts) >= 3:
-                                numero_documento = parts[0]
-                                importe_str = parts[1]
-                                # Convert importe to float, handle any conversion errors
-                                try:
-                                    importe = float(importe_str.replace(',', ''))
-                                except (ValueError, TypeError):
-                                    importe = 0.0  # Default value for invalid amounts
-                                    print(f"⚠️ Invalid amount '{importe_str}' for document {numero_documento}")
-                                
-                                # El código 83 está en la sección UTC, confirmamos que está presente
-                                processed_records.append({
-                                    'NUMERO_DOCUMENTO': numero_documento,
-                                    'importe': importe,
-                                    'CODIGO_RAZON_CONTRACARGO': 83  # Confirmed by ';83;' presence
-                                })
-                    except Exception as e:
-                        print(f"⚠️ Error procesando línea {line_num}: {e}")
-                        continue
+            print(f"📥 Abriendo archivo...")
+            body = self.fuente.abrir()
+            print(f"✅ Stream abierto")
             
-            # Crear DataFrame con registros procesados
-            data = pd.DataFrame(processed_records)
-            print(f"✅ CSV procesado - encontrados {len(processed_records)} registros con código 83")
+            print(f"📊 Parseando CSV en streaming...")
+            try:
+                data = cargador.cargar(body)
+            finally:
+                body.close()
+            self.indice_segmentos = IndiceSegmentos(*cargador.indice_segmentos(), ordenado=True)
+            # Los arrays ya están en el índice; el cargador puede seguir referenciado para /ready
+            cargador.liberar_segmentos()
+            self.estadisticas_carga = cargador.estadisticas()
+            print(f"✅ CSV procesado - encontrados {len(data):,} registros con código 83")
             
             print(f"✅ CSV parseado exitosamente")
             print(f"📊 Registros cargados: {len(data):,}")
@@ -106,12 +257,17 @@ class agente_master:
             return data
             
         except Exception as e:
-            print(f"❌ Error crítico cargando S3: {e}")
+            print(f"❌ Error crítico cargando datos: {e}")
             print(f"🔍 Tipo de error: {type(e).__name__}")
             import traceback
             print(f"📋 Stack trace:")
             traceback.print_exc()
-            raise Exception(f"No se pudo cargar datos de S3: {e}")
+            raise Exception(f"No se pudo cargar datos de {self.fuente.descripcion()}: {e}")
+    
+    @property
+    def pesos(self) -> dict:
+        """Peso de cada agente registrado, en orden de registro"""
+        return self.registro_agentes.pesos()
     
     def calcular_probabilidad_final(self, resultados: dict) -> float:
         """Calcular probabilidad final ponderada"""
@@ -120,41 +276,92 @@ class agente_master:
             return 1.0
         
         # Calcular promedio ponderado
-        probabilidad_total = (
-            resultados['blacklist']['probabilidad_fraude'] * self.pesos['blacklist'] +
-            resultados['fraude']['probabilidad_fraude'] * self.pesos['fraude'] +
-            resultados['segmento']['probabilidad_fraude'] * self.pesos['segmento']
+        pesos = self.pesos
+        probabilidad_total = sum(
+            resultados[nombre]['probabilidad_fraude'] * peso for nombre, peso in pesos.items()
         )
         
         return round(probabilidad_total, 3)
     
     def generar_decision(self, probabilidad: float) -> dict:
         """Generar decisión final basada en probabilidad"""
-        if probabilidad >= 0.8:
-            return {'decision': 'BLOQUEAR', 'accion': 'Bloquear transacción inmediatamente'}
-        elif probabilidad >= 0.5:
-            return {'decision': 'REVISAR', 'accion': 'Requiere revisión manual'}
-        elif probabilidad >= 0.3:
-            return {'decision': 'MONITOREAR', 'accion': 'Monitorear actividad del cliente'}
-        else:
-            return {'decision': 'OK', 'accion': 'Transacción OK'}
+        for umbral, decision, accion in self.umbrales:
+            if probabilidad >= umbral:
+                return {'decision': decision, 'accion': accion}
+        return {'decision': DECISION_POR_DEFECTO[0], 'accion': DECISION_POR_DEFECTO[1]}
+    
+    def calcular_probabilidad_final_lote(self, probabilidades: dict, en_blacklist: np.ndarray) -> np.ndarray:
+        """Versión vectorizada de calcular_probabilidad_final (mismos resultados)"""
+        pesos = self.pesos
+        probabilidad_total = sum(probabilidades[nombre] * peso for nombre, peso in pesos.items())
+        return np.where(en_blacklist, 1.0, redondear(probabilidad_total, 3))
+    
+    def generar_decision_lote(self, probabilidades: np.ndarray) -> np.ndarray:
+        """Índice en DECISIONES/ACCIONES para cada probabilidad del lote"""
+        condiciones = [probabilidades >= umbral for umbral, _, _ in self.umbrales]
+        return np.select(condiciones, list(range(len(self.umbrales))), default=len(self.umbrales))
+    
+    def analizar_lote(self, documentos: list, importes) -> dict:
+        """
+        Análisis de un lote de transacciones con los agentes vectorizados.
+        Devuelve arrays alineados con la entrada; el detalle por fila se
+        obtiene bajo demanda con detalle_lote().
+        """
+        importes = np.asarray(importes, dtype=np.float64)
+        en_blacklist = self.agente_blacklist.verificar_lote(documentos)
+        bandas_fraude, probabilidad_fraude = self.agente_fraude.clasificar_lote(importes)
+        segmentos, probabilidad_segmento = self.agente_segmento.analizar_lote(documentos)
+        
+        probabilidades = {
+            'blacklist': en_blacklist.astype(np.float64),
+            'fraude': probabilidad_fraude,
+            'segmento': probabilidad_segmento
+        }
+        adicionales = [nombre for nombre in self.registro_agentes.definiciones if nombre not in AGENTES_VECTORIZADOS]
+        if adicionales:
+            probabilidades.update(self.registro_agentes.ejecutar_lote(documentos, importes, adicionales))
+        probabilidad_final = self.calcular_probabilidad_final_lote(probabilidades, en_blacklist)
+        
+        return {
+            'numero_documento': documentos,
+            'importe': importes,
+            'en_blacklist': en_blacklist,
+            'segmento': segmentos,
+            'banda_fraude': bandas_fraude,
+            'probabilidades': probabilidades,
+            'probabilidad_final': probabilidad_final,
+            'decision': self.generar_decision_lote(probabilidad_final),
+            'pesos_utilizados': self.pesos
+        }
+    
+    def detalle_lote(self, resultado_lote: dict, i: int) -> dict:
+        """analisis_detallado de la fila i de un lote, con el formato de analizar_transaccion"""
+        numero_documento = resultado_lote['numero_documento'][i]
+        importe = float(resultado_lote['importe'][i])
+        detalle = {
+            'blacklist': self.agente_blacklist.verificar_cliente(numero_documento),
+            'fraude': {
+                'agente': 'fraude',
+                'probabilidad_fraude': float(resultado_lote['probabilidades']['fraude'][i]),
+                'promedio_fraude': round(self.agente_fraude.promedio_fraude, 2),
+                'razon': self.agente_fraude.razon(importe, int(resultado_lote['banda_fraude'][i]))
+            },
+            'segmento': self.agente_segmento.analizar_segmento(numero_documento)
+        }
+        for nombre, probabilidades in resultado_lote['probabilidades'].items():
+            if nombre not in detalle:
+                detalle[nombre] = {'agente': nombre, 'probabilidad_fraude': float(probabilidades[i]), 'razon': f'Agente {nombre}'}
+        return detalle
     
     def analizar_transaccion(self, numero_documento: str, importe: float) -> dict:
         """Análisis completo de transacción usando todos los agentes"""
-        # Ejecutar análisis con cada agente
-        resultado_blacklist = self.agente_blacklist.verificar_cliente(numero_documento)
-        resultado_fraude = self.agente_fraude.analizar_importe(importe)
-        resultado_segmento = self.agente_segmento.analizar_segmento(numero_documento)
-        
-        # Consolidar resultados
-        resultados = {
-            'blacklist': resultado_blacklist,
-            'fraude': resultado_fraude,
-            'segmento': resultado_segmento
-        }
+        # Ejecutar análisis con cada agente registrado (resultados en orden de registro)
+        resultados, tiempos_agentes = self.registro_agentes.ejecutar(numero_documento, importe)
         
         # Calcular probabilidad final
+        t0 = perf_counter_ns()
         probabilidad_final = self.calcular_probabilidad_final(resultados)
+        _LATENCIA_PROBABILIDAD.observar_ns(perf_counter_ns() - t0)
         
         # Generar decisión
         decision_info = self.generar_decision(probabilidad_final)
@@ -166,5 +373,6 @@ class agente_master:
             'decision': decision_info['decision'],
             'accion_recomendada': decision_info['accion'],
             'analisis_detallado': resultados,
-            'pesos_utilizados': self.pesos
+            'pesos_utilizados': self.pesos,
+            'tiempos_agentes_ms': tiempos_agentes
         }
\ No newline at end of file
@@ -1,14 +1,72 @@
 """Agente para analizar riesgo por segmento de cliente"""
+import numpy as np
 import pandas as pd
+from data.documentos import normalizar_documento, normalizar_documentos
+
+# Código compacto -> segmento (bit 1 = prepagos > 0, bit 2 = pospagos > 0)
+SEGMENTOS = ('sin_datos', 'Segmento_A', 'Segmento_B', 'Segmento_C')
+
+
+class IndiceSegmentos:
+    def __init__(self, documentos: np.ndarray, codigos: np.ndarray, ordenado: bool = False):
+        """
+        Índice ordenado documento (int64) -> código de segmento.
+        Si un documento aparece varias veces se conserva la primera aparición.
+        Con ordenado=True los arrays (p.ej. del snapshot) se usan tal cual, sin copiarlos.
+        """
+        if ordenado:
+            self.documentos = documentos
+            self.codigos = codigos
+            return
+        documentos = normalizar_documentos(documentos)
+        codigos = np.asarray(codigos, dtype=np.int8)
+        unicos, primeras = np.unique(documentos, return_index=True)
+        self.documentos = unicos
+        self.codigos = codigos[primeras]
+    
+    @classmethod
+    def desde_dataframe(cls, data: pd.DataFrame):
+        """Construir el índice a partir de CANT_PREPAGOS/CANT_POSPAGOS del DataFrame"""
+        if not {'NUMERO_DOCUMENTO', 'CANT_PREPAGOS', 'CANT_POSPAGOS'}.issubset(data.columns):
+            return cls(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int8))
+        prepagos = pd.to_numeric(data['CANT_PREPAGOS'], errors='coerce').fillna(0).to_numpy() > 0
+        pospagos = pd.to_numeric(data['CANT_POSPAGOS'], errors='coerce').fillna(0).to_numpy() > 0
+        codigos = prepagos.astype(np.int8) | (pospagos.astype(np.int8) << 1)
+        return cls(data['NUMERO_DOCUMENTO'].to_numpy(), codigos)
+    
+    def __len__(self):
+        return len(self.documentos)
+    
+    def buscar(self, numero_documento) -> int:
+        """Código de segmento del cliente en O(log n); 0 si no existe"""
+        documento = normalizar_documento(numero_documento)
+        i = int(np.searchsorted(self.documentos, documento))
+        if i < len(self.documentos) and int(self.documentos[i]) == documento:
+            return int(self.codigos[i])
+        return 0
+    
+    def buscar_lote(self, documentos) -> np.ndarray:
+        """Códigos de segmento para un array de documentos"""
+        documentos = normalizar_documentos(documentos)
+        if len(self.documentos) == 0:
+            return np.zeros(len(documentos), dtype=np.int8)
+        posiciones = np.searchsorted(self.documentos, documentos)
+        posiciones = np.minimum(posiciones, len(self.documentos) - 1)
+        encontrados = self.documentos[posiciones] == documentos
+        return np.where(encontrados, self.codigos[posiciones], 0).astype(np.int8)
+
 
 class agente_segmento:
-    def __init__(self, data: pd.DataFrame):
+    def __init__(self, data: pd.DataFrame, indice: IndiceSegmentos = None):
         """
         Inicializar agente segmento
         CANT_PREPAGOS > 0 = Segmento_A (50% probabilidad)
         CANT_POSPAGOS > 0 = Segmento_B (20% probabilidad)
+        El segmento de cada cliente se materializa una sola vez en un índice ordenado.
         """
         self.data = data
+        self.indice = indice if indice is not None else IndiceSegmentos.desde_dataframe(data)
+        print(f"🗂️ Índice de segmentos: {len(self.indice):,} clientes")
         # Probabilidades por segmento
         self.probabilidades = {
             'Segmento_A': 0.5,
@@ -19,27 +77,7 @@ class agente_segmento:
     
     def determinar_segmento(self, numero_documento: str) -> str:
         """Determinar segmento del cliente basado en CANT_PREPAGOS y CANT_POSPAGOS"""
-        if 'NUMERO_DOCUMENTO' not in self.data.columns:
-            return 'sin_datos'
-        
-        cliente_data = self.data[self.data['NUMERO_DOCUMENTO'] == numero_documento]
-        
-        if cliente_data.empty:
-            return 'sin_datos'
-        
-        # Obtener cantidades (usar primera fila si hay múltiples)
-        prepagos = cliente_data['CANT_PREPAGOS'].iloc[0] if 'CANT_PREPAGOS' in cliente_data.columns else 0
-        pospagos = cliente_data['CANT_POSPAGOS'].iloc[0] if 'CANT_POSPAGOS' in cliente_data.columns else 0
-        
-        # Determinar segmento
-        if prepagos > 0 and pospagos > 0:
-            return 'Segmento_C'
-        elif prepagos > 0:
-            return 'Segmento_A'
-        elif pospagos > 0:
-            return 'Segmento_B'
-        else:
-            return 'sin_datos'
+        return SEGMENTOS[self.indice.buscar(numero_documento)]
     
     def analizar_segmento(self, numero_documento: str) -> dict:
         """Analizar riesgo basado en segmento del cliente"""
@@ -58,4 +96,10 @@ class agente_segmento:
             'segmento': segmento,
             'probabilidad_fraude': probabilidad,
             'razon': razones[segmento]
-        }
\ No newline at end of file
+        }
+    
+    def analizar_lote(self, documentos) -> tuple:
+        """Códigos de segmento y probabilidades para un lote de documentos"""
+        codigos = self.indice.buscar_lote(documentos)
+        probabilidades = np.array([self.probabilidades[segmento] for segmento in SEGMENTOS])
+        return codigos, probabilidades[codigos]
\ No newline at end of file
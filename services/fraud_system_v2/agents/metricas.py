@@ -0,0 +1,161 @@
+"""Métricas en proceso (histogramas de latencia y contadores) en formato Prometheus"""
+import threading
+from bisect import bisect_left
+from collections import Counter, deque
+
+# Límites superiores de los buckets en segundos (de 5 µs a 1 s)
+BUCKETS_LATENCIA = (
+    0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0
+)
+# Cada cuánto el hilo de fondo vuelca las observaciones pendientes en los buckets
+INTERVALO_CONSOLIDACION = 1.0
+
+
+def _etiquetas(nombre: str, valor: str, extra: str = '') -> str:
+    return f'{{{nombre}="{valor}"{extra}}}'
+
+
+def _drenar(pendientes: deque) -> list:
+    # popleft es atómico: lo que se agregue mientras tanto queda para la próxima vez
+    return [pendientes.popleft() for _ in range(len(pendientes))]
+
+
+class _SerieHistograma:
+    def __init__(self, limites_ns: list):
+        """
+        En el camino de la request observar_ns es solo deque.append (atómico, sin lock).
+        Los buckets se calculan al consolidar, fuera de la request.
+        """
+        self.limites_ns = limites_ns
+        self.conteos = [0] * (len(limites_ns) + 1)
+        self.suma_ns = 0
+        self.total = 0
+        self._pendientes = deque()
+        self._lock = threading.Lock()
+        # Registrar una duración en ns (de time.perf_counter_ns)
+        self.observar_ns = self._pendientes.append
+
+    def consolidar(self):
+        with self._lock:
+            lote = _drenar(self._pendientes)
+            limites_ns = self.limites_ns
+            for i, conteo in Counter(bisect_left(limites_ns, nanosegundos) for nanosegundos in lote).items():
+                self.conteos[i] += conteo
+            self.suma_ns += sum(lote)
+            self.total += len(lote)
+
+
+class HistogramaLatencia:
+    def __init__(self, nombre: str, ayuda: str, etiqueta: str, buckets=BUCKETS_LATENCIA):
+        """Histograma de buckets fijos con una etiqueta; serie(valor) se resuelve una vez y se reutiliza"""
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiqueta = etiqueta
+        self.buckets = buckets
+        self._limites_ns = [round(b * 1e9) for b in buckets]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def serie(self, valor: str) -> _SerieHistograma:
+        serie = self._series.get(valor)
+        if serie is None:
+            with self._lock:
+                serie = self._series.setdefault(valor, _SerieHistograma(self._limites_ns))
+        return serie
+
+    def consolidar(self):
+        for serie in list(self._series.values()):
+            serie.consolidar()
+
+    def exponer(self) -> list:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        for valor, serie in sorted(self._series.items()):
+            serie.consolidar()
+            with serie._lock:
+                conteos = list(serie.conteos)
+                suma_ns, total = serie.suma_ns, serie.total
+            acumulado = 0
+            for limite, conteo in zip(self.buckets, conteos):
+                acumulado += conteo
+                etiquetas = _etiquetas(self.etiqueta, valor, f',le="{limite:g}"')
+                lineas.append(f"{self.nombre}_bucket{etiquetas} {acumulado}")
+            etiquetas = _etiquetas(self.etiqueta, valor, ',le="+Inf"')
+            lineas.append(f"{self.nombre}_bucket{etiquetas} {total}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(self.etiqueta, valor)} {suma_ns / 1e9:.9f}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(self.etiqueta, valor)} {total}")
+        return lineas
+
+
+class Contador:
+    def __init__(self, nombre: str, ayuda: str, etiqueta: str):
+        """Contador monotónico con una etiqueta; los incrementos también se encolan sin lock"""
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiqueta = etiqueta
+        self._valores = Counter()
+        self._pendientes = deque()
+        self._lock = threading.Lock()
+
+    def incrementar(self, valor: str, cantidad: int = 1):
+        if cantidad == 1:
+            self._pendientes.append(valor)
+        else:
+            with self._lock:
+                self._valores[valor] += cantidad
+
+    def consolidar(self):
+        with self._lock:
+            self._valores.update(_drenar(self._pendientes))
+
+    def exponer(self) -> list:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} counter"]
+        self.consolidar()
+        with self._lock:
+            valores = sorted(self._valores.items())
+        lineas.extend(f"{self.nombre}{_etiquetas(self.etiqueta, valor)} {total}" for valor, total in valores)
+        return lineas
+
+
+class RegistroMetricas:
+    def __init__(self, intervalo_consolidacion: float = INTERVALO_CONSOLIDACION):
+        """Las observaciones pendientes se consolidan en un hilo de fondo (memoria acotada sin scrapes)"""
+        self.metricas = []
+        self.intervalo_consolidacion = intervalo_consolidacion
+        self._hilo = None
+
+    def _registrar(self, metrica):
+        self.metricas.append(metrica)
+        if self._hilo is None and self.intervalo_consolidacion > 0:
+            self._hilo = threading.Thread(target=self._bucle, name='consolidar-metricas', daemon=True)
+            self._hilo.start()
+        return metrica
+
+    def histograma(self, nombre: str, ayuda: str, etiqueta: str) -> HistogramaLatencia:
+        return self._registrar(HistogramaLatencia(nombre, ayuda, etiqueta))
+
+    def contador(self, nombre: str, ayuda: str, etiqueta: str) -> Contador:
+        return self._registrar(Contador(nombre, ayuda, etiqueta))
+
+    def _bucle(self):
+        evento = threading.Event()
+        while not evento.wait(self.intervalo_consolidacion):
+            for metrica in list(self.metricas):
+                metrica.consolidar()
+
+    def exponer(self) -> str:
+        """Texto en formato de exposición de Prometheus (text/plain; version=0.0.4)"""
+        lineas = []
+        for metrica in self.metricas:
+            lineas.extend(metrica.exponer())
+        return '\n'.join(lineas) + '\n'
+
+
+REGISTRO = RegistroMetricas()
+
+LATENCIA_ETAPAS = REGISTRO.histograma(
+    'fraud_stage_latency_seconds', 'Latencia por etapa del análisis de una transacción', 'stage'
+)
+DECISIONES_TOTAL = REGISTRO.contador(
+    'fraud_decisions_total', 'Decisiones emitidas por tipo', 'decision'
+)
@@ -0,0 +1,16 @@
+"""Redondeo vectorizado que coincide exactamente con round() de Python"""
+import numpy as np
+
+
+def redondear(valores, decimales: int) -> np.ndarray:
+    """
+    np.round escala por 10**decimales y puede desempatar distinto que round()
+    en valores casi en .5; esos pocos casos se recalculan con round().
+    """
+    valores = np.asarray(valores, dtype=np.float64)
+    resultado = np.round(valores, decimales)
+    escalados = valores * 10.0 ** decimales
+    dudosos = np.flatnonzero(np.abs(escalados - np.floor(escalados) - 0.5) < 1e-6)
+    for i in dudosos:
+        resultado[i] = round(float(valores[i]), decimales)
+    return resultado
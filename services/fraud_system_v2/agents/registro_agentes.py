@@ -0,0 +1,254 @@
+"""Registro de agentes: nombre, peso, sync/async y timeout, con ejecución concurrente"""
+import asyncio
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from functools import partial
+from time import perf_counter_ns
+
+import numpy as np
+
+from agents.metricas import REGISTRO, LATENCIA_ETAPAS
+
+# Hilos para agentes sync con timeout (típicamente I/O bloqueante)
+TAMANO_POOL = int(os.getenv('AGENT_POOL_SIZE', '8'))
+# Deadline de los agentes async y de los adicionales que no declaran timeout
+TIMEOUT_POR_DEFECTO = float(os.getenv('AGENT_TIMEOUT_SECONDS', '1'))
+
+_pool = None
+_bucle = None
+_lock = threading.Lock()
+# Tareas enviadas al pool que todavía no terminaron (incluye las que vencieron y siguen corriendo)
+_en_curso = 0
+_lock_en_curso = threading.Lock()
+
+AGENTES_DEGRADADOS = REGISTRO.contador(
+    'fraud_agent_degraded_total', 'Agentes que aportaron la probabilidad por defecto, por motivo', 'reason'
+)
+
+
+def en_curso() -> int:
+    """Agentes ocupando un hilo del pool en este momento"""
+    return _en_curso
+
+
+def _terminar(futuro):
+    global _en_curso
+    with _lock_en_curso:
+        _en_curso -= 1
+
+
+def _pool_agentes() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=TAMANO_POOL, thread_name_prefix='agente')
+    return _pool
+
+
+def _bucle_async() -> asyncio.AbstractEventLoop:
+    """Event loop propio en un hilo de fondo: los agentes async no dependen del loop del servidor"""
+    global _bucle
+    if _bucle is None:
+        with _lock:
+            if _bucle is None:
+                bucle = asyncio.new_event_loop()
+                threading.Thread(target=bucle.run_forever, name='agentes-async', daemon=True).start()
+                _bucle = bucle
+    return _bucle
+
+
+class DefinicionAgente:
+    def __init__(self, nombre: str, peso: float, evaluar, asincrono: bool = False,
+                 timeout: float = None, probabilidad_por_defecto: float = 0.0, evaluar_lote=None):
+        """
+        evaluar(numero_documento, importe) devuelve un dict con 'probabilidad_fraude'
+        (una corrutina si asincrono). Sin timeout y sync se ejecuta en el hilo de la
+        request; con timeout o async corre en paralelo y, si no responde a tiempo,
+        aporta probabilidad_por_defecto. Los async sin timeout usan TIMEOUT_POR_DEFECTO.
+        evaluar_lote(documentos, importes) es opcional, devuelve una probabilidad por
+        fila y también es una corrutina si asincrono.
+        """
+        if timeout is None and asincrono:
+            timeout = TIMEOUT_POR_DEFECTO
+        if timeout is not None and not (math.isfinite(timeout) and timeout > 0):
+            raise ValueError(f"Timeout inválido para el agente {nombre}: {timeout!r}")
+        self.nombre = nombre
+        self.peso = peso
+        self.evaluar = evaluar
+        self.asincrono = asincrono
+        self.timeout = timeout
+        self.probabilidad_por_defecto = probabilidad_por_defecto
+        self.evaluar_lote = evaluar_lote
+        self.serie_latencia = LATENCIA_ETAPAS.serie(f'agente_{nombre}')
+
+    @property
+    def en_linea(self) -> bool:
+        return not self.asincrono and self.timeout is None
+
+    def resultado_por_defecto(self, razon: str) -> dict:
+        return {
+            'agente': self.nombre,
+            'probabilidad_fraude': self.probabilidad_por_defecto,
+            'razon': razon,
+            'degradado': True
+        }
+
+
+# Agentes agregados por módulos externos; cada agente_master nuevo los incluye
+AGENTES_ADICIONALES = []
+
+
+def registrar_agente_adicional(definicion: DefinicionAgente):
+    """Agregar un agente a todos los agente_master que se construyan (incluidas las recargas)"""
+    # Nunca en línea: un agente externo colgado no puede bloquear la request ni el lote
+    if definicion.timeout is None:
+        definicion.timeout = TIMEOUT_POR_DEFECTO
+    AGENTES_ADICIONALES.append(definicion)
+
+
+class RegistroAgentes:
+    def __init__(self, definiciones: list = None):
+        self.definiciones = {}
+        for definicion in definiciones or []:
+            self.registrar(definicion)
+
+    def registrar(self, definicion: DefinicionAgente):
+        if definicion.nombre in self.definiciones:
+            raise ValueError(f"Agente duplicado: {definicion.nombre}")
+        self.definiciones[definicion.nombre] = definicion
+
+    def definir_peso(self, nombre: str, peso: float):
+        if nombre not in self.definiciones:
+            raise KeyError(f"Agente no registrado: {nombre}")
+        self.definiciones[nombre].peso = peso
+
+    def pesos(self) -> dict:
+        return {nombre: definicion.peso for nombre, definicion in self.definiciones.items()}
+
+    def _lanzar(self, definicion: DefinicionAgente, evaluar):
+        """
+        Future concurrente de evaluar() (una corrutina si el agente es async) que
+        devuelve (resultado, ns de ejecución), o None si el pool está saturado:
+        cancel() no detiene un hilo que ya corre, así que los agentes colgados
+        ocupan el pool hasta que terminan.
+        """
+        global _en_curso
+        if definicion.asincrono:
+            async def medir():
+                inicio = perf_counter_ns()
+                resultado = await evaluar()
+                return resultado, perf_counter_ns() - inicio
+            return asyncio.run_coroutine_threadsafe(medir(), _bucle_async())
+
+        def medir():
+            inicio = perf_counter_ns()
+            resultado = evaluar()
+            return resultado, perf_counter_ns() - inicio
+        with _lock_en_curso:
+            if _en_curso >= TAMANO_POOL:
+                return None
+            _en_curso += 1
+        futuro = _pool_agentes().submit(medir)
+        futuro.add_done_callback(_terminar)
+        return futuro
+
+    def _esperar(self, definicion: DefinicionAgente, futuro, inicio: int, por_defecto) -> tuple:
+        """
+        (resultado, ns) de un agente lanzado, o por_defecto(razon) si el pool estaba
+        saturado, venció su deadline (medido desde `inicio`) o falló
+        """
+        if futuro is None:
+            AGENTES_DEGRADADOS.incrementar('pool_saturated')
+            return por_defecto("Pool de agentes saturado, se usa la probabilidad por defecto"), 0
+        restante = max(0.0, definicion.timeout - (perf_counter_ns() - inicio) / 1e9)
+        try:
+            return futuro.result(restante)
+        except FuturesTimeoutError:
+            futuro.cancel()
+            AGENTES_DEGRADADOS.incrementar('timeout')
+            razon = f"Sin respuesta en {definicion.timeout:g}s, se usa la probabilidad por defecto"
+        except Exception as e:
+            print(f"⚠️ Agente {definicion.nombre} falló: {e}")
+            AGENTES_DEGRADADOS.incrementar('error')
+            razon = f"Error en el agente ({type(e).__name__}), se usa la probabilidad por defecto"
+        return por_defecto(razon), perf_counter_ns() - inicio
+
+    def _seleccionar(self, nombres: list = None) -> list:
+        return [self.definiciones[n] for n in nombres] if nombres else list(self.definiciones.values())
+
+    def ejecutar(self, numero_documento, importe, nombres: list = None) -> tuple:
+        """
+        Ejecutar los agentes (todos o los indicados) y devolver (resultados, tiempos_ms)
+        en el orden de registro. Los concurrentes se lanzan primero para que su
+        latencia se superponga con la de los agentes en línea.
+        """
+        definiciones = self._seleccionar(nombres)
+        inicio = perf_counter_ns()
+        pendientes = {
+            d.nombre: self._lanzar(d, partial(d.evaluar, numero_documento, importe))
+            for d in definiciones if not d.en_linea
+        }
+
+        resultados = {}
+        duraciones_ns = {}
+        for definicion in definiciones:
+            if definicion.en_linea:
+                t0 = perf_counter_ns()
+                resultados[definicion.nombre] = definicion.evaluar(numero_documento, importe)
+                duraciones_ns[definicion.nombre] = perf_counter_ns() - t0
+
+        for definicion in definiciones:
+            if not definicion.en_linea:
+                # Cada agente tiene su deadline desde el inicio de la request, no desde que se lo espera
+                resultados[definicion.nombre], duraciones_ns[definicion.nombre] = self._esperar(
+                    definicion, pendientes[definicion.nombre], inicio, definicion.resultado_por_defecto
+                )
+
+        for definicion in definiciones:
+            definicion.serie_latencia.observar_ns(duraciones_ns[definicion.nombre])
+        resultados = {d.nombre: resultados[d.nombre] for d in definiciones}
+        tiempos_ms = {nombre: round(ns / 1e6, 4) for nombre, ns in duraciones_ns.items()}
+        return resultados, tiempos_ms
+
+    def ejecutar_lote(self, documentos: list, importes, nombres: list = None) -> dict:
+        """
+        Probabilidades por fila de cada agente (todos o los indicados) para un lote.
+        Cada agente concurrente se lanza una sola vez para todo el lote, con su
+        deadline; si no termina a tiempo, todas sus filas llevan probabilidad_por_defecto.
+        """
+        definiciones = self._seleccionar(nombres)
+        inicio = perf_counter_ns()
+        pendientes = {
+            d.nombre: self._lanzar(d, partial(self._evaluar_lote, d, documentos, importes))
+            for d in definiciones if not d.en_linea
+        }
+        probabilidades = {
+            d.nombre: self._evaluar_lote(d, documentos, importes) for d in definiciones if d.en_linea
+        }
+        for definicion in definiciones:
+            if not definicion.en_linea:
+                probabilidades[definicion.nombre], _ = self._esperar(
+                    definicion, pendientes[definicion.nombre], inicio,
+                    lambda razon, d=definicion: np.full(len(documentos), d.probabilidad_por_defecto)
+                )
+        return {d.nombre: np.asarray(probabilidades[d.nombre], dtype=np.float64) for d in definiciones}
+
+    @staticmethod
+    def _evaluar_lote(definicion: DefinicionAgente, documentos: list, importes):
+        """evaluar_lote del agente, o evaluar fila por fila (una corrutina si asincrono)"""
+        if definicion.evaluar_lote is not None:
+            return definicion.evaluar_lote(documentos, importes)
+        if definicion.asincrono:
+            async def filas():
+                resultados = await asyncio.gather(
+                    *(definicion.evaluar(documento, float(importe)) for documento, importe in zip(documentos, importes))
+                )
+                return [resultado['probabilidad_fraude'] for resultado in resultados]
+            return filas()
+        return [
+            definicion.evaluar(documento, float(importe))['probabilidad_fraude']
+            for documento, importe in zip(documentos, importes)
+        ]
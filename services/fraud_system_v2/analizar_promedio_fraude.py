@@ -1,60 +1,45 @@
 #!/usr/bin/env python3
 """Script para analizar el promedio fraudulento de la base de datos"""
 
-import boto3
-import pandas as pd
+import os
+
 from config.aws_config import *
+from data.estadisticas import calcular_estadisticas
+from data.fuentes import crear_fuente
 
 def analizar_promedio_fraude():
     """Analizar estadísticas de fraude en la base de datos"""
     try:
+        fuente = crear_fuente(S3_BUCKET, S3_FILE)
         print("📊 Analizando promedio fraudulento...")
-        print(f"🔗 Conectando a S3: {S3_BUCKET}/{S3_FILE}")
-        
-        # Cargar datos desde S3
-        s3_client = boto3.client('s3')
-        response = s3_client.get_object(Bucket=S3_BUCKET, Key=S3_FILE)
-        data = pd.read_csv(response['Body'])
-        
-        print(f"📈 Total de registros: {len(data):,}")
-        print(f"📋 Columnas disponibles: {list(data.columns)}")
+        print(f"🔗 Leyendo {fuente.descripcion()}")
         
-        # Verificar si existen las columnas necesarias
-        if 'CODIGO_RAZON_CONTRACARGO' not in data.columns:
-            print("❌ Columna CODIGO_RAZON_CONTRACARGO no encontrada")
-            return
+        # Una sola pasada en streaming (ver data/estadisticas.py)
+        stats = calcular_estadisticas(fuente, workers=os.cpu_count() or 1)
         
-        if 'importe' not in data.columns:
-            print("❌ Columna importe no encontrada")
-            return
+        print(f"📈 Total de registros: {stats.filas:,}")
+        print(f"📋 Columnas disponibles: {stats.columnas}")
         
         # Analizar códigos de razón
         print("\n🔍 Análisis de códigos de razón:")
-        codigos_count = data['CODIGO_RAZON_CONTRACARGO'].value_counts().head(10)
-        for codigo, count in codigos_count.items():
+        for codigo, count in stats.codigos.most_common(10):
             print(f"   Código {codigo}: {count:,} registros")
         
-        # Filtrar registros fraudulentos (código 83)
-        fraud_data = data[data['CODIGO_RAZON_CONTRACARGO'] == 83]
-        
+        fraude = stats.importes_fraude
         print(f"\n💰 Análisis de fraude (código 83):")
-        print(f"   📊 Registros fraudulentos: {len(fraud_data):,}")
-        print(f"   📈 Porcentaje del total: {(len(fraud_data)/len(data)*100):.2f}%")
+        print(f"   📊 Registros fraudulentos: {stats.filas_fraude:,}")
+        print(f"   📈 Porcentaje del total: {(stats.filas_fraude/max(stats.filas, 1)*100):.2f}%")
         
-        if len(fraud_data) > 0:
-            # Estadísticas de importes fraudulentos
-            promedio_fraude = fraud_data['importe'].mean()
-            mediana_fraude = fraud_data['importe'].median()
-            min_fraude = fraud_data['importe'].min()
-            max_fraude = fraud_data['importe'].max()
-            std_fraude = fraud_data['importe'].std()
+        if fraude.cantidad > 0:
+            promedio_fraude = fraude.promedio
             
             print(f"\n💵 Estadísticas de importes fraudulentos:")
             print(f"   🎯 Promedio: ${promedio_fraude:,.2f}")
-            print(f"   📊 Mediana: ${mediana_fraude:,.2f}")
-            print(f"   📉 Mínimo: ${min_fraude:,.2f}")
-            print(f"   📈 Máximo: ${max_fraude:,.2f}")
-            print(f"   📏 Desviación estándar: ${std_fraude:,.2f}")
+            print(f"   📊 Mediana: ${fraude.mediana:,.2f}")
+            print(f"   📉 Mínimo: ${fraude.minimo:,.2f}")
+            print(f"   📈 Máximo: ${fraude.maximo:,.2f}")
+            print(f"   📏 Desviación estándar: ${fraude.desviacion:,.2f}")
+            print(f"   📐 Percentiles 25/75/90: ${fraude.cuantil(0.25):,.2f} / ${fraude.cuantil(0.75):,.2f} / ${fraude.cuantil(0.9):,.2f}")
             
             # Rangos de análisis (10% del promedio)
             rango_10_pct = promedio_fraude * 0.1
@@ -66,34 +51,31 @@ def analizar_promedio_fraude():
             print(f"   📈 Límite superior: ${limite_superior:,.2f}")
             print(f"   📏 Rango: ${rango_10_pct:,.2f}")
             
-            # Contar registros en el rango del 10%
-            en_rango = fraud_data[
-                (fraud_data['importe'] >= limite_inferior) & 
-                (fraud_data['importe'] <= limite_superior)
-            ]
-            
-            print(f"   📊 Registros fraudulentos en rango ±10%: {len(en_rango):,}")
-            print(f"   📈 Porcentaje en rango: {(len(en_rango)/len(fraud_data)*100):.1f}%")
+            # Aproximado con el sketch: el promedio recién se conoce al final de la pasada
+            en_rango = fraude.sketch.contar_en_rango(limite_inferior, limite_superior)
+            print(f"   📊 Registros fraudulentos en rango ±10% (≈): {en_rango:,}")
+            print(f"   📈 Porcentaje en rango: {(en_rango/fraude.cantidad*100):.1f}%")
             
         else:
             print("❌ No se encontraron registros con código 83 (fraude)")
         
         # Análisis de todos los importes para comparación
         print(f"\n📊 Estadísticas generales de importes:")
-        promedio_general = data['importe'].mean()
-        mediana_general = data['importe'].median()
+        promedio_general = stats.importes.promedio
         
         print(f"   🎯 Promedio general: ${promedio_general:,.2f}")
-        print(f"   📊 Mediana general: ${mediana_general:,.2f}")
+        print(f"   📊 Mediana general: ${stats.importes.mediana:,.2f}")
         
-        if len(fraud_data) > 0:
-            diferencia = ((promedio_fraude - promedio_general) / promedio_general) * 100
+        if fraude.cantidad > 0 and promedio_general:
+            diferencia = ((fraude.promedio - promedio_general) / promedio_general) * 100
             print(f"   📈 Diferencia fraude vs general: {diferencia:+.1f}%")
         
+        print(f"\n⏱️ Análisis en {stats.segundos:.1f}s")
+        
     except Exception as e:
         print(f"❌ Error: {e}")
         import traceback
         traceback.print_exc()
 
 if __name__ == "__main__":
-    analizar_promedio_fraude()
\ No newline at end of file
+    analizar_promedio_fraude()
@@ -1,18 +1,37 @@
 #!/usr/bin/env python3
 """FastAPI wrapper for fraud_system_v2 multi-agent system"""
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import sys
 import os
+import json
+import threading
+import time
+import numpy as np
 
 # Add current directory to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from agents.agente_master import agente_master
+from agents.agente_master import agente_master, fuente_por_defecto, DECISIONES
+from agents.agente_fraude import importe_valido
+from agents.metricas import REGISTRO, LATENCIA_ETAPAS, DECISIONES_TOTAL
+from agents.registro_agentes import TAMANO_POOL, en_curso
+from data.cargador_csv import CargadorCSV
+from data.coordinacion import CoordinadorSnapshots
+from data.refresco import RefrescadorDatos
+from data.registro_blacklist import RegistroBlacklist, OP_AGREGAR, OP_ELIMINAR
+from data.snapshot import directorio_por_defecto
+from data.documentos import normalizar_documento, DOCUMENTO_INVALIDO
+from decision_cache import DecisionCache
+from fast_codec import NegotiatedResponse, NegotiatedRoute
 
-app = FastAPI(title="Fraud Detection Multi-Agent System v2")
+app = FastAPI(title="Fraud Detection Multi-Agent System v2", default_response_class=NegotiatedResponse)
+# JSON by default (orjson), msgpack for callers that send or accept it
+app.router.route_class = NegotiatedRoute
 
 class FraudAnalysisRequest(BaseModel):
     customer_id: str
@@ -27,13 +46,155 @@ class FraudAnalysisResponse(BaseModel):
     decision: str
     analysis_method: str = "multi-agent-v2"
 
+class BatchFraudAnalysisRequest(BaseModel):
+    transactions: List[FraudAnalysisRequest]
+    include_risk_factors: bool = True
+
+class BatchFraudAnalysisResult(FraudAnalysisResponse):
+    transaction_id: str
+
+class BatchFraudAnalysisResponse(BaseModel):
+    count: int
+    results: List[BatchFraudAnalysisResult]
+
+class BlacklistEntryRequest(BaseModel):
+    customer_id: str
+    amount: Optional[float] = None
+
+# Chargeback reason code that marks confirmed fraud (blacklist)
+FRAUD_REASON_CODE = 83
+# Events applied per log append when streaming NDJSON
+INGEST_CHUNK_SIZE = 1000
+# Hint for clients while the reference data is still loading
+RETRY_AFTER_SECONDS = int(os.getenv('RETRY_AFTER_SECONDS', '5'))
+
+# Latency series resolved once; observing is a perf_counter_ns delta plus a bisect
+CONVERSION_LATENCY = LATENCIA_ETAPAS.serie('api_conversion')
+REQUEST_LATENCY = LATENCIA_ETAPAS.serie('analyze_transaction')
+BATCH_LATENCY = LATENCIA_ETAPAS.serie('analyze_batch')
+
+# Map decision to recommendation
+DECISION_MAP = {
+    'BLOQUEAR': 'BLOCK - High fraud risk detected',
+    'REVISAR': 'REVIEW - Manual review required', 
+    'MONITOREAR': 'MONITOR - Monitor customer activity',
+    'OK': 'APPROVE - Low fraud risk'
+}
+
+def build_risk_factors(analisis_detallado: dict, weights: dict, confidence_score: float) -> List[str]:
+    """Extract risk factors with weights and contributions"""
+    risk_factors = []
+    
+    for agent_name, analysis in analisis_detallado.items():
+        prob = analysis.get('probabilidad_fraude', 0)
+        reason = analysis.get('razon', f'{agent_name} analysis')
+        weight = weights.get(agent_name, 0)
+        contribution = prob * weight
+        
+        # Show all agents with their weights and contributions
+        if prob > 0 or weight > 0:
+            risk_factors.append(
+                f"{agent_name.capitalize()}: {reason} "
+                f"[Risk: {prob:.1%}, Weight: {weight:.1%}, Contribution: {contribution:.1%}]"
+            )
+    
+    # Add final calculation explanation
+    if len(risk_factors) > 0:
+        risk_factors.append(
+            f"Final Score: {confidence_score:.1%} "
+            f"(Weighted average calculation)"
+        )
+    
+    return risk_factors
+
+def decision_cache_key(customer_id: str, transaction_id: str, amount: float) -> tuple:
+    """Cache key: '00123' and '123' are the same customer for every agent"""
+    documento = normalizar_documento(customer_id)
+    customer_key = documento if documento != DOCUMENTO_INVALIDO else customer_id.strip()
+    return customer_key, transaction_id, amount
+
 class FraudSystemV2:
     def __init__(self):
         """Initialize the multi-agent system"""
         print("🚀 Starting FraudSystemV2 initialization...")
+        self.master_agent = None
+        self.data_source = fuente_por_defecto()
+        
+        # Incremental blacklist changes: append-only log replayed on top of every master we publish
+        default_log = os.path.join(directorio_por_defecto() or '.', 'blacklist_log.jsonl')
+        self.blacklist_log = RegistroBlacklist(os.getenv('BLACKLIST_LOG', default_log))
+        self.blacklist_lock = threading.Lock()
+        self.compact_every = int(os.getenv('BLACKLIST_COMPACT_EVERY', '10000'))
+        self.compacting = False
+        self.last_compaction = None
+        
+        # With several uvicorn workers on one SNAPSHOT_DIR, only the leader reads the source;
+        # the others attach its mmap'd snapshot and follow actual.json and the shared log
+        snapshot_dir = directorio_por_defecto()
+        self.coordinator = CoordinadorSnapshots(snapshot_dir) if snapshot_dir else None
+        self.sync_interval = float(os.getenv('WORKER_SYNC_SECONDS', '1'))
+        self.pointer = None
+        self.log_position = None
+        self.attach_error = None
+        self.stop_sync = threading.Event()
+        
+        # Repeated (customer, transaction, amount) requests within the TTL reuse the decision
+        self.decision_cache = DecisionCache(
+            max_size=int(os.getenv('DECISION_CACHE_SIZE', '10000')),
+            ttl_seconds=float(os.getenv('DECISION_CACHE_TTL_SECONDS', '30'))
+        )
+        
+        # Reference data is loaded by start() once the server is listening; see /ready
+        self.load_state = 'pending'
+        self.load_error = None
+        self.load_started = None
+        self.load_finished = None
+        self.data_size = None
+        self.loader = None
+        self.ready = threading.Event()
+        
+        # Background refresh: rebuilds the agents when the source changes and swaps them in.
+        # Also retries the initial load if it failed (no version loaded yet)
+        self.refresher = RefrescadorDatos(
+            self.data_source,
+            construir=self._build_master,
+            publicar=self._publish_master,
+            intervalo=float(os.getenv('REFRESH_INTERVAL_SECONDS', '300'))
+        )
+    
+    def start(self):
+        """Start loading the reference data in a background thread"""
+        if self.load_state != 'pending':
+            return
+        self.load_state = 'loading'
+        threading.Thread(target=self._initial_load, name='carga-inicial', daemon=True).start()
+    
+    def _build_master(self) -> agente_master:
+        # Keep a handle on the parser so /ready can report its progress
+        self.loader = CargadorCSV()
+        return agente_master(self.data_source, self.loader)
+    
+    def _initial_load(self):
+        self.load_started = time.time()
         try:
-            print("🔗 Creating master agent...")
-            self.master_agent = agente_master()
+            try:
+                self.data_size = self.data_source.tamano()
+            except Exception as e:
+                print(f"⚠️ Could not get the data size, progress will not show a total: {e}")
+            if self.coordinator is None or self.coordinator.intentar_liderazgo():
+                print("🔗 Creating master agent...")
+                self._publish_master(self._build_master())
+                self.refresher.version_actual = self.master_agent.version_datos
+            else:
+                print("👥 Another worker is the data leader, attaching its snapshot...")
+                while not self._attach_leader_snapshot():
+                    if self.coordinator.intentar_liderazgo():
+                        break
+                    time.sleep(self.sync_interval)
+                if self.master_agent is None:
+                    # The leader went away before publishing and this worker took over
+                    self._publish_master(self._build_master())
+                    self.refresher.version_actual = self.master_agent.version_datos
             print("✅ Multi-agent system ready")
         except Exception as e:
             print(f"❌ Failed to initialize master agent: {e}")
@@ -41,70 +202,267 @@ class FraudSystemV2:
             import traceback
             print(f"📋 Full stack trace:")
             traceback.print_exc()
-            self.master_agent = None
-            print("⚠️ System will operate in degraded mode")
+            self.load_state = 'failed'
+            self.load_error = f"{type(e).__name__}: {e}"
+            print("⚠️ System will operate in degraded mode until the next data refresh")
+        finally:
+            self.load_finished = time.time()
+        if self.coordinator is None or self.coordinator.es_lider:
+            self.refresher.iniciar()
+        if self.coordinator is not None:
+            threading.Thread(target=self._sync_loop, name='sincronizar-workers', daemon=True).start()
+    
+    @property
+    def role(self) -> str:
+        if self.coordinator is None:
+            return 'standalone'
+        return 'leader' if self.coordinator.es_lider else 'follower'
+    
+    def _attach_leader_snapshot(self) -> bool:
+        """Follower: swap in the snapshot named by the leader's pointer (mmap, no parsing)"""
+        pointer = self.coordinator.leer()
+        if pointer is None:
+            return False
+        try:
+            master = agente_master(self.data_source, version=pointer['version'], solo_snapshot=True)
+            if master.registro_seq_snapshot < pointer['registro_seq']:
+                raise ValueError(
+                    f"snapshot {pointer['version']} is at seq {master.registro_seq_snapshot}, "
+                    f"the pointer names {pointer['registro_seq']}"
+                )
+        except Exception as e:
+            # Missing, partial or older snapshot (the leader may still be writing it): retry on the next tick
+            error = f"{type(e).__name__}: {e}"
+            if error != self.attach_error:
+                print(f"⚠️ Could not attach the leader's snapshot yet: {error}")
+            self.attach_error = error
+            return False
+        self._publish_master(master)
+        self.pointer = pointer
+        self.attach_error = None
+        return True
+    
+    def _sync_loop(self):
+        while not self.stop_sync.wait(self.sync_interval):
+            try:
+                self.sync_workers()
+            except Exception as e:
+                print(f"⚠️ Worker sync failed: {e}")
+    
+    def sync_workers(self):
+        """One sync tick: take over leadership if free, follow the pointer, tail the shared log"""
+        coordinator = self.coordinator
+        if not coordinator.es_lider and coordinator.intentar_liderazgo():
+            print(f"👑 Worker {os.getpid()} is now the data leader")
+            master_agent = self.master_agent
+            if master_agent is not None:
+                coordinator.publicar(master_agent.version_datos, master_agent.registro_seq_snapshot)
+                self.pointer = coordinator.leer()
+                self.refresher.version_actual = master_agent.version_datos
+            # Without a master the refresher keeps retrying the load, as after a failed start
+            self.refresher.iniciar()
+            if master_agent is None:
+                self._publish_master(self._build_master())
+                self.refresher.version_actual = self.master_agent.version_datos
+        
+        if coordinator.es_lider and coordinator.tomar_solicitud() and not self.compacting:
+            self.compacting = True
+            threading.Thread(target=self.compact_blacklist, name='compactar-blacklist', daemon=True).start()
+        
+        if self.log_position == self.blacklist_log.posicion_actual() and (coordinator.es_lider or self._pointer_unchanged()):
+            return
+        applied = 0
+        with self.blacklist_lock, self.blacklist_log.bloqueo():
+            # Under the log lock the leader cannot publish a compaction and truncate in between
+            if coordinator.es_lider or self._pointer_unchanged():
+                master_agent = self.master_agent
+                if master_agent is not None:
+                    applied = self._catch_up_blacklist_log(master_agent)
+                if applied:
+                    # Entries other workers wrote: they count towards the leader's compaction
+                    self.blacklist_log.pendientes += applied
+                    self.decision_cache.invalidate()
+                    print(f"📜 {applied:,} blacklist changes from other workers applied")
+                follow = False
+            else:
+                follow = True
+        if follow:
+            self._attach_leader_snapshot()
+        elif applied:
+            self._maybe_compact()
+    
+    def _catch_up_blacklist_log(self, master_agent: agente_master) -> int:
+        """Apply every entry appended since the last read, in log order (call under blacklist_lock)"""
+        entries, self.log_position = self.blacklist_log.leer_desde(self.log_position)
+        return master_agent.aplicar_registro(entries)
+    
+    def _pointer_unchanged(self) -> bool:
+        pointer = self.coordinator.leer()
+        return pointer is None or self.pointer is not None and (
+            (pointer['version'], pointer['registro_seq']) == (self.pointer['version'], self.pointer['registro_seq'])
+        )
+    
+    def readiness(self) -> dict:
+        """Load progress of the reference data"""
+        ready = self.master_agent is not None
+        loader = self.loader
+        started = self.load_started
+        if started is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self.load_finished or time.time()) - started
+        bytes_read = loader.bytes_leidos if loader else 0
+        return {
+            "ready": ready,
+            "state": 'ready' if ready else self.load_state,
+            "data_source": self.data_source.descripcion(),
+            "bytes_read": bytes_read,
+            "total_bytes": self.data_size,
+            "progress": round(bytes_read / self.data_size, 4) if self.data_size else None,
+            "rows_read": loader.filas_leidas if loader else 0,
+            "fraud_rows": loader.filas_fraude if loader else 0,
+            "elapsed_seconds": round(elapsed, 3),
+            "error": self.load_error
+        }
+    
+    def require_master(self) -> agente_master:
+        """Master agent to score with; 503 with Retry-After while the data is not loaded"""
+        master_agent = self.master_agent
+        if master_agent is None:
+            if self.load_state in ('pending', 'loading'):
+                detail = "Reference data is still loading"
+            else:
+                detail = f"Reference data not available: {self.load_error}"
+            raise HTTPException(status_code=503, detail=detail, headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+        return master_agent
+    
+    def _publish_master(self, master: agente_master):
+        """Swap in a fully built master agent; in-flight requests keep the one they already hold"""
+        with self.blacklist_lock:
+            # Replay under the lock so no change lands between the replay and the swap
+            # Compacted entries first: a snapshot of another data version does not contain them
+            replayed = master.aplicar_registro(self.blacklist_log.leer(master.registro_seq, compactadas=True))
+            if replayed:
+                print(f"📜 {replayed:,} blacklist changes replayed from {self.blacklist_log.ruta}")
+            self.master_agent = master
+            self.log_position = None
+            self.decision_cache.invalidate()
+            if self.coordinator is not None and self.coordinator.es_lider:
+                # Followers attach this version's snapshot on their next sync tick
+                self.coordinator.publicar(master.version_datos, master.registro_seq_snapshot)
+                self.pointer = self.coordinator.leer()
+        self.load_error = None
+        self.ready.set()
+    
+    def apply_blacklist_changes(self, entries: list) -> int:
+        """Append changes to the log (one fsync per call) and apply them to the live master"""
+        if not entries:
+            return 0
+        with self.blacklist_lock:
+            self.blacklist_log.anexar(entries)
+            master_agent = self.master_agent
+            if master_agent and self.coordinator is None:
+                master_agent.aplicar_registro(entries)
+            elif master_agent:
+                # Other workers may have appended entries with a lower seq: apply in log order
+                others = self._catch_up_blacklist_log(master_agent) - len(entries)
+                self.blacklist_log.pendientes += max(0, others)
+            # Blacklist and fraud average changed: cached decisions may be stale
+            self.decision_cache.invalidate()
+        self._maybe_compact()
+        return len(entries)
+    
+    def _maybe_compact(self):
+        if self.coordinator is not None and not self.coordinator.es_lider:
+            return
+        if self.compact_every > 0 and self.blacklist_log.pendientes >= self.compact_every and not self.compacting:
+            self.compacting = True
+            threading.Thread(target=self.compact_blacklist, name='compactar-blacklist', daemon=True).start()
+    
+    def compact_blacklist(self) -> dict:
+        """Fold the applied log entries into the snapshot and truncate the log"""
+        if self.coordinator is not None and not self.coordinator.es_lider:
+            self.compacting = False
+            self.coordinator.solicitar_compactacion()
+            return {"compacted": False, "requested": True, "reason": "forwarded to the leader worker"}
+        try:
+            with self.blacklist_lock:
+                master_agent = self.master_agent
+                if not master_agent:
+                    return {"compacted": False, "reason": "master agent not loaded"}
+                if self.coordinator is not None:
+                    # Include what the other workers appended since the last sync tick
+                    self._catch_up_blacklist_log(master_agent)
+                # After a source reload the snapshot lacks the earlier compactions too: fold them in again
+                entries = list(self.blacklist_log.leer(master_agent.registro_seq_snapshot, compactadas=True))
+                seq = master_agent.compactar_registro(entries)
+                if seq is None:
+                    return {"compacted": False, "reason": "snapshot cache disabled or source version unknown"}
+                with self.blacklist_log.bloqueo():
+                    # Entries appended meanwhile have a higher seq and survive the truncation
+                    if self.coordinator is not None:
+                        self.coordinator.publicar(master_agent.version_datos, seq)
+                        self.pointer = self.coordinator.leer()
+                    self.blacklist_log.truncar(seq)
+                    self.log_position = None
+                self.last_compaction = time.time()
+                return {"compacted": True, "entries": len(entries), "pending": self.blacklist_log.pendientes}
+        except Exception as e:
+            print(f"⚠️ Blacklist compaction failed, the log is kept: {e}")
+            return {"compacted": False, "reason": str(e)}
+        finally:
+            self.compacting = False
     
     def analyze_transaction(self, request: FraudAnalysisRequest) -> FraudAnalysisResponse:
         """Analyze transaction using multi-agent system"""
-        if not self.master_agent:
-            raise HTTPException(status_code=500, detail="Multi-agent system not initialized")
+        started_ns = time.perf_counter_ns()
+        # Read before the master so a concurrent reload/blacklist change discards this result
+        cache_generation = self.decision_cache.generation
+        master_agent = self.require_master()
         
         try:
             # Extract transaction data
             customer_id = request.customer_id
-            amount = request.transaction_data.get('amount', 0)
+            amount = float(request.transaction_data.get('amount', 0))
+            
+            cache_key = decision_cache_key(customer_id, request.transaction_id, amount)
+            cached = self.decision_cache.get(cache_key)
+            if cached is not None:
+                DECISIONES_TOTAL.incrementar(cached.decision)
+                REQUEST_LATENCY.observar_ns(time.perf_counter_ns() - started_ns)
+                return cached
             
             # Use multi-agent analysis
-            result = self.master_agent.analizar_transaccion(
+            result = master_agent.analizar_transaccion(
                 numero_documento=customer_id,
-                importe=float(amount)
+                importe=amount
             )
             
             # Convert to API response format
+            conversion_ns = time.perf_counter_ns()
             is_fraud = result['decision'] in ['BLOQUEAR', 'REVISAR']
             confidence_score = result['probabilidad_final']
             
             # Extract risk factors with weights and contributions
-            risk_factors = []
-            weights = result.get('pesos_utilizados', {})
-            
-            for agent_name, analysis in result['analisis_detallado'].items():
-                prob = analysis.get('probabilidad_fraude', 0)
-                reason = analysis.get('razon', f'{agent_name} analysis')
-                weight = weights.get(agent_name, 0)
-                contribution = prob * weight
-                
-                # Show all agents with their weights and contributions
-                if prob > 0 or weight > 0:
-                    risk_factors.append(
-                        f"{agent_name.capitalize()}: {reason} "
-                        f"[Risk: {prob:.1%}, Weight: {weight:.1%}, Contribution: {contribution:.1%}]"
-                    )
-            
-            # Add final calculation explanation
-            if len(risk_factors) > 0:
-                risk_factors.append(
-                    f"Final Score: {confidence_score:.1%} "
-                    f"(Weighted average calculation)"
-                )
-            
-            # Map decision to recommendation
-            decision_map = {
-                'BLOQUEAR': 'BLOCK - High fraud risk detected',
-                'REVISAR': 'REVIEW - Manual review required', 
-                'MONITOREAR': 'MONITOR - Monitor customer activity',
-                'OK': 'APPROVE - Low fraud risk'
-            }
+            risk_factors = build_risk_factors(
+                result['analisis_detallado'], result.get('pesos_utilizados', {}), confidence_score
+            )
             
-            recommendation = decision_map.get(result['decision'], result['accion_recomendada'])
+            recommendation = DECISION_MAP.get(result['decision'], result['accion_recomendada'])
             
-            return FraudAnalysisResponse(
+            response = FraudAnalysisResponse(
                 is_fraud=is_fraud,
                 confidence_score=confidence_score,
                 risk_factors=risk_factors,
                 recommendation=recommendation,
                 decision=result['decision']
             )
+            finished_ns = time.perf_counter_ns()
+            CONVERSION_LATENCY.observar_ns(finished_ns - conversion_ns)
+            REQUEST_LATENCY.observar_ns(finished_ns - started_ns)
+            DECISIONES_TOTAL.incrementar(result['decision'])
+            self.decision_cache.put(cache_key, response, cache_generation)
+            return response
             
         except Exception as e:
             print(f"❌ Analysis error: {e}")
@@ -114,6 +472,82 @@ class FraudSystemV2:
             traceback.print_exc()
             raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
+    def analyze_batch(self, request: BatchFraudAnalysisRequest) -> NegotiatedResponse:
+        """Analyze a batch of transactions with the vectorized agents, preserving input order"""
+        started_ns = time.perf_counter_ns()
+        master_agent = self.require_master()
+        
+        try:
+            transactions = request.transactions
+            customer_ids = [t.customer_id for t in transactions]
+            amounts = [float(t.transaction_data.get('amount', 0)) for t in transactions]
+            
+            result = master_agent.analizar_lote(customer_ids, amounts)
+            
+            scores = result['probabilidad_final'].tolist()
+            decision_idx = result['decision'].tolist()
+            weights = result['pesos_utilizados']
+            decisions = [DECISIONES[i] for i in decision_idx]
+            recommendations = [DECISION_MAP[d] for d in decisions]
+            
+            results = []
+            for i, transaction in enumerate(transactions):
+                risk_factors = []
+                if request.include_risk_factors:
+                    risk_factors = build_risk_factors(
+                        master_agent.detalle_lote(result, i), weights, scores[i]
+                    )
+                results.append({
+                    "transaction_id": transaction.transaction_id,
+                    "is_fraud": decisions[i] in ('BLOQUEAR', 'REVISAR'),
+                    "confidence_score": scores[i],
+                    "risk_factors": risk_factors,
+                    "recommendation": recommendations[i],
+                    "decision": decisions[i],
+                    "analysis_method": "multi-agent-v2"
+                })
+            
+            for index, count in enumerate(np.bincount(result['decision'], minlength=len(DECISIONES)).tolist()):
+                if count:
+                    DECISIONES_TOTAL.incrementar(DECISIONES[index], count)
+            BATCH_LATENCY.observar_ns(time.perf_counter_ns() - started_ns)
+            
+            # Returned as a Response: results are already in response format,
+            # re-validating thousands of models would dominate the batch cost
+            return NegotiatedResponse({"count": len(results), "results": results})
+            
+        except HTTPException:
+            raise
+        except Exception as e:
+            print(f"❌ Batch analysis error: {e}")
+            print(f"🔍 Error type: {type(e).__name__}")
+            import traceback
+            print(f"📋 Stack trace:")
+            traceback.print_exc()
+            raise HTTPException(status_code=500, detail=f"Batch analysis failed: {str(e)}")
+
+def blacklist_entry(op: str, customer_id, amount=None) -> dict:
+    """Log entry for a blacklist change; raises ValueError on an invalid customer id or amount"""
+    documento = normalizar_documento(customer_id)
+    if documento == DOCUMENTO_INVALIDO:
+        raise ValueError(f"Invalid customer_id: {customer_id!r}")
+    entry = {"op": op, "documento": documento}
+    if amount is not None:
+        # Written to the log and replayed on every reload: a NaN/inf would poison the fraud average
+        if not importe_valido(amount):
+            raise ValueError(f"Invalid amount: {amount!r} (must be a finite number greater than 0)")
+        entry["importe"] = float(amount)
+    return entry
+
+def chargeback_event_entry(line: bytes):
+    """Log entry for one NDJSON chargeback event, or None if it is not a code-83 event"""
+    event = json.loads(line)
+    reason = event.get('reason_code', event.get('CODIGO_RAZON_CONTRACARGO'))
+    if reason is None or int(reason) != FRAUD_REASON_CODE:
+        return None
+    customer_id = event.get('customer_id', event.get('NUMERO_DOCUMENTO'))
+    return blacklist_entry(OP_AGREGAR, customer_id, event.get('amount', event.get('importe')))
+
 # Initialize the fraud system
 print("🚀 Starting fraud_system_v2 module initialization...")
 print(f"📊 Environment variables:")
@@ -125,41 +559,181 @@ print(f"   AWS_EXECUTION_ENV: {os.getenv('AWS_EXECUTION_ENV', 'not set')}")
 fraud_system = FraudSystemV2()
 print("✅ Module initialization completed")
 
+@app.on_event("startup")
+async def start_loading():
+    # Data loads in the background so the port is bound right away
+    fraud_system.start()
+
 @app.post("/analyze-fraud", response_model=FraudAnalysisResponse)
 async def analyze_fraud(request: FraudAnalysisRequest):
     """Analyze fraud using multi-agent system"""
-    return fraud_system.analyze_transaction(request)
+    # Timed and async agents are awaited with a blocking deadline: never on the event loop
+    return await run_in_threadpool(fraud_system.analyze_transaction, request)
+
+@app.post("/analyze-fraud/batch", response_model=BatchFraudAnalysisResponse)
+async def analyze_fraud_batch(request: BatchFraudAnalysisRequest):
+    """Analyze many transactions in one call; results follow the input order"""
+    # CPU-bound for large batches: keep it off the event loop so /health and /ready still answer
+    return await run_in_threadpool(fraud_system.analyze_batch, request)
 
 @app.post("/decide", response_model=FraudAnalysisResponse)
 async def make_fraud_decision(request: FraudAnalysisRequest):
     """Legacy endpoint compatibility"""
-    return fraud_system.analyze_transaction(request)
+    return await run_in_threadpool(fraud_system.analyze_transaction, request)
+
+@app.post("/blacklist")
+async def add_to_blacklist(request: BlacklistEntryRequest):
+    """Add a customer to the blacklist (and its amount to the fraud average)"""
+    try:
+        entry = blacklist_entry(OP_AGREGAR, request.customer_id, request.amount)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await run_in_threadpool(fraud_system.apply_blacklist_changes, [entry])
+    return {"customer_id": request.customer_id, "blacklisted": True, "seq": entry["seq"]}
+
+@app.delete("/blacklist/{customer_id}")
+async def remove_from_blacklist(customer_id: str):
+    """Remove a customer from the blacklist"""
+    try:
+        entry = blacklist_entry(OP_ELIMINAR, customer_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await run_in_threadpool(fraud_system.apply_blacklist_changes, [entry])
+    return {"customer_id": customer_id, "blacklisted": False, "seq": entry["seq"]}
+
+@app.post("/blacklist/events")
+async def ingest_chargeback_events(request: Request):
+    """
+    Stream of chargeback events, one JSON object per line:
+    {"customer_id": "...", "amount": 123.4, "reason_code": 83}.
+    Only code-83 events change the blacklist; they are applied in chunks while reading.
+    """
+    counts = {"received": 0, "applied": 0, "ignored": 0, "invalid": 0}
+    pending = []
+    buffer = b''
+    
+    async def flush():
+        if pending:
+            counts["applied"] += await run_in_threadpool(fraud_system.apply_blacklist_changes, list(pending))
+            pending.clear()
+    
+    async def handle(line: bytes):
+        if not line.strip():
+            return
+        counts["received"] += 1
+        try:
+            entry = chargeback_event_entry(line)
+        except (ValueError, TypeError, AttributeError):
+            counts["invalid"] += 1
+            return
+        if entry is None:
+            counts["ignored"] += 1
+        else:
+            pending.append(entry)
+    
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            await handle(line)
+        if len(pending) >= INGEST_CHUNK_SIZE:
+            await flush()
+    await handle(buffer)
+    await flush()
+    return counts
+
+@app.post("/blacklist/compact")
+async def compact_blacklist():
+    """Fold the blacklist log into the local snapshot now"""
+    return await run_in_threadpool(fraud_system.compact_blacklist)
+
+@app.on_event("shutdown")
+async def stop_refresher():
+    fraud_system.refresher.detener()
+    fraud_system.stop_sync.set()
+    if fraud_system.coordinator is not None:
+        fraud_system.coordinator.liberar()
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text format: per-stage latency histograms, decision counters and cache counters"""
+    cache = fraud_system.decision_cache.stats()
+    lines = [REGISTRO.exponer()]
+    for name in ('hits', 'misses', 'evictions', 'expirations', 'invalidations'):
+        lines.append(f"# TYPE fraud_decision_cache_{name}_total counter\n"
+                     f"fraud_decision_cache_{name}_total {cache[name]}\n")
+    lines.append(f"# TYPE fraud_decision_cache_size gauge\nfraud_decision_cache_size {cache['size']}\n")
+    lines.append(f"# TYPE fraud_data_ready gauge\nfraud_data_ready {int(fraud_system.master_agent is not None)}\n")
+    lines.append(f"# TYPE fraud_agent_pool_in_flight gauge\nfraud_agent_pool_in_flight {en_curso()}\n"
+                 f"# TYPE fraud_agent_pool_size gauge\nfraud_agent_pool_size {TAMANO_POOL}\n")
+    return PlainTextResponse(''.join(lines), media_type="text/plain; version=0.0.4")
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: 200 once the reference data is loaded, 503 with load progress until then"""
+    readiness = fraud_system.readiness()
+    if readiness["ready"]:
+        return readiness
+    return JSONResponse(readiness, status_code=503, headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    status = "healthy" if fraud_system.master_agent else "unhealthy"
+    """Liveness: the process is up; data loading is reported by /ready"""
+    master_agent = fraud_system.master_agent
     
     response = {
-        "status": status,
+        "status": "healthy",
         "service": "fraud-system-v2",
-        "agents": "multi-agent" if fraud_system.master_agent else "unavailable",
-        "initialization": "success" if fraud_system.master_agent else "failed"
+        "ready": master_agent is not None,
+        "agents": "multi-agent" if master_agent else "unavailable",
+        "initialization": "success" if master_agent else fraud_system.load_state
     }
     
-    if fraud_system.master_agent:
+    if master_agent:
         try:
-            response["s3_bucket"] = fraud_system.master_agent.bucket
-            response["s3_file"] = fraud_system.master_agent.file_key
-            response["data_records"] = len(fraud_system.master_agent.data)
-            response["blacklist_count"] = len(fraud_system.master_agent.agente_blacklist.blacklist)
-            response["fraud_average"] = fraud_system.master_agent.agente_fraude.promedio_fraude
+            response["s3_bucket"] = master_agent.bucket
+            response["s3_file"] = master_agent.file_key
+            response["data_source"] = master_agent.fuente.descripcion()
+            response["data_version"] = master_agent.version_datos
+            response["data_age_seconds"] = round(time.time() - master_agent.cargado_en, 1)
+            response["data_records"] = len(master_agent.data)
+            response["blacklist_count"] = len(master_agent.agente_blacklist.blacklist)
+            response["blacklist_memory_bytes"] = master_agent.agente_blacklist.blacklist.bytes_memoria()
+            response["fraud_average"] = master_agent.agente_fraude.promedio_fraude
         except Exception as e:
             response["agent_error"] = str(e)
     
+    refresher = fraud_system.refresher
+    response["data_refresh"] = {
+        "interval_seconds": refresher.intervalo,
+        "reloads": refresher.recargas,
+        "last_check": refresher.ultima_revision,
+        "last_error": refresher.ultimo_error
+    }
+    
+    response["worker"] = {
+        "pid": os.getpid(),
+        "role": fraud_system.role,
+        "snapshot_pointer": fraud_system.pointer,
+        "attach_error": fraud_system.attach_error
+    }
+    response["decision_cache"] = fraud_system.decision_cache.stats()
+    response["blacklist_log"] = {
+        "path": fraud_system.blacklist_log.ruta,
+        "pending_entries": fraud_system.blacklist_log.pendientes,
+        "last_compaction": fraud_system.last_compaction
+    }
+    
     print(f"🏥 Health check: {response}")
     return response
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8003)
\ No newline at end of file
+    workers = int(os.getenv('API_WORKERS', '1'))
+    if workers > 1:
+        # Workers need an import string; they share the parsed data through SNAPSHOT_DIR
+        if not directorio_por_defecto():
+            print("⚠️ SNAPSHOT_DIR is disabled: every worker will load its own copy of the data")
+        uvicorn.run("api_wrapper:app", host="0.0.0.0", port=8003, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8003)
\ No newline at end of file
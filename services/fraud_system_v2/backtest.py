@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Backtest offline: pasa todas las filas de BaseFinal.csv por agente_master en un pool
+de procesos y compara las decisiones con CODIGO_RAZON_CONTRACARGO (83 = fraude).
+
+Los datos de referencia (blacklist, segmentos, promedio) se cargan una vez, desde el
+snapshot local si existe; las filas se leen en streaming y se reparten por bloques.
+Nota: la blacklist se construye con los mismos datos, así que el backtest es in-sample
+para los clientes con fraude previo.
+
+Ejemplo:
+    python backtest.py --archivo BaseFinal.csv --workers 8 --pesos blacklist=0.5,fraude=0.3,segmento=0.2 --umbrales 0.8,0.5,0.3
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agents.agente_master import agente_master, fuente_por_defecto, UMBRALES_DECISION, DECISIONES
+from data.cargador_csv import CODIGO_FRAUDE, TAMANO_CHUNK, leer_bloques
+from data.formato import FormatoCSV, detectar_formato
+from data.fuentes import FuenteLocal
+from data.snapshot import directorio_por_defecto
+BINS_SCORE = 20
+
+# Estado de cada worker (heredado con fork o construido por el initializer)
+_master = None
+_formato = None
+_posiciones = None
+
+
+def configurar_master(master: agente_master, pesos: dict, umbrales: list):
+    for nombre, peso in (pesos or {}).items():
+        master.registro_agentes.definir_peso(nombre, peso)
+    if umbrales:
+        master.umbrales = [
+            (umbral, decision, accion)
+            for umbral, (_, decision, accion) in zip(umbrales, UMBRALES_DECISION)
+        ]
+
+
+def _iniciar_worker(master, fuente, pesos, umbrales, formato, posiciones):
+    global _master, _formato, _posiciones
+    # Con fork el master ya está en memoria (copy-on-write); con spawn se reconstruye desde el snapshot
+    _master = master if master is not None else agente_master(fuente)
+    configurar_master(_master, pesos, umbrales)
+    _formato = formato
+    _posiciones = posiciones
+
+
+def procesar_bloque(bloque: bytes) -> dict:
+    """Parsear y puntuar un bloque de filas con los agentes vectorizados"""
+    inicio = time.perf_counter()
+    pos_documento, pos_importe, pos_codigo, max_split = _posiciones
+    separador, quitar = _formato.separador, _formato.quitar
+    documentos, importes, fraude = [], [], []
+    invalidas = 0
+    importes_invalidos = 0
+    for linea in bloque.decode('utf-8', errors='replace').split('\n'):
+        campos = linea.split(separador, max_split)
+        if len(campos) < max_split:
+            invalidas += bool(linea.strip())
+            continue
+        try:
+            importe = float(campos[pos_importe].strip(quitar).replace(',', ''))
+        except ValueError:
+            importes_invalidos += 1
+            continue
+        documentos.append(campos[pos_documento].strip(quitar))
+        importes.append(importe)
+        fraude.append(campos[pos_codigo].strip(quitar) == CODIGO_FRAUDE)
+
+    n_decisiones = len(_master.umbrales) + 1
+    confusion = np.zeros((n_decisiones, 2), dtype=np.int64)
+    histograma = np.zeros(BINS_SCORE, dtype=np.int64)
+    if documentos:
+        resultado = _master.analizar_lote(documentos, importes)
+        etiquetas = np.asarray(fraude, dtype=np.int64)
+        np.add.at(confusion, (resultado['decision'], etiquetas), 1)
+        histograma, _ = np.histogram(resultado['probabilidad_final'], bins=BINS_SCORE, range=(0.0, 1.0))
+
+    return {
+        'worker': os.getpid(),
+        'filas': len(documentos),
+        'invalidas': invalidas,
+        'importes_invalidos': importes_invalidos,
+        'segundos': time.perf_counter() - inicio,
+        'confusion': confusion,
+        'histograma': histograma
+    }
+
+
+def ejecutar_backtest(fuente, workers: int, tamano_bloque: int, pesos: dict = None, umbrales: list = None) -> dict:
+    print(f"📥 Cargando datos de referencia desde {fuente.descripcion()}...")
+    master = agente_master(fuente)
+    configurar_master(master, pesos, umbrales)
+
+    formato = detectar_formato(fuente, master.version_datos, directorio_por_defecto())
+    body = fuente.abrir()
+    inicio = time.perf_counter()
+    try:
+        bloques = leer_bloques(body, tamano_bloque)
+        primero = next(bloques, b'').lstrip()
+        if not primero:
+            raise ValueError("Archivo vacío")
+        encabezado, _, primero = primero.partition(b'\n')
+        formato = FormatoCSV(formato.separador, formato.comillas, [
+            campo.strip(formato.quitar) for campo in encabezado.decode('utf-8').split(formato.separador)
+        ])
+
+        metodo = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+        contexto = multiprocessing.get_context(metodo)
+        argumentos = (master if metodo == 'fork' else None, fuente, pesos, umbrales, formato, formato.posiciones())
+
+        confusion = np.zeros((len(master.umbrales) + 1, 2), dtype=np.int64)
+        histograma = np.zeros(BINS_SCORE, dtype=np.int64)
+        por_worker = {}
+        invalidas = 0
+        importes_invalidos = 0
+
+        def acumular(parcial):
+            nonlocal confusion, histograma, invalidas, importes_invalidos
+            confusion += parcial['confusion']
+            histograma += parcial['histograma']
+            invalidas += parcial['invalidas']
+            importes_invalidos += parcial['importes_invalidos']
+            worker = por_worker.setdefault(parcial['worker'], {'filas': 0, 'segundos': 0.0, 'bloques': 0})
+            worker['filas'] += parcial['filas']
+            worker['segundos'] += parcial['segundos']
+            worker['bloques'] += 1
+
+        print(f"⚙️ Backtest con {workers} workers ({metodo}), bloques de {tamano_bloque / 1e6:.0f} MB")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=contexto,
+                                 initializer=_iniciar_worker, initargs=argumentos) as pool:
+            # Ventana acotada de bloques en vuelo: memoria constante aunque el archivo sea enorme
+            en_vuelo = set()
+            for bloque in itertools.chain([primero], bloques):
+                if len(en_vuelo) >= workers * 2:
+                    listos, en_vuelo = wait(en_vuelo, return_when=FIRST_COMPLETED)
+                    for futuro in listos:
+                        acumular(futuro.result())
+                en_vuelo.add(pool.submit(procesar_bloque, bloque))
+            for futuro in en_vuelo:
+                acumular(futuro.result())
+    finally:
+        body.close()
+
+    segundos = time.perf_counter() - inicio
+    filas = int(confusion.sum())
+    decisiones = [decision for _, decision, _ in master.umbrales] + [DECISIONES[-1]]
+    return {
+        'fuente': fuente.descripcion(),
+        'pesos': master.pesos,
+        'umbrales': [umbral for umbral, _, _ in master.umbrales],
+        'filas': filas,
+        'filas_invalidas': invalidas,
+        'filas_importe_invalido': importes_invalidos,
+        'segundos': round(segundos, 3),
+        'filas_por_segundo': round(filas / segundos) if segundos > 0 else 0,
+        'decisiones': decisiones,
+        'confusion': {
+            decision: {'fraude': int(confusion[i, 1]), 'no_fraude': int(confusion[i, 0])}
+            for i, decision in enumerate(decisiones)
+        },
+        'histograma_score': {
+            f"{i / BINS_SCORE:.2f}-{(i + 1) / BINS_SCORE:.2f}": int(conteo) for i, conteo in enumerate(histograma)
+        },
+        'workers': {
+            str(pid): {
+                'filas': w['filas'],
+                'bloques': w['bloques'],
+                'filas_por_segundo': round(w['filas'] / w['segundos']) if w['segundos'] > 0 else 0
+            }
+            for pid, w in sorted(por_worker.items())
+        }
+    }
+
+
+def imprimir_resultado(resultado: dict):
+    print("\n📊 Matriz de confusión (decisión vs código 83)")
+    print("=" * 60)
+    print(f"   {'decisión':<14}{'fraude':>14}{'no fraude':>16}")
+    for decision, fila in resultado['confusion'].items():
+        print(f"   {decision:<14}{fila['fraude']:>14,}{fila['no_fraude']:>16,}")
+
+    # is_fraud en la API = BLOQUEAR o REVISAR
+    positivos = resultado['decisiones'][:2]
+    vp = sum(resultado['confusion'][d]['fraude'] for d in positivos)
+    fp = sum(resultado['confusion'][d]['no_fraude'] for d in positivos)
+    total_fraude = sum(fila['fraude'] for fila in resultado['confusion'].values())
+    precision = vp / (vp + fp) if vp + fp else 0.0
+    recall = vp / total_fraude if total_fraude else 0.0
+    print(f"\n   is_fraud ({' + '.join(positivos)}): precisión {precision:.2%}, recall {recall:.2%}")
+
+    print("\n📈 Distribución del score final")
+    print("=" * 60)
+    maximo = max(resultado['histograma_score'].values()) or 1
+    for rango, conteo in resultado['histograma_score'].items():
+        print(f"   {rango}  {conteo:>12,}  {'█' * round(40 * conteo / maximo)}")
+
+    print("\n⚙️ Workers")
+    print("=" * 60)
+    for pid, worker in resultado['workers'].items():
+        print(f"   pid {pid:<8}{worker['filas']:>12,} filas  {worker['bloques']:>5} bloques  {worker['filas_por_segundo']:>10,} filas/s")
+    print(f"\n✅ {resultado['filas']:,} filas en {resultado['segundos']:.1f}s "
+          f"({resultado['filas_por_segundo']:,} filas/s, {resultado['filas_invalidas']:,} inválidas)")
+    if resultado['filas_importe_invalido']:
+        print(f"⚠️ {resultado['filas_importe_invalido']:,} filas omitidas por importe inválido")
+
+
+def parsear_pesos(texto: str) -> dict:
+    pesos = {}
+    for par in texto.split(','):
+        nombre, _, valor = par.partition('=')
+        pesos[nombre.strip()] = float(valor)
+    return pesos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--archivo', help='CSV local (por defecto LOCAL_DATA_FILE o S3_BUCKET/S3_FILE)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--tamano-bloque', type=int, default=TAMANO_CHUNK, help='bytes por bloque de trabajo')
+    parser.add_argument('--pesos', type=parsear_pesos, help='p.ej. blacklist=0.5,fraude=0.3,segmento=0.2')
+    parser.add_argument('--umbrales', type=lambda t: [float(u) for u in t.split(',')],
+                        help=f'umbrales de {", ".join(DECISIONES[:-1])} (p.ej. 0.8,0.5,0.3)')
+    parser.add_argument('--json', help='guardar el resultado en este archivo')
+    args = parser.parse_args()
+
+    if args.umbrales and len(args.umbrales) != len(UMBRALES_DECISION):
+        parser.error(f"--umbrales necesita {len(UMBRALES_DECISION)} valores")
+    # Cada umbral es el borde inferior de su decisión: deben ir de mayor a menor
+    if args.umbrales and any(a <= b for a, b in zip(args.umbrales, args.umbrales[1:])):
+        parser.error(f"--umbrales deben ser estrictamente decrecientes ({', '.join(DECISIONES[:-1])})")
+
+    fuente = FuenteLocal(args.archivo) if args.archivo else fuente_por_defecto()
+    resultado = ejecutar_backtest(fuente, args.workers, args.tamano_bloque, args.pesos, args.umbrales)
+    imprimir_resultado(resultado)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2)
+        print(f"💾 Resultado guardado en {args.json}")
+
+
+if __name__ == "__main__":
+    main()
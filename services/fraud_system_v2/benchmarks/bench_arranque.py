@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Benchmark: tiempo hasta que uvicorn acepta conexiones y hasta que /ready responde 200"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from generar_csv import escribir_csv_sintetico
+
+SERVICIO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def escuchando(puerto: int) -> bool:
+    try:
+        with socket.create_connection(('127.0.0.1', puerto), timeout=0.2):
+            return True
+    except OSError:
+        return False
+
+
+def estado_http(url: str, datos: dict = None) -> int:
+    peticion = urllib.request.Request(url)
+    if datos is not None:
+        peticion = urllib.request.Request(url, data=json.dumps(datos).encode(), headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(peticion, timeout=1) as respuesta:
+            return respuesta.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return 0
+
+
+def medir(servicio: str, entorno: dict, timeout: float) -> dict:
+    """Lanzar uvicorn y medir los segundos hasta el primer listen y hasta /ready (o /health en versiones sin /ready)"""
+    puerto = puerto_libre()
+    inicio = time.perf_counter()
+    proceso = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'api_wrapper:app', '--port', str(puerto), '--log-level', 'warning'],
+        cwd=servicio, env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    resultado = {'listen': None, 'ready': None, 'status_durante_carga': None}
+    try:
+        while time.perf_counter() - inicio < timeout:
+            if proceso.poll() is not None:
+                raise RuntimeError(f"uvicorn terminó con código {proceso.returncode}")
+            if resultado['listen'] is None and escuchando(puerto):
+                resultado['listen'] = time.perf_counter() - inicio
+                resultado['status_durante_carga'] = estado_http(f"http://127.0.0.1:{puerto}/analyze-fraud", {
+                    "customer_id": "1", "transaction_id": "TXN1", "transaction_data": {"amount": 100.0}
+                })
+            if resultado['listen'] is not None:
+                estado = estado_http(f"http://127.0.0.1:{puerto}/ready")
+                if estado == 404:  # Versión anterior sin /ready: lista al escuchar
+                    estado = estado_http(f"http://127.0.0.1:{puerto}/health")
+                if estado == 200:
+                    resultado['ready'] = time.perf_counter() - inicio
+                    break
+            time.sleep(0.02)
+    finally:
+        proceso.terminate()
+        proceso.wait()
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--filas', type=int, default=2_000_000, help='filas del CSV sintético')
+    parser.add_argument('--servicio', default=SERVICIO,
+                        help='directorio con api_wrapper.py (p.ej. un git worktree de una versión anterior)')
+    parser.add_argument('--timeout', type=float, default=600)
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix='bench_arranque_')
+    ruta_csv = os.path.join(directorio, 'BaseFinal.csv')
+    print(f"📝 Generando CSV sintético de {args.filas:,} filas...")
+    escribir_csv_sintetico(ruta_csv, args.filas)
+
+    entorno = dict(os.environ, LOCAL_DATA_FILE=ruta_csv, REFRESH_INTERVAL_SECONDS='0',
+                   BLACKLIST_LOG=os.path.join(directorio, 'blacklist_log.jsonl'))
+    escenarios = [
+        ('sin snapshot', dict(entorno, SNAPSHOT_DIR='')),
+        ('snapshot frío', dict(entorno, SNAPSHOT_DIR=os.path.join(directorio, 'snapshots'))),
+        ('snapshot caliente', dict(entorno, SNAPSHOT_DIR=os.path.join(directorio, 'snapshots')))
+    ]
+
+    print(f"\n⏱️ Arranque de {args.servicio}")
+    print("=" * 72)
+    print(f"   {'escenario':<20}{'primer listen (s)':>20}{'ready (s)':>14}{'status en carga':>18}")
+    for nombre, variables in escenarios:
+        resultado = medir(args.servicio, variables, args.timeout)
+        ready = f"{resultado['ready']:.2f}" if resultado['ready'] is not None else 'timeout'
+        print(f"   {nombre:<20}{resultado['listen']:>20.2f}{ready:>14}{resultado['status_durante_carga']:>18}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Benchmark: throughput de /analyze-fraud (una por llamada) vs /analyze-fraud/batch"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from generar_csv import escribir_csv_sintetico
+
+
+def transacciones(n: int, clientes: int, semilla: int = 7) -> list:
+    rng = random.Random(semilla)
+    return [
+        {
+            "customer_id": str(rng.randrange(clientes * 2)),
+            "transaction_id": f"TXN{i}",
+            "transaction_data": {"amount": round(rng.uniform(100, 500000), 2)}
+        }
+        for i in range(n)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--filas', type=int, default=100_000, help='filas del CSV sintético')
+    parser.add_argument('--transacciones', type=int, default=5_000)
+    parser.add_argument('--lote', type=int, default=5_000, help='transacciones por llamada batch')
+    parser.add_argument('--timeout', type=float, default=600, help='segundos máximos de carga de datos')
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix='bench_batch_')
+    ruta_csv = os.path.join(directorio, 'BaseFinal.csv')
+    escribir_csv_sintetico(ruta_csv, args.filas)
+    os.environ['LOCAL_DATA_FILE'] = ruta_csv
+    os.environ['SNAPSHOT_DIR'] = os.path.join(directorio, 'snapshots')
+
+    from fastapi.testclient import TestClient
+    import api_wrapper
+
+    client = TestClient(api_wrapper.app)
+    api_wrapper.fraud_system.start()
+    if not api_wrapper.fraud_system.ready.wait(args.timeout):
+        print(f"❌ Los datos no cargaron en {args.timeout:g}s: {api_wrapper.fraud_system.load_error}")
+        sys.exit(1)
+    payload = transacciones(args.transacciones, args.filas)
+
+    inicio = time.perf_counter()
+    for transaccion in payload:
+        client.post("/analyze-fraud", json=transaccion)
+    individual = args.transacciones / (time.perf_counter() - inicio)
+
+    resultados = {}
+    for include_risk_factors in (True, False):
+        inicio = time.perf_counter()
+        for i in range(0, len(payload), args.lote):
+            client.post("/analyze-fraud/batch", json={
+                "transactions": payload[i:i + args.lote],
+                "include_risk_factors": include_risk_factors
+            })
+        resultados[include_risk_factors] = args.transacciones / (time.perf_counter() - inicio)
+
+    print("\n⏱️ Throughput (transacciones/s)")
+    print("=" * 60)
+    print(f"   /analyze-fraud:                        {individual:>12,.0f}")
+    print(f"   /analyze-fraud/batch (risk_factors):   {resultados[True]:>12,.0f} ({resultados[True] / individual:.1f}x)")
+    print(f"   /analyze-fraud/batch (sin detalle):    {resultados[False]:>12,.0f} ({resultados[False] / individual:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Paridad y throughput de agente_fraude.clasificar_lote frente a analizar_importe"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.agente_fraude import agente_fraude
+
+
+def crear_agente(promedio: float) -> agente_fraude:
+    agente = agente_fraude(pd.DataFrame())
+    agente.promedio_fraude = promedio
+    return agente
+
+
+def importes_aleatorios(rng, promedio: float, n: int) -> np.ndarray:
+    """Importes aleatorios más los bordes exactos de cada banda y sus vecinos en float"""
+    bordes = np.array([promedio * 100, promedio * 10, promedio * 0.8, promedio * 1.2,
+                       promedio * 0.5, promedio * 1.5, promedio, 0.0, -promedio])
+    vecinos = np.concatenate([bordes, np.nextafter(bordes, np.inf), np.nextafter(bordes, -np.inf)])
+    escala = abs(promedio) if promedio else 1.0
+    aleatorios = np.concatenate([
+        rng.lognormal(np.log(escala), 2.0, n // 2),
+        rng.uniform(-escala, escala * 200, n - n // 2),
+        # Redondeados a centavos, como llegan desde la API
+        np.round(rng.uniform(0, escala * 20, n // 4), 2)
+    ])
+    return np.concatenate([vecinos, aleatorios, [np.nan, np.inf, -np.inf]])
+
+
+def verificar_paridad(casos: int, n: int, semilla: int) -> int:
+    """Comparar ambas rutas para promedios e importes aleatorios; devuelve diferencias"""
+    rng = np.random.default_rng(semilla)
+    promedios = np.concatenate([[0.0, 1000.0, 358698.94], rng.lognormal(8, 3, casos)])
+    diferencias = 0
+    for promedio in promedios:
+        agente = crear_agente(float(promedio))
+        importes = importes_aleatorios(rng, float(promedio), n)
+        bandas, vectorizadas = agente.clasificar_lote(importes)
+        for importe, banda, probabilidad in zip(importes.tolist(), bandas.tolist(), vectorizadas.tolist()):
+            escalar = agente.analizar_importe(importe)
+            if escalar['probabilidad_fraude'] != probabilidad or escalar['razon'] != agente.razon(importe, banda):
+                diferencias += 1
+                if diferencias <= 5:
+                    print(f"   ❌ promedio={promedio!r} importe={importe!r}: "
+                          f"{escalar['probabilidad_fraude']!r} vs {probabilidad!r}")
+    return diferencias
+
+
+def medir_throughput(n: int, semilla: int):
+    rng = np.random.default_rng(semilla)
+    agente = crear_agente(358698.94)
+    importes = rng.lognormal(12, 2, n)
+
+    inicio = time.perf_counter()
+    agente.clasificar_lote(importes)
+    vectorizado = n / (time.perf_counter() - inicio)
+
+    muestra = importes[:min(n, 200_000)].tolist()
+    inicio = time.perf_counter()
+    for importe in muestra:
+        agente.analizar_importe(importe)
+    escalar = len(muestra) / (time.perf_counter() - inicio)
+    return escalar, vectorizado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--casos', type=int, default=200, help='promedios aleatorios a probar')
+    parser.add_argument('--importes', type=int, default=2_000, help='importes aleatorios por promedio')
+    parser.add_argument('--throughput', type=int, default=5_000_000)
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    print("🧪 Verificando paridad escalar vs vectorizado...")
+    diferencias = verificar_paridad(args.casos, args.importes, args.semilla)
+    if diferencias:
+        print(f"❌ {diferencias:,} diferencias encontradas")
+    else:
+        print("✅ Mismas probabilidades y razones en todos los casos")
+
+    escalar, vectorizado = medir_throughput(args.throughput, args.semilla)
+    print("\n⏱️ Throughput (importes/s)")
+    print(f"   analizar_importe: {escalar:>14,.0f}")
+    print(f"   clasificar_lote:  {vectorizado:>14,.0f} ({vectorizado / escalar:.0f}x)")
+    return 1 if diferencias else 0
+
+
+if __name__ == "__main__":
+    exit(main())
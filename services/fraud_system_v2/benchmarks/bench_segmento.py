@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Microbenchmark: latencia de agente_segmento.analizar_segmento según tamaño del índice"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.agente_segmento import agente_segmento, IndiceSegmentos
+
+TAMANOS = [50_000, 500_000, 5_000_000, 50_000_000]
+
+
+def construir_agente(filas: int, rng) -> agente_segmento:
+    """Índice sintético con `filas` clientes únicos y segmentos aleatorios"""
+    documentos = rng.permutation(filas).astype(np.int64) * 7 + 1_000_000
+    codigos = rng.integers(0, 4, size=filas, dtype=np.int8)
+    return agente_segmento(None, IndiceSegmentos(documentos, codigos))
+
+
+def medir_latencia(agente: agente_segmento, consultas: np.ndarray) -> float:
+    """Nanosegundos promedio por llamada a analizar_segmento"""
+    consultas = consultas.tolist()
+    for documento in consultas[:1000]:  # Calentamiento
+        agente.analizar_segmento(documento)
+    inicio = time.perf_counter_ns()
+    for documento in consultas:
+        agente.analizar_segmento(documento)
+    return (time.perf_counter_ns() - inicio) / len(consultas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tamanos', type=int, nargs='+', default=TAMANOS)
+    parser.add_argument('--consultas', type=int, default=100_000)
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.semilla)
+    print("⏱️ Latencia de analizar_segmento por tamaño de índice")
+    print("=" * 60)
+    resultados = []
+    for filas in args.tamanos:
+        agente = construir_agente(filas, rng)
+        # Mitad de consultas a clientes existentes, mitad a desconocidos
+        existentes = agente.indice.documentos[rng.integers(0, filas, size=args.consultas // 2)]
+        desconocidos = rng.integers(0, 1_000_000, size=args.consultas - len(existentes))
+        consultas = rng.permutation(np.concatenate([existentes, desconocidos]))
+        ns = medir_latencia(agente, consultas)
+        resultados.append((filas, ns))
+        print(f"   📊 {filas:>12,} filas: {ns / 1000:8.2f} µs/consulta")
+        del agente
+
+    base = resultados[0][1]
+    print(f"\n📈 Relación entre el índice más grande y el más chico: {resultados[-1][1] / base:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Generador con semilla de BaseFinal.csv sintéticos (formato quoted con ';')"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+ENCABEZADO = '"NUMERO_DOCUMENTO;importe;fecha_de_compra;CODIGO_RAZON_CONTRACARGO;CANT_PREPAGOS;CANT_POSPAGOS"\n'
+# Otros motivos de contracargo que no son fraude (y su proporción sobre las filas no fraudulentas)
+CODIGOS_NO_FRAUDE = np.array([10, 41, 53, 70], dtype=np.int16)
+RATIO_OTROS_CODIGOS = 0.002
+FILAS_POR_BLOQUE = 1_000_000
+# Importes: lognormal alrededor de ~20k, el fraude alrededor del promedio real (~360k)
+MEDIANA_IMPORTE = 20_000
+MEDIANA_IMPORTE_FRAUDE = 360_000
+
+
+def parsear_tamano(texto: str) -> int:
+    """'10k', '1.5M', '100M' o un entero"""
+    texto = texto.strip().lower().replace('_', '')
+    multiplicadores = {'k': 1_000, 'm': 1_000_000, 'g': 1_000_000_000}
+    if texto[-1] in multiplicadores:
+        return int(float(texto[:-1]) * multiplicadores[texto[-1]])
+    return int(texto)
+
+
+def _bloque(rng, inicio: int, filas: int, clientes: int, ratio_fraude: float) -> str:
+    documentos = rng.integers(1, clientes + 1, size=filas)
+    fraude = rng.random(filas) < ratio_fraude
+    importes = np.where(
+        fraude,
+        rng.lognormal(np.log(MEDIANA_IMPORTE_FRAUDE), 0.3, filas),
+        rng.lognormal(np.log(MEDIANA_IMPORTE), 1.2, filas)
+    )
+    codigos = np.where(fraude, 83, 0).astype(np.int16)
+    otros = ~fraude & (rng.random(filas) < RATIO_OTROS_CODIGOS)
+    codigos[otros] = rng.choice(CODIGOS_NO_FRAUDE, size=int(otros.sum()))
+    # El segmento depende del cliente, no de la fila: mismo cliente, mismas cantidades
+    prepagos = (documentos * 2654435761 % 5).astype(np.int64) % 3
+    pospagos = (documentos * 40503 % 7).astype(np.int64) % 3
+    dias = (inicio + np.arange(filas)) % 365
+    fechas = (np.datetime64('2024-01-01') + dias.astype('timedelta64[D]')).astype(str)
+
+    return ''.join(
+        f'"{d};{i:.2f};{f};{c};{p};{q}"\n'
+        for d, i, f, c, p, q in zip(
+            documentos.tolist(), importes.tolist(), fechas.tolist(),
+            codigos.tolist(), prepagos.tolist(), pospagos.tolist()
+        )
+    )
+
+
+def escribir_csv(ruta: str, filas: int, semilla: int = 42, ratio_fraude: float = 0.001, clientes: int = None) -> dict:
+    """
+    Escribir `filas` filas reproducibles (misma semilla y parámetros -> mismo archivo).
+    clientes: cantidad de NUMERO_DOCUMENTO distintos (por defecto filas / 5, hay compras repetidas).
+    """
+    clientes = clientes or max(1, filas // 5)
+    rng = np.random.default_rng(semilla)
+    inicio = time.perf_counter()
+    with open(ruta, 'w', encoding='utf-8') as f:
+        f.write(ENCABEZADO)
+        for desde in range(0, filas, FILAS_POR_BLOQUE):
+            f.write(_bloque(rng, desde, min(FILAS_POR_BLOQUE, filas - desde), clientes, ratio_fraude))
+    return {
+        'ruta': ruta,
+        'filas': filas,
+        'clientes': clientes,
+        'ratio_fraude': ratio_fraude,
+        'semilla': semilla,
+        'bytes': os.path.getsize(ruta),
+        'segundos': round(time.perf_counter() - inicio, 3)
+    }
+
+
+def escribir_csv_sintetico(ruta: str, filas: int, semilla: int = 42):
+    """Compatibilidad con los benchmarks existentes: 1% de fraude, un cliente por fila"""
+    return escribir_csv(ruta, filas, semilla, ratio_fraude=0.01, clientes=filas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('ruta')
+    parser.add_argument('--filas', type=parsear_tamano, default='100k', help='p.ej. 10k, 1M, 100M')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--ratio-fraude', type=float, default=0.001)
+    parser.add_argument('--clientes', type=parsear_tamano, help='NUMERO_DOCUMENTO distintos (default filas/5)')
+    args = parser.parse_args()
+
+    info = escribir_csv(args.ruta, args.filas, args.semilla, args.ratio_fraude, args.clientes)
+    print(f"✅ {info['filas']:,} filas ({info['bytes'] / 1e6:,.1f} MB) en {info['segundos']:.1f}s -> {info['ruta']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Suite de benchmarks: carga del CSV, RSS pico, latencia por agente y throughput
+end-to-end de /analyze-fraud con un cliente ASGI local. Guarda los resultados en
+JSON para compararlos entre commits.
+
+    python benchmarks/suite.py --filas 10k 1M 10M
+    python benchmarks/suite.py --comparar resultados/a.json resultados/b.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+SERVICIO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(SERVICIO)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from generar_csv import escribir_csv, parsear_tamano
+
+DIRECTORIO_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resultados')
+
+
+def rss_pico_mb() -> float:
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def percentiles_us(muestras_ns: list) -> dict:
+    muestras = sorted(muestras_ns)
+    def p(q):
+        return round(muestras[min(len(muestras) - 1, int(q * len(muestras)))] / 1000, 2)
+    return {'p50_us': p(0.50), 'p99_us': p(0.99), 'media_us': round(sum(muestras) / len(muestras) / 1000, 2)}
+
+
+# --- Etapas: cada una corre en un proceso aparte para medir su RSS pico sin interferencias ---
+
+def etapa_carga(ruta: str, snapshot: str) -> dict:
+    """Construir agente_master (con SNAPSHOT_DIR vacío es un parseo completo del CSV)"""
+    os.environ['LOCAL_DATA_FILE'] = ruta
+    os.environ['SNAPSHOT_DIR'] = snapshot
+    from agents.agente_master import agente_master
+    inicio = time.perf_counter()
+    master = agente_master()
+    return {
+        'segundos': round(time.perf_counter() - inicio, 3),
+        'rss_pico_mb': rss_pico_mb(),
+        'filas_fraude': len(master.data),
+        'blacklist': len(master.agente_blacklist.blacklist),
+        'estadisticas_carga': master.estadisticas_carga
+    }
+
+
+def etapa_agentes(ruta: str, snapshot: str, consultas: int) -> dict:
+    """Latencia por llamada de cada agente y de analizar_transaccion, y throughput del lote"""
+    os.environ['LOCAL_DATA_FILE'] = ruta
+    os.environ['SNAPSHOT_DIR'] = snapshot
+    from agents.agente_master import agente_master
+    master = agente_master()
+    rng = random.Random(7)
+    maximo = max(10, master.indice_segmentos.documentos.max() if len(master.indice_segmentos) else 10)
+    documentos = [str(rng.randrange(int(maximo) * 2)) for _ in range(consultas)]
+    importes = [rng.uniform(100, 500_000) for _ in range(consultas)]
+
+    llamadas = {
+        'blacklist': lambda d, i: master.agente_blacklist.verificar_cliente(d),
+        'fraude': lambda d, i: master.agente_fraude.analizar_importe(i),
+        'segmento': lambda d, i: master.agente_segmento.analizar_segmento(d),
+        'analizar_transaccion': master.analizar_transaccion
+    }
+    resultado = {}
+    for nombre, llamada in llamadas.items():
+        for d, i in zip(documentos[:1000], importes[:1000]):  # Calentamiento
+            llamada(d, i)
+        muestras = []
+        for d, i in zip(documentos, importes):
+            t0 = time.perf_counter_ns()
+            llamada(d, i)
+            muestras.append(time.perf_counter_ns() - t0)
+        resultado[nombre] = percentiles_us(muestras)
+
+    inicio = time.perf_counter()
+    master.analizar_lote(documentos, importes)
+    resultado['analizar_lote_filas_por_segundo'] = round(consultas / (time.perf_counter() - inicio))
+    resultado['rss_pico_mb'] = rss_pico_mb()
+    return resultado
+
+
+def etapa_e2e(ruta: str, snapshot: str, requests: int, concurrencia: int, timeout: float) -> dict:
+    """Throughput de /analyze-fraud a través de la app ASGI completa (sin red)"""
+    os.environ['LOCAL_DATA_FILE'] = ruta
+    os.environ['SNAPSHOT_DIR'] = snapshot
+    os.environ['REFRESH_INTERVAL_SECONDS'] = '0'
+    os.environ['DECISION_CACHE_SIZE'] = '0'  # Medir los agentes, no el cache
+    os.environ['BLACKLIST_LOG'] = os.path.join(snapshot or tempfile.mkdtemp(), 'blacklist_log.jsonl')
+    import httpx
+    import api_wrapper
+
+    api_wrapper.fraud_system.start()
+    if not api_wrapper.fraud_system.ready.wait(timeout):
+        # stderr llega al proceso padre, que aborta la suite
+        print(f"Los datos no cargaron en {timeout:g}s: {api_wrapper.fraud_system.load_error}", file=sys.stderr)
+        sys.exit(1)
+    rng = random.Random(11)
+    cuerpos = [
+        {"customer_id": str(rng.randrange(1_000_000)), "transaction_id": f"TXN{i}",
+         "transaction_data": {"amount": round(rng.uniform(100, 500_000), 2)}}
+        for i in range(requests)
+    ]
+
+    async def correr():
+        transporte = httpx.ASGITransport(app=api_wrapper.app)
+        latencias = []
+        errores = 0
+        async with httpx.AsyncClient(transport=transporte, base_url='http://bench') as cliente:
+            cola = iter(cuerpos)
+
+            async def trabajador():
+                nonlocal errores
+                for cuerpo in cola:
+                    t0 = time.perf_counter_ns()
+                    respuesta = await cliente.post('/analyze-fraud', json=cuerpo)
+                    latencias.append(time.perf_counter_ns() - t0)
+                    errores += respuesta.status_code != 200
+
+            inicio = time.perf_counter()
+            await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+            return time.perf_counter() - inicio, latencias, errores
+
+    segundos, latencias, errores = asyncio.run(correr())
+    return {
+        'requests': requests,
+        'concurrencia': concurrencia,
+        'requests_por_segundo': round(requests / segundos),
+        'errores': errores,
+        'latencia': percentiles_us(latencias),
+        'rss_pico_mb': rss_pico_mb()
+    }
+
+
+def en_subproceso(*argumentos) -> dict:
+    salida = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--etapa', *map(str, argumentos)],
+        capture_output=True, text=True, cwd=SERVICIO
+    )
+    if salida.returncode != 0:
+        raise RuntimeError(f"Etapa {argumentos[0]} falló:\n{salida.stderr[-2000:]}")
+    # La última línea es el JSON; el resto son los print() de los agentes
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def commit_actual() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=SERVICIO, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconocido'
+
+
+def ejecutar_suite(tamanos: list, args) -> dict:
+    directorio = tempfile.mkdtemp(prefix='bench_suite_')
+    resultado = {
+        'commit': commit_actual(),
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'maquina': f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+        'parametros': {'semilla': args.semilla, 'ratio_fraude': args.ratio_fraude,
+                       'consultas': args.consultas, 'requests': args.requests, 'concurrencia': args.concurrencia},
+        'tamanos': {}
+    }
+    for filas in tamanos:
+        print(f"\n📝 {filas:,} filas")
+        ruta = os.path.join(directorio, f"BaseFinal_{filas}.csv")
+        generado = escribir_csv(ruta, filas, args.semilla, args.ratio_fraude)
+        snapshot = os.path.join(directorio, f"snapshots_{filas}")
+        medicion = {'archivo_mb': round(generado['bytes'] / 1e6, 1)}
+
+        medicion['carga_csv'] = en_subproceso('carga', ruta, '')
+        print(f"   📥 parseo CSV: {medicion['carga_csv']['segundos']:.2f}s, RSS pico {medicion['carga_csv']['rss_pico_mb']} MB")
+        en_subproceso('carga', ruta, snapshot)  # Escribe el snapshot
+        medicion['carga_snapshot'] = en_subproceso('carga', ruta, snapshot)
+        print(f"   ⚡ snapshot:   {medicion['carga_snapshot']['segundos']:.2f}s, RSS pico {medicion['carga_snapshot']['rss_pico_mb']} MB")
+        medicion['agentes'] = en_subproceso('agentes', ruta, snapshot, args.consultas)
+        print("   🤖 " + ", ".join(
+            f"{nombre} p50 {valores['p50_us']} µs" for nombre, valores in medicion['agentes'].items() if isinstance(valores, dict)
+        ))
+        medicion['e2e'] = en_subproceso('e2e', ruta, snapshot, args.requests, args.concurrencia, args.timeout)
+        print(f"   🌐 /analyze-fraud: {medicion['e2e']['requests_por_segundo']:,} req/s, "
+              f"p99 {medicion['e2e']['latencia']['p99_us']} µs")
+        resultado['tamanos'][str(filas)] = medicion
+        os.remove(ruta)
+    return resultado
+
+
+# Métricas comparadas: (ruta dentro de cada tamaño, True si mayor es mejor)
+METRICAS_COMPARADAS = [
+    (('carga_csv', 'segundos'), False),
+    (('carga_csv', 'rss_pico_mb'), False),
+    (('carga_snapshot', 'segundos'), False),
+    (('carga_snapshot', 'rss_pico_mb'), False),
+    (('agentes', 'blacklist', 'p50_us'), False),
+    (('agentes', 'fraude', 'p50_us'), False),
+    (('agentes', 'segmento', 'p50_us'), False),
+    (('agentes', 'analizar_transaccion', 'p99_us'), False),
+    (('agentes', 'analizar_lote_filas_por_segundo'), True),
+    (('e2e', 'requests_por_segundo'), True),
+    (('e2e', 'latencia', 'p99_us'), False),
+]
+
+
+def comparar(ruta_base: str, ruta_nueva: str):
+    with open(ruta_base, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(ruta_nueva, encoding='utf-8') as f:
+        nueva = json.load(f)
+    print(f"📊 {base['commit']} -> {nueva['commit']}")
+    for tamano in base['tamanos']:
+        if tamano not in nueva['tamanos']:
+            continue
+        print(f"\n   {int(tamano):,} filas")
+        for ruta, mayor_es_mejor in METRICAS_COMPARADAS:
+            antes, despues = base['tamanos'][tamano], nueva['tamanos'][tamano]
+            try:
+                for clave in ruta:
+                    antes, despues = antes[clave], despues[clave]
+            except KeyError:
+                continue
+            cambio = (despues - antes) / antes if antes else 0.0
+            peor = cambio < -0.1 if mayor_es_mejor else cambio > 0.1
+            print(f"   {'⚠️' if peor else '  '} {'.'.join(ruta):<44}{antes:>12,}{despues:>12,}{cambio:>+9.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=parsear_tamano, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help='tamaños del CSV sintético (10k a 100M)')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--ratio-fraude', type=float, default=0.001)
+    parser.add_argument('--consultas', type=int, default=20_000, help='llamadas por agente')
+    parser.add_argument('--requests', type=int, default=5_000, help='requests end-to-end')
+    parser.add_argument('--concurrencia', type=int, default=32)
+    parser.add_argument('--timeout', type=float, default=600, help='segundos máximos de carga en la etapa e2e')
+    parser.add_argument('--salida', help='JSON de resultados (default resultados/<commit>-<fecha>.json)')
+    parser.add_argument('--comparar', nargs=2, metavar=('BASE', 'NUEVO'))
+    parser.add_argument('--etapa', nargs='+', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.etapa:
+        etapa, ruta, snapshot, *extra = args.etapa
+        if etapa == 'carga':
+            medicion = etapa_carga(ruta, snapshot)
+        elif etapa == 'agentes':
+            medicion = etapa_agentes(ruta, snapshot, int(extra[0]))
+        else:
+            medicion = etapa_e2e(ruta, snapshot, int(extra[0]), int(extra[1]), float(extra[2]))
+        print(json.dumps(medicion))
+        return
+    if args.comparar:
+        comparar(*args.comparar)
+        return
+
+    resultado = ejecutar_suite(args.filas, args)
+    salida = args.salida or os.path.join(DIRECTORIO_RESULTADOS, f"{resultado['commit']}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, indent=2)
+    print(f"\n💾 Resultados en {salida}")
+
+
+if __name__ == "__main__":
+    main()
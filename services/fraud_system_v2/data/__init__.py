@@ -0,0 +1 @@
+# Paquete de carga de datos
\ No newline at end of file
@@ -0,0 +1,214 @@
+"""Cargador en streaming de BaseFinal.csv con memoria constante"""
+import codecs
+import time
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from data.documentos import DOCUMENTO_INVALIDO, normalizar_documento
+from data.formato import FormatoCSV, inferir_formato
+
+CODIGO_FRAUDE = '83'
+TAMANO_CHUNK = 8 * 1024 * 1024
+INTERVALO_REPORTE = 1_000_000
+# Códigos compactos de segmento (ver agente_segmento.SEGMENTOS)
+CODIGO_PREPAGO = 1
+CODIGO_POSPAGO = 2
+# Filas de segmento acumuladas antes de deduplicarlas contra el índice parcial
+COMPACTAR_SEGMENTOS = 1_000_000
+
+
+def _es_positivo(valor: str) -> bool:
+    try:
+        return float(valor) > 0
+    except ValueError:
+        return False
+
+
+def iterar_lineas(body, tamano_chunk: int = TAMANO_CHUNK, contador=None):
+    """
+    Leer un stream binario por chunks y devolver sus líneas ya decodificadas.
+    Solo se mantiene en memoria un chunk y la línea incompleta del final.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    pendiente = ''
+    while True:
+        chunk = body.read(tamano_chunk)
+        if not chunk:
+            break
+        if contador is not None:
+            contador(len(chunk))
+        lineas = (pendiente + decoder.decode(chunk)).split('\n')
+        pendiente = lineas.pop()
+        yield from lineas
+    pendiente += decoder.decode(b'', final=True)
+    if pendiente:
+        yield pendiente
+
+
+def leer_bloques(body, tamano_bloque: int = TAMANO_CHUNK):
+    """Bloques de bytes terminados en fin de línea (para repartir el parseo entre procesos)"""
+    resto = b''
+    while True:
+        chunk = body.read(tamano_bloque)
+        if not chunk:
+            break
+        chunk = resto + chunk
+        corte = chunk.rfind(b'\n') + 1
+        resto = chunk[corte:]
+        if corte:
+            yield chunk[:corte]
+    if resto:
+        yield resto
+
+
+class CargadorCSV:
+    def __init__(self, tamano_chunk: int = TAMANO_CHUNK, formato: FormatoCSV = None):
+        """
+        Parser en streaming de BaseFinal.csv (separador y comillas de `formato`,
+        o inferidos del encabezado). Solo conserva las filas con código 83, en
+        columnas tipadas (documento normalizado a int64), y el segmento
+        (CANT_PREPAGOS/CANT_POSPAGOS) de la primera fila de cada cliente en
+        arrays compactos (9 bytes por cliente, sin un dict por cliente).
+        """
+        self.tamano_chunk = tamano_chunk
+        self.formato = formato
+        self.bytes_leidos = 0
+        self.filas_leidas = 0
+        self.filas_fraude = 0
+        self.inicio = None
+        self.fin = None
+        # Índice parcial de segmentos (ordenado, sin duplicados) y filas aún sin deduplicar
+        self.segmento_documentos = np.empty(0, dtype=np.int64)
+        self.segmento_codigos = np.empty(0, dtype=np.int8)
+        self._documentos_pendientes = array('q')
+        self._codigos_pendientes = array('b')
+
+    def _sumar_bytes(self, n: int):
+        self.bytes_leidos += n
+
+    def cargar(self, body) -> pd.DataFrame:
+        """Parsear un stream binario (S3 StreamingBody o archivo) a DataFrame"""
+        self.inicio = time.perf_counter()
+        documentos = array('q')
+        importes = array('d')
+
+        lineas = iterar_lineas(body, self.tamano_chunk, self._sumar_bytes)
+        # Encabezado (primera línea no vacía): posiciones de todas las columnas que se usan
+        encabezado = ''
+        for linea in lineas:
+            if linea.strip():
+                encabezado = linea
+                break
+        if self.formato is None:
+            self.formato = inferir_formato(encabezado)
+        separador, quitar = self.formato.separador, self.formato.quitar
+        formato = FormatoCSV(separador, self.formato.comillas, [campo.strip(quitar) for campo in encabezado.split(separador)])
+        pos_documento, pos_importe, pos_codigo, max_split = formato.posiciones()
+        pos_segmento = None
+        if 'CANT_PREPAGOS' in formato.columnas and 'CANT_POSPAGOS' in formato.columnas:
+            pos_prepagos, pos_pospagos, max_segmento = formato.posiciones(('CANT_PREPAGOS', 'CANT_POSPAGOS'))
+            pos_segmento = pos_prepagos, pos_pospagos
+            max_split = max(max_split, max_segmento)
+        documentos_pendientes = self._documentos_pendientes
+        codigos_pendientes = self._codigos_pendientes
+        ultimo_documento = DOCUMENTO_INVALIDO
+        # (CANT_PREPAGOS, CANT_POSPAGOS) crudos -> código; son pocos valores distintos
+        codigos_por_valor = {}
+
+        for linea in lineas:
+            self.filas_leidas += 1
+            if self.filas_leidas % INTERVALO_REPORTE == 0:
+                self._reportar_progreso()
+
+            campos = linea.split(separador, max_split)
+            if len(campos) < max_split:
+                continue
+            numero_documento = campos[pos_documento].strip(quitar)
+            documento = normalizar_documento(numero_documento)
+            # Filas seguidas del mismo cliente no cambian su segmento (gana la primera)
+            if pos_segmento and documento != ultimo_documento and documento != DOCUMENTO_INVALIDO:
+                ultimo_documento = documento
+                documentos_pendientes.append(documento)
+                valores = (campos[pos_prepagos], campos[pos_pospagos])
+                codigo = codigos_por_valor.get(valores)
+                if codigo is None:
+                    codigo = (
+                        (CODIGO_PREPAGO if _es_positivo(valores[0].strip(quitar)) else 0) |
+                        (CODIGO_POSPAGO if _es_positivo(valores[1].strip(quitar)) else 0)
+                    )
+                    if len(codigos_por_valor) < 4096:
+                        codigos_por_valor[valores] = codigo
+                codigos_pendientes.append(codigo)
+                if len(documentos_pendientes) >= COMPACTAR_SEGMENTOS:
+                    self._compactar_segmentos()
+
+            if campos[pos_codigo].strip(quitar) != CODIGO_FRAUDE:  # Solo conservar filas con código 83 (fraude)
+                continue
+            try:
+                importe = float(campos[pos_importe].strip(quitar).replace(',', ''))
+            except ValueError:
+                importe = 0.0  # Default value for invalid amounts
+                print(f"⚠️ Invalid amount '{campos[pos_importe]}' for document {numero_documento}")
+            documentos.append(documento)
+            importes.append(importe)
+            self.filas_fraude += 1
+
+        self._compactar_segmentos()
+        self.fin = time.perf_counter()
+        self._reportar_progreso(final=True)
+
+        return pd.DataFrame({
+            'NUMERO_DOCUMENTO': np.frombuffer(documentos, dtype=np.int64) if documentos else np.empty(0, dtype=np.int64),
+            'importe': np.frombuffer(importes, dtype=np.float64) if importes else np.empty(0),
+            'CODIGO_RAZON_CONTRACARGO': np.full(len(documentos), 83, dtype=np.int16)
+        })
+
+    def _compactar_segmentos(self):
+        """
+        Unir las filas pendientes al índice parcial. El índice va primero, así
+        np.unique (primera aparición) conserva el segmento de la primera fila del cliente.
+        """
+        if not self._documentos_pendientes:
+            return
+        documentos = np.concatenate((self.segmento_documentos, np.frombuffer(self._documentos_pendientes, dtype=np.int64)))
+        codigos = np.concatenate((self.segmento_codigos, np.frombuffer(self._codigos_pendientes, dtype=np.int8)))
+        self.segmento_documentos, primeras = np.unique(documentos, return_index=True)
+        self.segmento_codigos = codigos[primeras]
+        del self._documentos_pendientes[:]
+        del self._codigos_pendientes[:]
+
+    def indice_segmentos(self):
+        """Documentos (ordenados, únicos) y códigos de segmento por cliente como arrays"""
+        self._compactar_segmentos()
+        return self.segmento_documentos, self.segmento_codigos
+
+    def liberar_segmentos(self):
+        """Soltar el índice de segmentos una vez que lo tiene el agente"""
+        self.segmento_documentos = np.empty(0, dtype=np.int64)
+        self.segmento_codigos = np.empty(0, dtype=np.int8)
+
+    def segundos(self) -> float:
+        """Tiempo transcurrido de la carga (en curso o terminada)"""
+        if self.inicio is None:
+            return 0.0
+        return (self.fin or time.perf_counter()) - self.inicio
+
+    def estadisticas(self) -> dict:
+        """Métricas de la carga: bytes, filas y filas por segundo"""
+        segundos = self.segundos()
+        return {
+            'bytes_leidos': self.bytes_leidos,
+            'filas_leidas': self.filas_leidas,
+            'filas_fraude': self.filas_fraude,
+            'segundos': round(segundos, 3),
+            'filas_por_segundo': round(self.filas_leidas / segundos) if segundos > 0 else 0
+        }
+
+    def _reportar_progreso(self, final: bool = False):
+        stats = self.estadisticas()
+        prefijo = "✅ Carga completada" if final else "⏳ Cargando"
+        print(f"{prefijo}: {stats['filas_leidas']:,} filas, "
+              f"{stats['bytes_leidos'] / 1e6:,.1f} MB, "
+              f"{stats['filas_por_segundo']:,} filas/s")
@@ -0,0 +1,91 @@
+"""Coordinación entre workers: un líder construye los snapshots y el resto los adjunta por mmap"""
+import fcntl
+import json
+import os
+import time
+
+ARCHIVO_LIDER = 'lider.lock'
+ARCHIVO_PUNTERO = 'actual.json'
+ARCHIVO_SOLICITUD_COMPACTAR = 'compactar.solicitud'
+
+
+class CoordinadorSnapshots:
+    def __init__(self, directorio: str):
+        """
+        El líder es el proceso que tiene el flock de lider.lock (el SO lo libera si
+        muere). Solo él consulta la fuente, parsea, compacta y publica en actual.json
+        qué snapshot usar; los demás workers lo adjuntan con mmap, sin copiarlo, así
+        las páginas en memoria son las mismas para todos.
+        """
+        self.directorio = directorio
+        self.ruta_lider = os.path.join(directorio, ARCHIVO_LIDER)
+        self.ruta_puntero = os.path.join(directorio, ARCHIVO_PUNTERO)
+        self.ruta_solicitud = os.path.join(directorio, ARCHIVO_SOLICITUD_COMPACTAR)
+        self._fd_lider = None
+
+    @property
+    def es_lider(self) -> bool:
+        return self._fd_lider is not None
+
+    def intentar_liderazgo(self) -> bool:
+        """Tomar el liderazgo si está libre (no bloquea)"""
+        if self._fd_lider is not None:
+            return True
+        os.makedirs(self.directorio, exist_ok=True)
+        fd = os.open(self.ruta_lider, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode('ascii'))
+        self._fd_lider = fd
+        return True
+
+    def liberar(self):
+        if self._fd_lider is not None:
+            fcntl.flock(self._fd_lider, fcntl.LOCK_UN)
+            os.close(self._fd_lider)
+            self._fd_lider = None
+
+    def publicar(self, version: str, registro_seq: int):
+        """Apuntar a los workers al snapshot de `version` (rename atómico del puntero)"""
+        puntero = {
+            'version': version,
+            'registro_seq': registro_seq,
+            'pid': os.getpid(),
+            'publicado_en': time.time()
+        }
+        temporal = f"{self.ruta_puntero}.tmp-{os.getpid()}"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(puntero, f)
+        os.replace(temporal, self.ruta_puntero)
+
+    def leer(self):
+        """Puntero publicado por el líder, o None si todavía no hay"""
+        try:
+            with open(self.ruta_puntero, encoding='utf-8') as f:
+                puntero = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Puntero de snapshot inválido en {self.ruta_puntero}: {e}")
+            return None
+        if not isinstance(puntero, dict) or 'version' not in puntero or 'registro_seq' not in puntero:
+            print(f"⚠️ Puntero de snapshot incompleto en {self.ruta_puntero}: {puntero!r}")
+            return None
+        return puntero
+
+    def solicitar_compactacion(self):
+        """Pedirle al líder que compacte el log (solo él escribe snapshots)"""
+        with open(self.ruta_solicitud, 'w', encoding='utf-8') as f:
+            f.write(str(os.getpid()))
+
+    def tomar_solicitud(self) -> bool:
+        """Líder: consumir una solicitud de compactación pendiente"""
+        try:
+            os.remove(self.ruta_solicitud)
+            return True
+        except FileNotFoundError:
+            return False
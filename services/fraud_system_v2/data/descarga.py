@@ -0,0 +1,76 @@
+"""Descarga por rangos en paralelo: el parseo empieza mientras siguen llegando las partes"""
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+TAMANO_PARTE = int(os.getenv('DOWNLOAD_PART_SIZE', str(8 * 1024 * 1024)))
+# GETs por rango simultáneos; 1 desactiva la descarga en paralelo
+CONCURRENCIA = int(os.getenv('DOWNLOAD_CONCURRENCY', '8'))
+
+
+class LectorRangos:
+    def __init__(self, leer_rango, tamano: int, tamano_parte: int = TAMANO_PARTE, concurrencia: int = CONCURRENCIA):
+        """
+        Stream binario (read/close) sobre leer_rango(inicio, fin). Mantiene hasta
+        `concurrencia` partes en vuelo en un pool acotado y las entrega en orden,
+        así la memoria queda acotada a concurrencia * tamano_parte. El cargador
+        alinea las partes a fin de línea igual que con un stream secuencial.
+        """
+        self._leer_rango = leer_rango
+        self.tamano = tamano
+        self.tamano_parte = tamano_parte
+        self.concurrencia = max(1, concurrencia)
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrencia, thread_name_prefix='descarga')
+        self._en_vuelo = deque()
+        self._proximo = 0
+        self._parte = b''
+        self._posicion = 0
+        self._cerrado = False
+        self._programar()
+
+    def _programar(self):
+        while len(self._en_vuelo) < self.concurrencia and self._proximo < self.tamano:
+            inicio = self._proximo
+            fin = min(inicio + self.tamano_parte, self.tamano)
+            self._en_vuelo.append((inicio, fin, self._pool.submit(self._leer_rango, inicio, fin)))
+            self._proximo = fin
+
+    def _siguiente_parte(self) -> bool:
+        if not self._en_vuelo:
+            return False
+        inicio, fin, futuro = self._en_vuelo.popleft()
+        parte = futuro.result()
+        if len(parte) != fin - inicio:
+            raise IOError(f"Rango {inicio}-{fin} incompleto: {len(parte):,} de {fin - inicio:,} bytes")
+        self._parte = parte
+        self._posicion = 0
+        self._programar()
+        return True
+
+    def read(self, n: int = -1) -> bytes:
+        """Hasta n bytes (como un stream raw, puede devolver menos); b'' al final"""
+        if self._cerrado:
+            raise ValueError("Lectura sobre un LectorRangos cerrado")
+        if n is None or n < 0:
+            partes = [self._parte[self._posicion:]]
+            while self._siguiente_parte():
+                partes.append(self._parte)
+            self._parte, self._posicion = b'', 0
+            return b''.join(partes)
+
+        if self._posicion >= len(self._parte) and not self._siguiente_parte():
+            return b''
+        if self._posicion == 0 and n >= len(self._parte):
+            # Caso común (n >= tamano_parte): la parte completa, sin copiarla
+            datos = self._parte
+        else:
+            datos = self._parte[self._posicion:self._posicion + n]
+        self._posicion += len(datos)
+        return datos
+
+    def close(self):
+        self._cerrado = True
+        for _, _, futuro in self._en_vuelo:
+            futuro.cancel()
+        self._en_vuelo.clear()
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,33 @@
+"""Normalización de NUMERO_DOCUMENTO a int64"""
+import numpy as np
+
+# Documentos vacíos, no numéricos o fuera de rango
+DOCUMENTO_INVALIDO = -1
+_MAXIMO = np.iinfo(np.int64).max
+_MINIMO = np.iinfo(np.int64).min
+
+
+def normalizar_documento(valor) -> int:
+    """123, '123', ' 00123 ', '123.0' y 123.0 -> 123; otro valor -> DOCUMENTO_INVALIDO"""
+    if isinstance(valor, (int, np.integer)) and not isinstance(valor, bool):
+        numero = int(valor)
+    else:
+        texto = str(valor).strip().strip('"')
+        try:
+            numero = int(texto)
+        except ValueError:
+            try:
+                decimal = float(texto)
+            except ValueError:
+                return DOCUMENTO_INVALIDO
+            if not decimal.is_integer():
+                return DOCUMENTO_INVALIDO
+            numero = int(decimal)
+    return numero if _MINIMO <= numero <= _MAXIMO else DOCUMENTO_INVALIDO
+
+
+def normalizar_documentos(valores) -> np.ndarray:
+    """Versión para lotes; los arrays enteros se devuelven sin copiar"""
+    if isinstance(valores, np.ndarray) and valores.dtype.kind in 'iu':
+        return valores.astype(np.int64, copy=False)
+    return np.fromiter((normalizar_documento(valor) for valor in valores), dtype=np.int64, count=len(valores))
@@ -0,0 +1,302 @@
+"""Estadísticas de BaseFinal.csv en una sola pasada, combinables entre bloques paralelos"""
+import itertools
+import math
+import multiprocessing
+import time
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+from data.cargador_csv import CODIGO_FRAUDE, TAMANO_CHUNK, leer_bloques
+from data.documentos import DOCUMENTO_INVALIDO, normalizar_documento
+from data.formato import FormatoCSV, detectar_formato
+from data.snapshot import directorio_por_defecto
+
+# Error relativo máximo de la mediana y los cuantiles (0.5%)
+PRECISION_SKETCH = 0.005
+CUANTILES = (0.25, 0.5, 0.75, 0.9, 0.99)
+# Por debajo de este valor absoluto un importe cuenta como cero en el sketch
+MINIMO_INDEXABLE = 1e-9
+
+# Configuración de cada worker (heredada con fork o pasada al initializer)
+_posiciones = None
+_formato = None
+_precision = PRECISION_SKETCH
+
+
+class SketchCuantiles:
+    def __init__(self, precision: float = PRECISION_SKETCH):
+        """
+        Buckets logarítmicos (estilo DDSketch): cualquier cuantil con error relativo
+        <= precision en memoria O(log(max/min)). Dos sketches se combinan sumando buckets.
+        """
+        self.precision = precision
+        self.gamma = (1 + precision) / (1 - precision)
+        self._log_gamma = math.log(self.gamma)
+        self.positivos = Counter()
+        self.negativos = Counter()
+        self.ceros = 0
+        self.cantidad = 0
+
+    def _indexar(self, buckets: Counter, valores: np.ndarray):
+        if valores.size:
+            indices, conteos = np.unique(np.ceil(np.log(valores) / self._log_gamma).astype(np.int64), return_counts=True)
+            buckets.update(dict(zip(indices.tolist(), conteos.tolist())))
+
+    def agregar_lote(self, valores: np.ndarray):
+        # inf rompe el índice del bucket y NaN no cae en ninguno: no cuentan
+        valores = valores[np.isfinite(valores)]
+        self._indexar(self.positivos, valores[valores > MINIMO_INDEXABLE])
+        self._indexar(self.negativos, -valores[valores < -MINIMO_INDEXABLE])
+        self.ceros += int(np.count_nonzero(np.abs(valores) <= MINIMO_INDEXABLE))
+        self.cantidad += valores.size
+
+    def combinar(self, otro: 'SketchCuantiles'):
+        if otro.gamma != self.gamma:
+            raise ValueError("No se pueden combinar sketches con distinta precisión")
+        self.positivos.update(otro.positivos)
+        self.negativos.update(otro.negativos)
+        self.ceros += otro.ceros
+        self.cantidad += otro.cantidad
+
+    def _valor(self, indice: int) -> float:
+        return 2 * self.gamma ** indice / (self.gamma + 1)
+
+    def _recorrer(self):
+        """(valor representativo, conteo) de menor a mayor"""
+        for indice in sorted(self.negativos, reverse=True):
+            yield -self._valor(indice), self.negativos[indice]
+        if self.ceros:
+            yield 0.0, self.ceros
+        for indice in sorted(self.positivos):
+            yield self._valor(indice), self.positivos[indice]
+
+    def cuantil(self, q: float) -> float:
+        if not self.cantidad:
+            return math.nan
+        rango = q * (self.cantidad - 1)
+        acumulado = 0
+        for valor, conteo in self._recorrer():
+            acumulado += conteo
+            if acumulado > rango:
+                return valor
+        return valor
+
+    def contar_en_rango(self, desde: float, hasta: float) -> int:
+        """Cantidad aproximada de valores en [desde, hasta] (resolución de un bucket)"""
+        return sum(conteo for valor, conteo in self._recorrer() if desde <= valor <= hasta)
+
+
+class ResumenNumerico:
+    def __init__(self, precision: float = PRECISION_SKETCH):
+        """Cantidad, promedio, varianza (Welford/Chan), mínimo, máximo y sketch de cuantiles"""
+        self.cantidad = 0
+        self.promedio = 0.0
+        self._m2 = 0.0
+        self.minimo = math.inf
+        self.maximo = -math.inf
+        self.sketch = SketchCuantiles(precision)
+
+    def _combinar_momentos(self, cantidad: int, promedio: float, m2: float, minimo: float, maximo: float):
+        if not cantidad:
+            return
+        total = self.cantidad + cantidad
+        delta = promedio - self.promedio
+        self.promedio += delta * cantidad / total
+        self._m2 += m2 + delta * delta * self.cantidad * cantidad / total
+        self.cantidad = total
+        self.minimo = min(self.minimo, minimo)
+        self.maximo = max(self.maximo, maximo)
+
+    def agregar_lote(self, valores):
+        valores = np.asarray(valores, dtype=np.float64)
+        valores = valores[np.isfinite(valores)]
+        if not valores.size:
+            return
+        promedio = float(valores.mean())
+        self._combinar_momentos(
+            valores.size, promedio, float(np.square(valores - promedio).sum()),
+            float(valores.min()), float(valores.max())
+        )
+        self.sketch.agregar_lote(valores)
+
+    def combinar(self, otro: 'ResumenNumerico'):
+        self._combinar_momentos(otro.cantidad, otro.promedio, otro._m2, otro.minimo, otro.maximo)
+        self.sketch.combinar(otro.sketch)
+
+    @property
+    def desviacion(self) -> float:
+        """Desviación estándar muestral (ddof=1, igual que pandas)"""
+        return math.sqrt(self._m2 / (self.cantidad - 1)) if self.cantidad > 1 else math.nan
+
+    def cuantil(self, q: float) -> float:
+        # El sketch devuelve el centro del bucket; los extremos son exactos
+        return min(max(self.sketch.cuantil(q), self.minimo), self.maximo) if self.cantidad else math.nan
+
+    @property
+    def mediana(self) -> float:
+        return self.cuantil(0.5)
+
+    def resumen(self, cuantiles: tuple = CUANTILES) -> dict:
+        if not self.cantidad:
+            return {'cantidad': 0}
+        return {
+            'cantidad': self.cantidad,
+            'promedio': self.promedio,
+            'desviacion': self.desviacion,
+            'minimo': self.minimo,
+            'maximo': self.maximo,
+            'cuantiles': {f"p{q * 100:g}": self.cuantil(q) for q in cuantiles}
+        }
+
+
+class EstadisticasCSV:
+    def __init__(self, precision: float = PRECISION_SKETCH):
+        """
+        Todo lo que reportan los scripts de análisis: conteos por
+        CODIGO_RAZON_CONTRACARGO, importes generales y de fraude, y conteo de
+        filas con fraude por cliente (sus claves son los clientes en blacklist).
+        """
+        self.filas = 0
+        self.filas_invalidas = 0
+        self.importes_invalidos = 0
+        self.codigos = Counter()
+        self.importes = ResumenNumerico(precision)
+        self.importes_fraude = ResumenNumerico(precision)
+        self.fraude_por_cliente = Counter()
+        self.columnas = []
+        self.segundos = 0.0
+
+    def procesar_lineas(self, lineas, formato: FormatoCSV, posiciones: tuple = None):
+        """Acumular filas de datos (sin encabezado); posiciones de formato.posiciones()"""
+        pos_documento, pos_importe, pos_codigo, max_split = posiciones or formato.posiciones()
+        separador, quitar = formato.separador, formato.quitar
+        codigos = []
+        importes = array('d')
+        importes_fraude = array('d')
+        fraude_por_cliente = self.fraude_por_cliente
+        for linea in lineas:
+            campos = linea.split(separador, max_split)
+            if len(campos) < max_split:
+                self.filas_invalidas += bool(linea.strip())
+                continue
+            codigo = campos[pos_codigo].strip(quitar)
+            codigos.append(codigo)
+            try:
+                importe = float(campos[pos_importe].strip(quitar).replace(',', ''))
+            except ValueError:
+                importe = math.nan
+            if math.isfinite(importe):
+                importes.append(importe)
+            else:
+                # 'nan' e 'inf' se parsean pero no son importes
+                importe = None
+                self.importes_invalidos += 1
+
+            if codigo == CODIGO_FRAUDE:
+                if importe is not None:
+                    importes_fraude.append(importe)
+                documento = normalizar_documento(campos[pos_documento].strip(quitar))
+                if documento != DOCUMENTO_INVALIDO:
+                    fraude_por_cliente[documento] += 1
+
+        self.filas += len(codigos)
+        self.codigos.update(codigos)
+        self.importes.agregar_lote(np.frombuffer(importes) if importes else np.empty(0))
+        self.importes_fraude.agregar_lote(np.frombuffer(importes_fraude) if importes_fraude else np.empty(0))
+
+    def combinar(self, otro: 'EstadisticasCSV'):
+        self.filas += otro.filas
+        self.filas_invalidas += otro.filas_invalidas
+        self.importes_invalidos += otro.importes_invalidos
+        self.codigos.update(otro.codigos)
+        self.importes.combinar(otro.importes)
+        self.importes_fraude.combinar(otro.importes_fraude)
+        self.fraude_por_cliente.update(otro.fraude_por_cliente)
+
+    @property
+    def filas_fraude(self) -> int:
+        return self.codigos.get(CODIGO_FRAUDE, 0)
+
+    @property
+    def clientes_blacklist(self) -> int:
+        return len(self.fraude_por_cliente)
+
+    def resumen(self, top_codigos: int = 10) -> dict:
+        return {
+            'filas': self.filas,
+            'filas_invalidas': self.filas_invalidas,
+            'importes_invalidos': self.importes_invalidos,
+            'columnas': self.columnas,
+            'codigos_unicos': len(self.codigos),
+            'top_codigos': dict(self.codigos.most_common(top_codigos)),
+            'filas_fraude': self.filas_fraude,
+            'clientes_blacklist': self.clientes_blacklist,
+            'importes': self.importes.resumen(),
+            'importes_fraude': self.importes_fraude.resumen(),
+            'segundos': round(self.segundos, 3)
+        }
+
+
+def _iniciar_worker(formato, posiciones, precision):
+    global _formato, _posiciones, _precision
+    _formato, _posiciones, _precision = formato, posiciones, precision
+
+
+def procesar_bloque(bloque: bytes) -> EstadisticasCSV:
+    """Estadísticas parciales de un bloque de líneas completas"""
+    parcial = EstadisticasCSV(_precision)
+    parcial.procesar_lineas(bloque.decode('utf-8', errors='replace').split('\n'), _formato, _posiciones)
+    return parcial
+
+
+def calcular_estadisticas(fuente, workers: int = 1, tamano_bloque: int = TAMANO_CHUNK,
+                          formato: FormatoCSV = None, precision: float = PRECISION_SKETCH) -> EstadisticasCSV:
+    """
+    Una pasada en streaming sobre la fuente. Con workers > 1 los bloques se
+    procesan en un pool de procesos y los parciales se combinan al llegar.
+    Sin formato se detecta con una lectura por rango (cacheado por versión).
+    """
+    inicio = time.perf_counter()
+    formato = formato or detectar_formato(fuente, directorio=directorio_por_defecto())
+    estadisticas = EstadisticasCSV(precision)
+    body = fuente.abrir()
+    try:
+        bloques = leer_bloques(body, tamano_bloque)
+        primero = next(bloques, b'').lstrip()
+        if not primero:
+            raise ValueError("Archivo vacío")
+        encabezado, _, primero = primero.partition(b'\n')
+        # Columnas del encabezado leído: el formato cacheado solo aporta separador y comillas
+        formato = FormatoCSV(formato.separador, formato.comillas, [
+            campo.strip(formato.quitar) for campo in encabezado.decode('utf-8').split(formato.separador)
+        ], formato.version)
+        estadisticas.columnas = formato.columnas
+        argumentos = (formato, formato.posiciones(), precision)
+        bloques = itertools.chain([primero], bloques)
+
+        if workers <= 1:
+            _iniciar_worker(*argumentos)
+            for bloque in bloques:
+                estadisticas.combinar(procesar_bloque(bloque))
+        else:
+            metodo = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(metodo),
+                                     initializer=_iniciar_worker, initargs=argumentos) as pool:
+                # Ventana acotada de bloques en vuelo, como en el backtest
+                en_vuelo = set()
+                for bloque in bloques:
+                    if len(en_vuelo) >= workers * 2:
+                        listos, en_vuelo = wait(en_vuelo, return_when=FIRST_COMPLETED)
+                        for futuro in listos:
+                            estadisticas.combinar(futuro.result())
+                    en_vuelo.add(pool.submit(procesar_bloque, bloque))
+                for futuro in en_vuelo:
+                    estadisticas.combinar(futuro.result())
+    finally:
+        body.close()
+
+    estadisticas.segundos = time.perf_counter() - inicio
+    return estadisticas
@@ -0,0 +1,152 @@
+"""Formato del CSV (separador, comillas y columnas) detectado con lecturas por rango"""
+import hashlib
+import json
+import os
+import threading
+
+SEPARADORES = (';', ',', '\t', '|')
+# Columnas que usan el cargador, el backtest y las estadísticas
+COLUMNAS_TRANSACCION = ('NUMERO_DOCUMENTO', 'importe', 'CODIGO_RAZON_CONTRACARGO')
+# Comienzo del archivo que se lee para detectar el formato; se duplica si el encabezado no entra
+BYTES_MUESTRA = 16 * 1024
+BYTES_MUESTRA_MAXIMO = 1024 * 1024
+LINEAS_MUESTRA = 20
+# Comillas: toda la fila entre comillas (BaseFinal.csv), cada campo, o ninguna
+COMILLAS_LINEA = 'linea'
+COMILLAS_CAMPO = 'campo'
+SIN_COMILLAS = None
+
+_cache = {}
+_lock = threading.Lock()
+
+
+class FormatoCSV:
+    def __init__(self, separador: str, comillas: str, columnas: list, version: str = None):
+        self.separador = separador
+        self.comillas = comillas
+        self.columnas = list(columnas)
+        self.version = version
+
+    @property
+    def quitar(self) -> str:
+        """Caracteres que se recortan de cada campo"""
+        return '"\r\n ' if self.comillas else '\r\n '
+
+    def posiciones(self, columnas: tuple = COLUMNAS_TRANSACCION) -> tuple:
+        """Índices de `columnas` más el max_split para str.split(separador, max_split)"""
+        faltantes = [c for c in columnas if c not in self.columnas]
+        if faltantes:
+            raise ValueError(f"Columnas faltantes en el encabezado: {faltantes}")
+        posiciones = tuple(self.columnas.index(c) for c in columnas)
+        return posiciones + (max(posiciones) + 1,)
+
+    def a_dict(self) -> dict:
+        return {
+            'separador': self.separador,
+            'comillas': self.comillas,
+            'columnas': self.columnas,
+            'version': self.version
+        }
+
+    @classmethod
+    def desde_dict(cls, datos: dict) -> 'FormatoCSV':
+        return cls(datos['separador'], datos['comillas'], datos['columnas'], datos.get('version'))
+
+    def __repr__(self):
+        return f"FormatoCSV(separador={self.separador!r}, comillas={self.comillas!r}, columnas={len(self.columnas)})"
+
+
+def _comillas(linea: str):
+    linea = linea.strip()
+    if not linea.count('"'):
+        return SIN_COMILLAS
+    if linea.count('"') == 2 and linea.startswith('"') and linea.endswith('"'):
+        return COMILLAS_LINEA
+    return COMILLAS_CAMPO
+
+
+def inferir_formato(muestra: str, requeridas: tuple = COLUMNAS_TRANSACCION) -> FormatoCSV:
+    """
+    Elegir el separador cuyo encabezado contiene las columnas requeridas y que
+    parte las primeras filas en la misma cantidad de campos que el encabezado.
+    """
+    lineas = [linea for linea in muestra.split('\n')[:LINEAS_MUESTRA] if linea.strip()]
+    if not lineas:
+        raise ValueError("Muestra vacía, no se puede detectar el formato")
+    encabezado, filas = lineas[0], lineas[1:]
+
+    candidatos = []
+    for separador in SEPARADORES:
+        columnas = [campo.strip('"\r\n ') for campo in encabezado.split(separador)]
+        if len(columnas) < 2 or any(c not in columnas for c in requeridas):
+            continue
+        consistentes = sum(len(fila.split(separador)) == len(columnas) for fila in filas)
+        candidatos.append((consistentes, len(columnas), separador, columnas))
+    if not candidatos:
+        raise ValueError(f"Ningún separador de {SEPARADORES} da las columnas {list(requeridas)}")
+
+    _, _, separador, columnas = max(candidatos)
+    return FormatoCSV(separador, _comillas(encabezado), columnas)
+
+
+def _ruta_cache(directorio: str, fuente, version: str) -> str:
+    clave = hashlib.sha1(f"{fuente.descripcion()}|{version}".encode('utf-8')).hexdigest()[:20]
+    return os.path.join(directorio, f"formato-{clave}.json")
+
+
+def detectar_formato(fuente, version: str = None, directorio: str = None) -> FormatoCSV:
+    """
+    Formato de la fuente a partir de sus primeros KB (lectura por rango, sin
+    descargar el objeto). Se cachea por versión (ETag) en memoria y, con
+    directorio, en un JSON al lado de los snapshots.
+    """
+    if version is None:
+        try:
+            version = fuente.version()
+        except Exception as e:
+            print(f"⚠️ No se pudo obtener la versión de la fuente, no se cachea el formato: {e}")
+
+    clave = (fuente.descripcion(), version)
+    if version is not None:
+        with _lock:
+            formato = _cache.get(clave)
+        if formato is not None:
+            return formato
+        ruta = _ruta_cache(directorio, fuente, version) if directorio else None
+        if ruta and os.path.exists(ruta):
+            try:
+                with open(ruta, encoding='utf-8') as f:
+                    formato = FormatoCSV.desde_dict(json.load(f))
+                if formato.version == version:
+                    with _lock:
+                        _cache[clave] = formato
+                    return formato
+            except (OSError, ValueError, KeyError) as e:
+                print(f"⚠️ Formato cacheado inválido en {ruta}: {e}")
+
+    tamano = BYTES_MUESTRA
+    while True:
+        muestra = fuente.leer_rango(0, tamano)
+        # Sin el encabezado completo no se puede decidir; salvo que el archivo sea así de corto
+        if b'\n' in muestra.lstrip() or len(muestra) < tamano or tamano >= BYTES_MUESTRA_MAXIMO:
+            break
+        tamano *= 2
+    if len(muestra) == tamano:
+        # Descartar la última línea, probablemente cortada por el rango
+        muestra = muestra[:muestra.rfind(b'\n') + 1] or muestra
+    formato = inferir_formato(muestra.decode('utf-8', errors='replace').lstrip())
+    formato.version = version
+
+    if version is not None:
+        with _lock:
+            _cache[clave] = formato
+        if directorio:
+            try:
+                os.makedirs(directorio, exist_ok=True)
+                temporal = f"{ruta}.tmp-{os.getpid()}"
+                with open(temporal, 'w', encoding='utf-8') as f:
+                    json.dump(formato.a_dict(), f)
+                os.replace(temporal, ruta)
+            except OSError as e:
+                print(f"⚠️ No se pudo guardar el formato en {ruta}: {e}")
+    return formato
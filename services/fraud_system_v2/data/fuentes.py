@@ -0,0 +1,119 @@
+"""Fuentes del dataset de referencia: objeto S3 o archivo local"""
+import hashlib
+import os
+from urllib.parse import unquote, urlparse
+
+from data.descarga import CONCURRENCIA, TAMANO_PARTE, LectorRangos
+
+
+class FuenteS3:
+    def __init__(self, bucket: str, key: str, s3_client=None,
+                 concurrencia: int = CONCURRENCIA, tamano_parte: int = TAMANO_PARTE):
+        """Objeto de S3; la versión es su ETag. Los objetos grandes se bajan por rangos en paralelo"""
+        if s3_client is None:
+            import boto3
+            s3_client = boto3.client('s3')
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.concurrencia = concurrencia
+        self.tamano_parte = tamano_parte
+
+    def descripcion(self) -> str:
+        return f"s3://{self.bucket}/{self.key}"
+
+    def version(self) -> str:
+        """ETag del objeto (sin descargarlo)"""
+        response = self.s3_client.head_object(Bucket=self.bucket, Key=self.key)
+        return response['ETag'].strip('"')
+
+    def tamano(self) -> int:
+        """Tamaño en bytes (para reportar el progreso de la carga)"""
+        response = self.s3_client.head_object(Bucket=self.bucket, Key=self.key)
+        return response['ContentLength']
+
+    def abrir(self):
+        """Stream binario del objeto completo"""
+        if self.concurrencia > 1:
+            response = self.s3_client.head_object(Bucket=self.bucket, Key=self.key)
+            tamano = response['ContentLength']
+            # Con menos de dos partes alcanza con un solo GET
+            if tamano >= 2 * self.tamano_parte:
+                # IfMatch: si el objeto se reemplaza a mitad de la descarga, falla en vez de mezclar versiones
+                etag = response['ETag']
+                return LectorRangos(
+                    lambda inicio, fin: self.leer_rango(inicio, fin, etag),
+                    tamano, self.tamano_parte, self.concurrencia
+                )
+        response = self.s3_client.get_object(Bucket=self.bucket, Key=self.key)
+        return response['Body']
+
+    def leer_rango(self, inicio: int, fin: int, etag: str = None) -> bytes:
+        """Bytes [inicio, fin) con un GET por rango (menos si el objeto es más corto)"""
+        parametros = {'Bucket': self.bucket, 'Key': self.key, 'Range': f"bytes={inicio}-{fin - 1}"}
+        if etag:
+            parametros['IfMatch'] = etag
+        response = self.s3_client.get_object(**parametros)
+        return response['Body'].read()
+
+
+class FuenteLocal:
+    def __init__(self, ruta: str, concurrencia: int = 1, tamano_parte: int = TAMANO_PARTE):
+        """
+        Archivo local; la versión se deriva de ruta, tamaño y mtime. Por defecto
+        se lee secuencialmente; con concurrencia > 1 usa el mismo lector por
+        rangos que S3 (útil en discos de red o para probarlo sin S3).
+        """
+        self.ruta = os.path.abspath(ruta)
+        self.concurrencia = concurrencia
+        self.tamano_parte = tamano_parte
+
+    def descripcion(self) -> str:
+        return f"file://{self.ruta}"
+
+    def version(self) -> str:
+        """Equivalente local del ETag: cambia si el archivo se reescribe"""
+        stat = os.stat(self.ruta)
+        huella = f"{self.ruta}|{stat.st_size}|{stat.st_mtime_ns}"
+        return hashlib.sha1(huella.encode('utf-8')).hexdigest()
+
+    def tamano(self) -> int:
+        return os.path.getsize(self.ruta)
+
+    def abrir(self):
+        if self.concurrencia > 1:
+            tamano = self.tamano()
+            if tamano >= 2 * self.tamano_parte:
+                return LectorRangos(self.leer_rango, tamano, self.tamano_parte, self.concurrencia)
+        return open(self.ruta, 'rb')
+
+    def leer_rango(self, inicio: int, fin: int) -> bytes:
+        with open(self.ruta, 'rb') as f:
+            f.seek(inicio)
+            return f.read(fin - inicio)
+
+
+def fuente_desde_uri(uri: str, s3_client=None):
+    """s3://bucket/key o file:///ruta (una ruta sin esquema se toma como archivo local)"""
+    partes = urlparse(uri)
+    if partes.scheme == 's3':
+        key = unquote(partes.path.lstrip('/'))
+        if not partes.netloc or not key:
+            raise ValueError(f"URI de S3 inválida (se espera s3://bucket/key): {uri}")
+        return FuenteS3(partes.netloc, key, s3_client)
+    if partes.scheme == 'file':
+        return FuenteLocal(unquote(partes.netloc + partes.path))
+    if not partes.scheme:
+        return FuenteLocal(uri)
+    raise ValueError(f"Esquema no soportado en {uri} (usar s3:// o file://)")
+
+
+def crear_fuente(bucket: str, key: str, ruta_local: str = None):
+    """DATA_SOURCE_URI si está definida; si no el archivo local configurado o el objeto de S3"""
+    uri = os.getenv('DATA_SOURCE_URI', '')
+    if uri and ruta_local is None:
+        return fuente_desde_uri(uri)
+    ruta_local = ruta_local if ruta_local is not None else os.getenv('LOCAL_DATA_FILE', '')
+    if ruta_local:
+        return FuenteLocal(ruta_local)
+    return FuenteS3(bucket, key)
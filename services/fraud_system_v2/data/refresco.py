@@ -0,0 +1,59 @@
+"""Recarga en segundo plano de los datos de referencia cuando cambia la fuente"""
+import threading
+import time
+import traceback
+
+
+class RefrescadorDatos:
+    def __init__(self, fuente, construir, publicar, version_actual=None, intervalo: float = 300):
+        """
+        Consulta periódicamente la versión de la fuente (ETag o mtime).
+        Si cambió, llama a construir() fuera del camino de las requests y
+        entrega el resultado completo a publicar(), que solo reemplaza una referencia.
+        """
+        self.fuente = fuente
+        self.construir = construir
+        self.publicar = publicar
+        self.version_actual = version_actual
+        self.intervalo = intervalo
+        self.ultima_revision = None
+        self.ultimo_error = None
+        self.recargas = 0
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        if self.intervalo <= 0 or self._hilo is not None:
+            return
+        self._hilo = threading.Thread(target=self._bucle, name='refrescador-datos', daemon=True)
+        self._hilo.start()
+        print(f"🔄 Refresco de datos cada {self.intervalo:g}s desde {self.fuente.descripcion()}")
+
+    def detener(self):
+        self._detener.set()
+
+    def revisar(self) -> bool:
+        """Una consulta de versión; devuelve True si se publicaron datos nuevos"""
+        with self._lock:
+            self.ultima_revision = time.time()
+            version = self.fuente.version()
+            if version == self.version_actual:
+                return False
+            print(f"🔄 Nueva versión de datos detectada: {self.version_actual} -> {version}")
+            nuevo = self.construir()
+            self.publicar(nuevo)
+            self.version_actual = getattr(nuevo, 'version_datos', version)
+            self.recargas += 1
+            self.ultimo_error = None
+            print(f"✅ Datos recargados (versión {self.version_actual})")
+            return True
+
+    def _bucle(self):
+        while not self._detener.wait(self.intervalo):
+            try:
+                self.revisar()
+            except Exception as e:
+                self.ultimo_error = f"{type(e).__name__}: {e}"
+                print(f"⚠️ Error refrescando datos, se mantiene la versión actual: {e}")
+                traceback.print_exc()
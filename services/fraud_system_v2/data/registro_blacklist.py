@@ -0,0 +1,188 @@
+"""Log local append-only de cambios incrementales a la blacklist"""
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+OP_AGREGAR = 'agregar'
+OP_ELIMINAR = 'eliminar'
+
+
+class RegistroBlacklist:
+    def __init__(self, ruta: str, fsync: bool = True):
+        """
+        Una entrada JSON por línea: {"seq", "op", "documento", "importe", "ts"}.
+        seq es creciente y permite reaplicar el log sobre un snapshot compactado
+        sin duplicar las entradas que ya contiene. Las escrituras toman un flock,
+        así varios workers pueden compartir el mismo log.
+        Al truncar, las entradas compactadas pasan a <ruta>.compactado (independiente
+        de la versión de datos): un snapshot de otra versión no las contiene y las
+        reaplica con leer(..., compactadas=True).
+        """
+        self.ruta = ruta
+        base, extension = os.path.splitext(ruta)
+        self.ruta_compactado = f"{base}.compactado{extension or '.jsonl'}"
+        self.fsync = fsync
+        self._lock = threading.RLock()
+        self._archivo_lock = None
+        self._profundidad = 0
+        self.ultimo_seq = 0
+        self.pendientes = 0
+        directorio = os.path.dirname(self.ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        for entrada in self._leer_archivo(self.ruta_compactado):
+            self.ultimo_seq = max(self.ultimo_seq, entrada['seq'])
+        for entrada in self.leer():
+            self.ultimo_seq = max(self.ultimo_seq, entrada['seq'])
+            self.pendientes += 1
+
+    @contextmanager
+    def bloqueo(self):
+        """Exclusión entre hilos y entre procesos (flock sobre <ruta>.lock); reentrante"""
+        with self._lock:
+            if self._profundidad == 0:
+                self._archivo_lock = open(f"{self.ruta}.lock", 'a')
+                fcntl.flock(self._archivo_lock.fileno(), fcntl.LOCK_EX)
+            self._profundidad += 1
+            try:
+                yield
+            finally:
+                self._profundidad -= 1
+                if self._profundidad == 0:
+                    fcntl.flock(self._archivo_lock.fileno(), fcntl.LOCK_UN)
+                    self._archivo_lock.close()
+                    self._archivo_lock = None
+
+    def _ultimo_seq_archivo(self) -> int:
+        """seq de la última línea completa (otro proceso pudo anexar después que este)"""
+        try:
+            with open(self.ruta, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                f.seek(max(0, f.tell() - 64 * 1024))
+                lineas = f.read().split(b'\n')
+        except FileNotFoundError:
+            return 0
+        for linea in reversed(lineas):
+            try:
+                return json.loads(linea)['seq']
+            except (ValueError, KeyError):
+                continue
+        return 0
+
+    def posicion_actual(self):
+        """(inodo, tamaño) del log, comparable con la posición de leer_desde()"""
+        try:
+            stat = os.stat(self.ruta)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size
+
+    def leer_desde(self, posicion: tuple = None) -> tuple:
+        """
+        Entradas completas escritas desde `posicion` (devuelta por una llamada
+        anterior) y la posición nueva. Si el log se reescribió (otro inodo) se
+        lee desde el principio; el seq descarta las entradas ya aplicadas.
+        """
+        try:
+            f = open(self.ruta, 'rb')
+        except FileNotFoundError:
+            return [], None
+        with f:
+            inodo = os.fstat(f.fileno()).st_ino
+            desde = posicion[1] if posicion and posicion[0] == inodo else 0
+            f.seek(desde)
+            datos = f.read()
+        fin = datos.rfind(b'\n') + 1
+        entradas = []
+        for linea in datos[:fin].splitlines():
+            try:
+                entradas.append(json.loads(linea))
+            except ValueError:
+                print(f"⚠️ Línea inválida en {self.ruta}, ignorada")
+        return entradas, (inodo, desde + fin)
+
+    def _siguiente_seq(self) -> int:
+        self.ultimo_seq = max(self.ultimo_seq + 1, time.time_ns())
+        return self.ultimo_seq
+
+    def anexar(self, entradas: list) -> list:
+        """Agregar entradas al final del log (una escritura y un fsync por lote)"""
+        if not entradas:
+            return []
+        with self.bloqueo():
+            # seq asignado bajo el flock: el orden en el archivo es el orden de seq entre procesos
+            self.ultimo_seq = max(self.ultimo_seq, self._ultimo_seq_archivo())
+            for entrada in entradas:
+                entrada['seq'] = self._siguiente_seq()
+                entrada.setdefault('ts', time.time())
+            lineas = ''.join(json.dumps(entrada, separators=(',', ':')) + '\n' for entrada in entradas)
+            with open(self.ruta, 'a', encoding='utf-8') as f:
+                f.write(lineas)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            self.pendientes += len(entradas)
+        return entradas
+
+    def _leer_archivo(self, ruta: str, desde_seq: int = 0):
+        if not os.path.exists(ruta):
+            return
+        with open(ruta, encoding='utf-8') as f:
+            for linea in f:
+                try:
+                    entrada = json.loads(linea)
+                except ValueError:
+                    print(f"⚠️ Línea inválida en {ruta}, ignorada")
+                    continue
+                if entrada.get('seq', 0) > desde_seq:
+                    yield entrada
+
+    def leer(self, desde_seq: int = 0, compactadas: bool = False):
+        """
+        Entradas con seq > desde_seq, en orden; ignora una última línea truncada.
+        Con compactadas=True primero las ya compactadas (todas tienen seq menor que el log).
+        """
+        if compactadas:
+            for entrada in self._leer_archivo(self.ruta_compactado, desde_seq):
+                # Si truncar() se cortó, el log todavía tiene estas entradas
+                desde_seq = max(desde_seq, entrada['seq'])
+                yield entrada
+        yield from self._leer_archivo(self.ruta, desde_seq)
+
+    def _reescribir(self, ruta: str, entradas: list):
+        temporal = f"{ruta}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            for entrada in entradas:
+                f.write(json.dumps(entrada, separators=(',', ':')) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, ruta)
+
+    def truncar(self, hasta_seq: int):
+        """
+        Mover las entradas ya compactadas (seq <= hasta_seq) a <ruta>.compactado y
+        reescribir el log con el resto. Si se corta en el medio, las entradas
+        quedan en ambos archivos y el seq evita aplicarlas dos veces.
+        """
+        with self.bloqueo():
+            compactadas = list(self._leer_archivo(self.ruta_compactado))
+            restantes = []
+            for entrada in self._leer_archivo(self.ruta):
+                (compactadas if entrada['seq'] <= hasta_seq else restantes).append(entrada)
+            self._reescribir(self.ruta_compactado, reducir_compactadas(compactadas))
+            self._reescribir(self.ruta, restantes)
+            self.pendientes = len(restantes)
+
+
+def reducir_compactadas(entradas: list) -> list:
+    """
+    Mismo efecto al reaplicarlas, con menos entradas: se conservan las que traen
+    importe (cuentan para el promedio de fraude) y, por documento, la última (define
+    si está en la blacklist). Las demás quedan superadas por una posterior.
+    """
+    entradas = sorted({entrada['seq']: entrada for entrada in entradas}.values(), key=lambda e: e['seq'])
+    ultima = {entrada['documento']: entrada['seq'] for entrada in entradas}
+    return [e for e in entradas if e.get('importe') is not None or ultima[e['documento']] == e['seq']]
@@ -0,0 +1,106 @@
+"""Snapshot columnar en disco del dataset parseado, indexado por versión de la fuente"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+# Incrementar si cambia el layout de las columnas guardadas
+FORMATO_SNAPSHOT = 4
+ARCHIVO_META = 'meta.json'
+
+
+def directorio_por_defecto() -> str:
+    """SNAPSHOT_DIR o un directorio en /tmp; cadena vacía desactiva el cache"""
+    return os.getenv('SNAPSHOT_DIR', os.path.join(tempfile.gettempdir(), 'fraud_system_v2_snapshots'))
+
+
+class SnapshotStore:
+    def __init__(self, directorio: str):
+        """
+        Un subdirectorio por versión (ETag o hash) con un .npy por columna.
+        Los .npy se abren con mmap, así el arranque no copia ni parsea nada.
+        Cada escritura va a un directorio nuevo y ruta(version) es un symlink que
+        se reemplaza de forma atómica, así nunca se lee un snapshot a medio cambiar.
+        """
+        self.directorio = directorio
+
+    def ruta(self, version: str) -> str:
+        """Symlink al último snapshot publicado de `version`"""
+        nombre = hashlib.sha1(f"{FORMATO_SNAPSHOT}:{version}".encode('utf-8')).hexdigest()[:20]
+        return os.path.join(self.directorio, nombre)
+
+    def cargar(self, version: str):
+        """Devolver (columnas mmap, meta) o None si no hay snapshot válido"""
+        # Resolver el symlink una sola vez: meta y columnas salen de la misma escritura
+        ruta = os.path.realpath(self.ruta(version))
+        ruta_meta = os.path.join(ruta, ARCHIVO_META)
+        if not os.path.exists(ruta_meta):
+            return None
+        try:
+            with open(ruta_meta, encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('version') != version or meta.get('formato') != FORMATO_SNAPSHOT:
+                return None
+            columnas = {
+                nombre: np.load(os.path.join(ruta, f"{nombre}.npy"), mmap_mode='r')
+                for nombre in meta['columnas']
+            }
+            return columnas, meta
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Snapshot inválido en {ruta}: {e}")
+            return None
+
+    def guardar(self, version: str, columnas: dict, meta: dict = None) -> str:
+        """Escribir el snapshot en un directorio nuevo y publicarlo cambiando el symlink"""
+        ruta = self.ruta(version)
+        os.makedirs(self.directorio, exist_ok=True)
+        temporal = tempfile.mkdtemp(prefix='.tmp-', dir=self.directorio)
+        # Nombre único por escritura; la anterior sigue intacta para quien ya la resolvió
+        generacion = f"{ruta}.{os.path.basename(temporal)[len('.tmp-'):]}"
+        enlace = f"{generacion}.enlace"
+        try:
+            for nombre, valores in columnas.items():
+                valores = np.asarray(valores)
+                if valores.dtype == object:  # Strings de pandas -> ancho fijo, mapeable
+                    valores = valores.astype(str)
+                np.save(os.path.join(temporal, f"{nombre}.npy"), valores)
+            meta = dict(meta or {})
+            meta.update({
+                'version': version,
+                'formato': FORMATO_SNAPSHOT,
+                'columnas': list(columnas),
+                'creado_en': time.time()
+            })
+            with open(os.path.join(temporal, ARCHIVO_META), 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            os.rename(temporal, generacion)
+            anterior = os.path.realpath(ruta) if os.path.islink(ruta) else None
+            os.symlink(os.path.basename(generacion), enlace)
+            os.replace(enlace, ruta)
+        except OSError:
+            shutil.rmtree(temporal, ignore_errors=True)
+            shutil.rmtree(generacion, ignore_errors=True)
+            if os.path.islink(enlace):
+                os.remove(enlace)
+            if not os.path.exists(os.path.join(ruta, ARCHIVO_META)):
+                raise
+            return ruta
+        self._limpiar(ruta, conservar={os.path.realpath(generacion), anterior})
+        return ruta
+
+    def _limpiar(self, ruta: str, conservar: set):
+        """
+        Borrar escrituras viejas de la versión. Se conserva la anterior a la publicada
+        por si otro proceso resolvió el symlink justo antes del cambio; los que ya
+        tienen las columnas con mmap no se ven afectados por el borrado.
+        """
+        prefijo = f"{os.path.basename(ruta)}."
+        for nombre in os.listdir(self.directorio):
+            candidato = os.path.join(self.directorio, nombre)
+            if (nombre.startswith(prefijo) and os.path.realpath(candidato) not in conservar
+                    and os.path.isdir(candidato) and not os.path.islink(candidato)):
+                shutil.rmtree(candidato, ignore_errors=True)
@@ -0,0 +1,132 @@
+"""
+Wire encoding between the gateway and the scoring services: JSON by default
+(orjson when installed), msgpack when the client sends or accepts it.
+
+Each service ships its own copy of this file (every Docker build context is
+the service directory). Edit services/api-gateway/fast_codec.py and copy it to
+the others; tests/test_fast_codec_copies.py fails when the copies drift.
+"""
+import contextvars
+import json
+from typing import Any, Callable, Tuple
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+MSGPACK_TYPES = (MSGPACK, "application/x-msgpack", "application/vnd.msgpack")
+
+_respond_msgpack = contextvars.ContextVar("respond_msgpack", default=False)
+
+
+def is_msgpack(content_type: str) -> bool:
+    return (content_type or "").split(";")[0].strip().lower() in MSGPACK_TYPES
+
+
+def accepts_msgpack(accept: str) -> bool:
+    """Accept lists a msgpack type (q-values are not ranked: asking for it is enough)"""
+    return msgpack is not None and any(is_msgpack(part) for part in (accept or "").split(","))
+
+
+def _default(value):
+    # numpy scalars/arrays and anything else with a plain-Python equivalent
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def dumps_json(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def loads_json(body: bytes) -> Any:
+    return orjson.loads(body) if orjson is not None else json.loads(body)
+
+
+def dumps_msgpack(content: Any) -> bytes:
+    return msgpack.packb(content, use_bin_type=True, default=_default)
+
+
+def loads_msgpack(body: bytes) -> Any:
+    return msgpack.unpackb(body, raw=False)
+
+
+class NegotiatedResponse(Response):
+    """Default response class: msgpack if the request accepted it, otherwise compact JSON"""
+    media_type = JSON
+
+    def __init__(self, content: Any = None, status_code: int = 200, headers: dict = None,
+                 media_type: str = None, background=None):
+        if media_type is None and _respond_msgpack.get():
+            media_type = MSGPACK
+        super().__init__(content, status_code, {**(headers or {}), "Vary": "Accept"}, media_type, background)
+
+    def render(self, content: Any) -> bytes:
+        if self.media_type == MSGPACK:
+            return dumps_msgpack(content)
+        return dumps_json(content)
+
+
+class NegotiatedRequest(Request):
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            body = await self.body()
+            self._json = loads_msgpack(body) if self.scope.get("msgpack_body") else loads_json(body)
+        return self._json
+
+
+class NegotiatedRoute(APIRoute):
+    """
+    Route class that decodes msgpack request bodies and records whether the
+    response may be msgpack. Set it before declaring routes:
+    app.router.route_class = NegotiatedRoute
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def negotiated_handler(request: Request) -> Response:
+            scope = request.scope
+            if is_msgpack(request.headers.get("content-type")):
+                if msgpack is None:
+                    return Response(f"{MSGPACK} is not supported", status_code=415)
+                # FastAPI only parses bodies it sees as JSON; the decoded body is handed over by json()
+                scope["msgpack_body"] = True
+                scope["headers"] = [
+                    (name, JSON.encode("latin-1") if name == b"content-type" else value)
+                    for name, value in scope["headers"]
+                ]
+            token = _respond_msgpack.set(accepts_msgpack(request.headers.get("accept")))
+            try:
+                return await handler(NegotiatedRequest(scope, request.receive))
+            finally:
+                _respond_msgpack.reset(token)
+
+        return negotiated_handler
+
+
+def encode_request(content: Any, use_msgpack: bool) -> Tuple[bytes, dict]:
+    """Body and headers for a client call; with msgpack the response is requested in msgpack too"""
+    if use_msgpack and msgpack is not None:
+        return dumps_msgpack(content), {"Content-Type": MSGPACK, "Accept": f"{MSGPACK}, {JSON};q=0.5"}
+    return dumps_json(content), {"Content-Type": JSON, "Accept": JSON}
+
+
+def decode_response(content_type: str, body: bytes) -> Any:
+    """Decode a client response by its Content-Type"""
+    return loads_msgpack(body) if is_msgpack(content_type) else loads_json(body)
@@ -0,0 +1,5 @@
+"""Los módulos del servicio se importan como en producción (agents.*, data.*)"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
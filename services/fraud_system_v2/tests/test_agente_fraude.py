@@ -0,0 +1,61 @@
+"""Paridad de agente_fraude.clasificar_lote (vectorizado) con analizar_importe (escalar)"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from agents.agente_fraude import agente_fraude
+
+PROMEDIOS = [0.0, 1000.0, 358698.94, 0.01, 7.5, 1e9, -250.0]
+
+
+def crear_agente(promedio: float) -> agente_fraude:
+    agente = agente_fraude(pd.DataFrame())
+    agente.promedio_fraude = promedio
+    return agente
+
+
+def importes_de_prueba(promedio: float, semilla: int) -> list:
+    """Bordes exactos de cada banda, sus vecinos en float, especiales y aleatorios con semilla"""
+    bordes = np.array([promedio * 100, promedio * 10, promedio * 0.8, promedio * 1.2,
+                       promedio * 0.5, promedio * 1.5, promedio, 0.0, -0.0, -promedio, -1.0])
+    vecinos = np.concatenate([bordes, np.nextafter(bordes, np.inf), np.nextafter(bordes, -np.inf)])
+    rng = np.random.default_rng(semilla)
+    escala = abs(promedio) or 1.0
+    aleatorios = np.concatenate([
+        rng.lognormal(np.log(escala), 2.0, 500),
+        rng.uniform(-escala, escala * 200, 500),
+        np.round(rng.uniform(0, escala * 20, 250), 2)
+    ])
+    especiales = [np.nan, np.inf, -np.inf, np.finfo(np.float64).max, np.finfo(np.float64).tiny]
+    return np.concatenate([vecinos, aleatorios, especiales]).tolist()
+
+
+@pytest.mark.parametrize("promedio", PROMEDIOS)
+def test_clasificar_lote_igual_a_analizar_importe(promedio):
+    agente = crear_agente(promedio)
+    importes = importes_de_prueba(promedio, semilla=42)
+
+    with np.errstate(all='ignore'):
+        bandas, probabilidades = agente.clasificar_lote(importes)
+
+    for importe, banda, probabilidad in zip(importes, bandas.tolist(), probabilidades.tolist()):
+        escalar = agente.analizar_importe(importe)
+        assert probabilidad == escalar['probabilidad_fraude'], f"importe={importe!r}"
+        assert agente.razon(importe, banda) == escalar['razon'], f"importe={importe!r}"
+
+
+@pytest.mark.parametrize("semilla", range(5))
+def test_paridad_con_promedios_aleatorios(semilla):
+    rng = np.random.default_rng(semilla)
+    for promedio in rng.lognormal(8, 3, 20).tolist():
+        agente = crear_agente(promedio)
+        importes = importes_de_prueba(promedio, semilla)
+        bandas, probabilidades = agente.clasificar_lote(importes)
+        escalares = [agente.analizar_importe(importe) for importe in importes]
+        assert probabilidades.tolist() == [e['probabilidad_fraude'] for e in escalares]
+        assert [agente.razon(i, b) for i, b in zip(importes, bandas.tolist())] == [e['razon'] for e in escalares]
+
+
+def test_lote_vacio():
+    bandas, probabilidades = crear_agente(1000.0).clasificar_lote([])
+    assert len(bandas) == 0 and len(probabilidades) == 0
@@ -0,0 +1,29 @@
+import math
+
+from data.estadisticas import EstadisticasCSV, ResumenNumerico
+from data.formato import FormatoCSV
+
+
+def test_importes_no_finitos_cuentan_como_invalidos():
+    formato = FormatoCSV(';', '', ['NUMERO_DOCUMENTO', 'importe', 'CODIGO_RAZON_CONTRACARGO'])
+    estadisticas = EstadisticasCSV()
+    estadisticas.procesar_lineas(
+        ['111;100;83', '222;inf;83', '333;-inf;0', '444;nan;0', '555;abc;0', '666;300;0'], formato
+    )
+    assert estadisticas.filas == 6
+    assert estadisticas.importes_invalidos == 4
+    resumen = estadisticas.resumen()
+    assert resumen['importes']['cantidad'] == 2
+    assert resumen['importes']['promedio'] == 200.0
+    assert resumen['importes']['maximo'] == 300.0
+    assert resumen['importes_fraude']['cantidad'] == 1
+    # El documento sigue contando como cliente con fraude aunque su importe no sea válido
+    assert estadisticas.clientes_blacklist == 2
+
+
+def test_resumen_ignora_infinitos():
+    resumen = ResumenNumerico()
+    resumen.agregar_lote([1.0, math.inf, -math.inf, math.nan, 3.0])
+    assert resumen.cantidad == resumen.sketch.cantidad == 2
+    assert resumen.promedio == 2.0 and math.isfinite(resumen.desviacion)
+    assert 1.0 <= resumen.mediana <= 3.0
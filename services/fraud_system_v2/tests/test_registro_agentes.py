@@ -0,0 +1,39 @@
+import asyncio
+import math
+import time
+
+import numpy as np
+import pytest
+
+from agents.registro_agentes import DefinicionAgente, RegistroAgentes, TIMEOUT_POR_DEFECTO
+
+
+def test_agente_async_sin_timeout_usa_el_deadline_por_defecto():
+    async def evaluar(documento, importe):
+        return {'probabilidad_fraude': 0.5}
+    assert DefinicionAgente('externo', 0.1, evaluar, asincrono=True).timeout == TIMEOUT_POR_DEFECTO
+    for timeout in (math.inf, math.nan, 0, -1):
+        with pytest.raises(ValueError):
+            DefinicionAgente('externo', 0.1, evaluar, asincrono=True, timeout=timeout)
+
+
+def test_lote_lanza_cada_agente_una_vez_con_su_deadline():
+    llamadas = []
+
+    def evaluar_lote(documentos, importes):
+        llamadas.append(len(documentos))
+        return [0.9] * len(documentos)
+
+    async def colgado(documento, importe):
+        await asyncio.sleep(60)
+
+    registro = RegistroAgentes([
+        DefinicionAgente('lote', 0.1, None, timeout=1, evaluar_lote=evaluar_lote),
+        DefinicionAgente('colgado', 0.1, colgado, asincrono=True, timeout=0.05, probabilidad_por_defecto=0.3)
+    ])
+    inicio = time.perf_counter()
+    probabilidades = registro.ejecutar_lote(['1', '2', '3'], np.array([10.0, 20.0, 30.0]))
+    assert time.perf_counter() - inicio < 1
+    assert llamadas == [3]
+    assert list(probabilidades['lote']) == [0.9, 0.9, 0.9]
+    assert list(probabilidades['colgado']) == [0.3, 0.3, 0.3]
@@ -0,0 +1,159 @@
+"""Cambios manuales de blacklist: compactación y recarga de una versión nueva de la fuente"""
+import importlib
+import os
+
+import pytest
+
+from data.registro_blacklist import OP_AGREGAR, OP_ELIMINAR, RegistroBlacklist, reducir_compactadas
+
+ENCABEZADO = '"NUMERO_DOCUMENTO;importe;fecha_de_compra;CODIGO_RAZON_CONTRACARGO;CANT_PREPAGOS;CANT_POSPAGOS"\n'
+
+
+def escribir_filas(ruta, filas, modo='w'):
+    with open(ruta, modo, encoding='utf-8') as f:
+        if modo == 'w':
+            f.write(ENCABEZADO)
+        for documento, importe, codigo in filas:
+            f.write(f'"{documento};{importe};2024-01-01;{codigo};1;0"\n')
+
+
+@pytest.fixture
+def sistema(tmp_path):
+    """FraudSystemV2 sobre un CSV local, con snapshots y log en tmp_path"""
+    ruta_csv = tmp_path / 'BaseFinal.csv'
+    escribir_filas(ruta_csv, [(111, 500.0, 83), (222, 900.0, 0)])
+    with pytest.MonkeyPatch.context() as entorno:
+        entorno.setenv('LOCAL_DATA_FILE', str(ruta_csv))
+        entorno.setenv('SNAPSHOT_DIR', str(tmp_path / 'snapshots'))
+        entorno.setenv('BLACKLIST_LOG', str(tmp_path / 'blacklist_log.jsonl'))
+        entorno.setenv('REFRESH_INTERVAL_SECONDS', '0')
+        entorno.setenv('BLACKLIST_COMPACT_EVERY', '0')
+        api_wrapper = importlib.import_module('api_wrapper')
+        sistema = api_wrapper.FraudSystemV2()
+        # Como _initial_load, sin hilos: único worker, por lo tanto líder
+        assert sistema.coordinator.intentar_liderazgo()
+        sistema._publish_master(sistema._build_master())
+        sistema.refresher.version_actual = sistema.master_agent.version_datos
+        yield sistema, api_wrapper, ruta_csv
+        sistema.coordinator.liberar()
+
+
+def en_blacklist(sistema, documento) -> bool:
+    return sistema.master_agent.agente_blacklist.verificar_cliente(str(documento))['en_blacklist']
+
+
+def test_cambios_compactados_sobreviven_a_una_recarga(sistema):
+    sistema, api_wrapper, ruta_csv = sistema
+    sistema.apply_blacklist_changes([
+        api_wrapper.blacklist_entry(OP_AGREGAR, '333', 1000.0),
+        api_wrapper.blacklist_entry(OP_ELIMINAR, '111')
+    ])
+    assert sistema.compact_blacklist()['compacted']
+    assert sistema.blacklist_log.pendientes == 0
+    promedio = sistema.master_agent.agente_fraude.promedio_fraude
+
+    # Nueva versión de la fuente: su snapshot no contiene los cambios compactados
+    escribir_filas(ruta_csv, [(444, 500.0, 83)], modo='a')
+    assert sistema.refresher.revisar()
+
+    assert en_blacklist(sistema, 333)
+    assert not en_blacklist(sistema, 111)
+    assert en_blacklist(sistema, 444)
+    assert sistema.master_agent.agente_fraude.promedio_fraude == pytest.approx((500.0 + 1000.0 + 500.0) / 3)
+    assert promedio == pytest.approx(750.0)
+
+    # Compactar sobre la versión nueva y reiniciar desde su snapshot no duplica importes
+    assert sistema.compact_blacklist()['compacted']
+    reiniciado = api_wrapper.FraudSystemV2()
+    reiniciado._publish_master(reiniciado._build_master())
+    assert en_blacklist(reiniciado, 333) and not en_blacklist(reiniciado, 111)
+    assert reiniciado.master_agent.agente_fraude.promedio_fraude == pytest.approx(2000.0 / 3)
+
+
+def test_truncar_mueve_las_entradas_al_archivo_compactado(tmp_path):
+    registro = RegistroBlacklist(str(tmp_path / 'log.jsonl'), fsync=False)
+    entradas = registro.anexar([
+        {'op': OP_AGREGAR, 'documento': 1, 'importe': 10.0},
+        {'op': OP_ELIMINAR, 'documento': 1},
+        {'op': OP_AGREGAR, 'documento': 2},
+        {'op': OP_AGREGAR, 'documento': 3}
+    ])
+    registro.truncar(entradas[2]['seq'])
+
+    assert [e['seq'] for e in registro.leer()] == [entradas[3]['seq']]
+    assert [e['seq'] for e in registro.leer(compactadas=True)] == [e['seq'] for e in entradas]
+    assert registro.pendientes == 1
+
+
+def test_reducir_compactadas_conserva_el_efecto_neto():
+    entradas = [
+        {'seq': 1, 'op': OP_AGREGAR, 'documento': 1},
+        {'seq': 2, 'op': OP_ELIMINAR, 'documento': 1},
+        {'seq': 3, 'op': OP_AGREGAR, 'documento': 1},
+        {'seq': 4, 'op': OP_AGREGAR, 'documento': 2, 'importe': 5.0},
+        {'seq': 5, 'op': OP_ELIMINAR, 'documento': 2},
+        {'seq': 5, 'op': OP_ELIMINAR, 'documento': 2}
+    ]
+    assert [e['seq'] for e in reducir_compactadas(entradas)] == [3, 4, 5]
+
+
+IMPORTES_INVALIDOS = [float('nan'), float('inf'), float('-inf'), -100.0, 0.0, 'NaN', 'abc']
+
+
+@pytest.mark.parametrize("importe", IMPORTES_INVALIDOS)
+def test_registrar_importe_ignora_importes_invalidos(importe):
+    from agents.agente_fraude import agente_fraude
+    agente = agente_fraude.__new__(agente_fraude)
+    agente.promedio_fraude, agente.conteo_fraude = 500.0, 2
+
+    assert not agente.registrar_importe(importe)
+    assert agente.promedio_fraude == 500.0 and agente.conteo_fraude == 2
+
+
+def test_endpoints_rechazan_importes_invalidos(sistema):
+    _, api_wrapper, _ = sistema
+    from fastapi.testclient import TestClient
+    cliente = TestClient(api_wrapper.app)
+
+    for importe in ('NaN', 'Infinity', -5, 0):
+        respuesta = cliente.post('/blacklist', json={"customer_id": "555", "amount": importe})
+        assert respuesta.status_code == 400, importe
+
+    eventos = b'{"customer_id": "555", "amount": NaN, "reason_code": 83}\n' \
+              b'{"customer_id": "556", "amount": -1, "reason_code": 83}\n' \
+              b'{"customer_id": "557", "amount": Infinity, "reason_code": 83}\n'
+    respuesta = cliente.post('/blacklist/events', content=eventos)
+    assert respuesta.json() == {"received": 3, "applied": 0, "ignored": 0, "invalid": 3}
+
+
+def test_log_con_importe_invalido_no_altera_el_promedio(sistema):
+    sistema, _, _ = sistema
+    promedio = sistema.master_agent.agente_fraude.promedio_fraude
+    # Entradas escritas antes de validar en la API: se reaplican sin tocar el promedio
+    sistema.apply_blacklist_changes([{"op": OP_AGREGAR, "documento": 777, "importe": float('nan')}])
+
+    assert en_blacklist(sistema, 777)
+    assert sistema.master_agent.agente_fraude.promedio_fraude == promedio
+    assert sistema.compact_blacklist()['compacted']
+    assert sistema.master_agent.agente_fraude.promedio_fraude == promedio
+
+
+def test_seguidor_reintenta_si_el_snapshot_falta_o_esta_incompleto(sistema):
+    sistema, api_wrapper, _ = sistema
+    seguidor = api_wrapper.FraudSystemV2()
+    assert not seguidor.coordinator.intentar_liderazgo()
+    version = sistema.master_agent.version_datos
+    ruta_meta = os.path.join(sistema.master_agent.snapshot_store.ruta(version), 'meta.json')
+
+    sistema.coordinator.publicar('otra-version', 0)
+    assert not seguidor._attach_leader_snapshot()
+    assert seguidor.master_agent is None and seguidor.attach_error
+
+    os.rename(ruta_meta, ruta_meta + '.bak')
+    sistema.coordinator.publicar(version, sistema.master_agent.registro_seq_snapshot)
+    assert not seguidor._attach_leader_snapshot()
+
+    # En el siguiente tick el snapshot ya está completo
+    os.rename(ruta_meta + '.bak', ruta_meta)
+    seguidor.sync_workers()
+    assert seguidor.master_agent is not None and seguidor.attach_error is None
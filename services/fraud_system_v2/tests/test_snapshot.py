@@ -0,0 +1,32 @@
+import os
+
+import numpy as np
+
+from data.snapshot import ARCHIVO_META, SnapshotStore
+
+
+def test_reescribir_version_cambia_el_symlink_sin_borrar_el_mmap_abierto(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    store.guardar('v1', {'A': np.arange(3)}, {'registro_seq': 1})
+    columnas, meta = store.cargar('v1')
+
+    for seq in (2, 3, 4):
+        ruta = store.guardar('v1', {'A': np.arange(3) * seq}, {'registro_seq': seq})
+        # En todo momento la ruta publicada tiene un snapshot completo
+        assert os.path.exists(os.path.join(ruta, ARCHIVO_META))
+
+    nuevas, meta_nueva = store.cargar('v1')
+    assert meta_nueva['registro_seq'] == 4
+    assert list(nuevas['A']) == [0, 4, 8]
+    # El mmap abierto antes de las reescrituras sigue leyendo sus datos
+    assert meta['registro_seq'] == 1 and list(columnas['A']) == [0, 1, 2]
+    # Solo quedan la escritura publicada y la anterior
+    prefijo = os.path.basename(ruta) + '.'
+    generaciones = [n for n in os.listdir(tmp_path) if n.startswith(prefijo)]
+    assert len(generaciones) == 2
+
+
+def test_symlink_roto_no_es_un_snapshot(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    os.symlink('no-existe', store.ruta('v1'))
+    assert store.cargar('v1') is None
@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 """Script para verificar la blacklist y explicar el filtrado"""
 
-import boto3
-import pandas as pd
+import os
+
 from config.aws_config import *
+from data.estadisticas import calcular_estadisticas
+from data.fuentes import crear_fuente
 
 def verificar_blacklist():
     """Verificar cuántos clientes están en blacklist con código 83"""
@@ -11,71 +13,55 @@ def verificar_blacklist():
         print("🔍 Verificando blacklist (CODIGO_RAZON_CONTRACARGO == 83)")
         print("=" * 60)
         
-        # Cargar datos con separador correcto
-        s3_client = boto3.client('s3')
-        response = s3_client.get_object(Bucket=S3_BUCKET, Key=S3_FILE)
-        data = pd.read_csv(response['Body'], sep=';')  # Usar punto y coma
-        
-        print(f"📊 Total de registros: {len(data):,}")
-        print(f"📋 Columnas encontradas: {len(data.columns)}")
+        # Una sola pasada en streaming (ver data/estadisticas.py)
+        stats = calcular_estadisticas(crear_fuente(S3_BUCKET, S3_FILE), workers=os.cpu_count() or 1)
         
-        # Verificar si existe la columna
-        if 'CODIGO_RAZON_CONTRACARGO' not in data.columns:
-            print("❌ Columna CODIGO_RAZON_CONTRACARGO no encontrada")
-            print(f"📋 Columnas disponibles: {list(data.columns)}")
-            return
+        print(f"📊 Total de registros: {stats.filas:,}")
+        print(f"📋 Columnas encontradas: {len(stats.columnas)}")
         
         # Analizar todos los códigos
         print(f"\n🔍 Análisis de códigos de razón contracargo:")
-        codigos_count = data['CODIGO_RAZON_CONTRACARGO'].value_counts()
-        print(f"📊 Total de códigos únicos: {len(codigos_count)}")
+        print(f"📊 Total de códigos únicos: {len(stats.codigos)}")
         
         # Mostrar los 10 códigos más frecuentes
         print(f"\n📈 Top 10 códigos más frecuentes:")
-        for codigo, count in codigos_count.head(10).items():
-            porcentaje = (count / len(data)) * 100
+        for codigo, count in stats.codigos.most_common(10):
+            porcentaje = (count / stats.filas) * 100
             print(f"   Código {codigo}: {count:,} registros ({porcentaje:.2f}%)")
         
-        # Filtrar específicamente código 83 (fraude)
-        fraud_records = data[data['CODIGO_RAZON_CONTRACARGO'] == 83]
         print(f"\n💰 Registros con código 83 (FRAUDE):")
-        print(f"   📊 Total de registros fraudulentos: {len(fraud_records):,}")
-        print(f"   📈 Porcentaje del total: {(len(fraud_records)/len(data)*100):.2f}%")
+        print(f"   📊 Total de registros fraudulentos: {stats.filas_fraude:,}")
+        print(f"   📈 Porcentaje del total: {(stats.filas_fraude/max(stats.filas, 1)*100):.2f}%")
         
-        if len(fraud_records) > 0:
-            # Analizar clientes únicos en blacklist
-            if 'NUMERO_DOCUMENTO' in data.columns:
-                clientes_blacklist = fraud_records['NUMERO_DOCUMENTO'].unique()
-                print(f"   👥 Clientes únicos en blacklist: {len(clientes_blacklist):,}")
-                
-                # Mostrar algunos ejemplos
-                print(f"\n📋 Ejemplos de clientes en blacklist:")
-                for i, cliente in enumerate(clientes_blacklist[:5]):
-                    registros_cliente = len(fraud_records[fraud_records['NUMERO_DOCUMENTO'] == cliente])
-                    print(f"   {i+1}. Cliente {cliente}: {registros_cliente} registros fraudulentos")
-                
-                # Analizar importes fraudulentos
-                if 'importe' in fraud_records.columns:
-                    promedio_fraude = fraud_records['importe'].mean()
-                    mediana_fraude = fraud_records['importe'].median()
-                    
-                    print(f"\n💵 Estadísticas de importes fraudulentos:")
-                    print(f"   🎯 Promedio: ${promedio_fraude:,.2f}")
-                    print(f"   📊 Mediana: ${mediana_fraude:,.2f}")
-                    print(f"   📉 Mínimo: ${fraud_records['importe'].min():,.2f}")
-                    print(f"   📈 Máximo: ${fraud_records['importe'].max():,.2f}")
-                    
-                    # Rango del 10% para análisis
-                    rango_10_pct = promedio_fraude * 0.1
-                    print(f"\n🎯 Rango de alta probabilidad (±10% del promedio):")
-                    print(f"   📉 ${promedio_fraude - rango_10_pct:,.2f}")
-                    print(f"   📈 ${promedio_fraude + rango_10_pct:,.2f}")
+        if stats.filas_fraude > 0:
+            # Clientes únicos en blacklist: claves del conteo por cliente
+            print(f"   👥 Clientes únicos en blacklist: {stats.clientes_blacklist:,}")
+            
+            # Mostrar algunos ejemplos
+            print(f"\n📋 Ejemplos de clientes en blacklist:")
+            for i, (cliente, registros_cliente) in enumerate(list(stats.fraude_por_cliente.items())[:5]):
+                print(f"   {i+1}. Cliente {cliente}: {registros_cliente} registros fraudulentos")
+            
+            # Analizar importes fraudulentos
+            fraude = stats.importes_fraude
+            promedio_fraude = fraude.promedio if fraude.cantidad else 0
+            if fraude.cantidad:
+                print(f"\n💵 Estadísticas de importes fraudulentos:")
+                print(f"   🎯 Promedio: ${promedio_fraude:,.2f}")
+                print(f"   📊 Mediana: ${fraude.mediana:,.2f}")
+                print(f"   📉 Mínimo: ${fraude.minimo:,.2f}")
+                print(f"   📈 Máximo: ${fraude.maximo:,.2f}")
                 
-                return len(clientes_blacklist), promedio_fraude if 'importe' in fraud_records.columns else 0
-            else:
-                print("❌ Columna NUMERO_DOCUMENTO no encontrada")
+                # Rango del 10% para análisis
+                rango_10_pct = promedio_fraude * 0.1
+                print(f"\n🎯 Rango de alta probabilidad (±10% del promedio):")
+                print(f"   📉 ${promedio_fraude - rango_10_pct:,.2f}")
+                print(f"   📈 ${promedio_fraude + rango_10_pct:,.2f}")
+            
+            return stats.clientes_blacklist, promedio_fraude
         else:
             print("❌ No se encontraron registros con código 83")
+        return 0, 0
             
     except Exception as e:
         print(f"❌ Error: {e}")
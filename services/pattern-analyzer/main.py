@@ -5,7 +5,11 @@ import numpy as np
 from datetime import datetime, timedelta
 import random
 
-app = FastAPI(title="Pattern Analysis Service")
+from fast_codec import NegotiatedResponse, NegotiatedRoute
+
+app = FastAPI(title="Pattern Analysis Service", default_response_class=NegotiatedResponse)
+# JSON by default (orjson), msgpack for callers that send or accept it
+app.router.route_class = NegotiatedRoute
 
 class PatternAnalysisRequest(BaseModel):
     transaction_data: Dict[str, Any]
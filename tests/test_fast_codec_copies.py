@@ -0,0 +1,17 @@
+"""Every service ships its own fast_codec.py (each Docker build context is the service directory)"""
+import pathlib
+
+SERVICES = pathlib.Path(__file__).resolve().parent.parent / "services"
+CONSUMERS = ("api-gateway", "data-collector", "pattern-analyzer", "fraud-agent", "fraud_system_v2")
+
+
+def test_fast_codec_copies_are_identical():
+    copies = {name: (SERVICES / name / "fast_codec.py").read_bytes() for name in CONSUMERS}
+    reference = copies["api-gateway"]
+    drifted = sorted(name for name, content in copies.items() if content != reference)
+    assert not drifted, f"fast_codec.py differs from services/api-gateway/fast_codec.py in: {', '.join(drifted)}"
+
+
+def test_no_copy_is_missing_from_the_list():
+    found = {path.parent.name for path in SERVICES.glob("*/fast_codec.py")}
+    assert found == set(CONSUMERS)